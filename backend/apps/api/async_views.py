@@ -0,0 +1,145 @@
+"""
+A small async counterpart of DRF's APIView.
+
+DRF 3.14 views are synchronous, so under ASGI each request holds a thread for
+its whole life. AsyncAPIView keeps DRF's request wrapper, content negotiation,
+permissions, renderers and error payloads, but runs authentication and the
+``async def`` handlers on the event loop, where they use the async ORM.
+
+Methods without an async handler are served by ``sync_view``, a regular
+APIView run in a worker thread. Writes go there: they need
+``transaction.atomic()``, which async code cannot use in Django 5.0.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+
+class AsyncAPIView(View):
+    # authentication classes need an ``aauthenticate`` coroutine
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
+    renderer_classes = (JSONRenderer,)
+    sync_view = None
+    sync_view_func = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        if cls.sync_view is not None:
+            initkwargs.setdefault('sync_view_func', cls.sync_view.as_view())
+        # JWT authentication, no session cookies to protect
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def get_handler(self, method):
+        if method == 'options' or method not in self.http_method_names:
+            return None
+        return getattr(self, method, None)
+
+    async def dispatch(self, request, *args, **kwargs):
+        handler = self.get_handler(request.method.lower())
+        if handler is None and self.sync_view_func is not None:
+            return await sync_to_async(self.call_sync_view)(request, *args, **kwargs)
+
+        request = Request(request, authenticators=self.get_authenticators(), negotiator=DefaultContentNegotiation())
+        self.request = request
+        self.format_kwarg = None
+        try:
+            request.accepted_renderer, request.accepted_media_type = self.perform_content_negotiation(request)
+            await self.authenticate(request)
+            self.check_permissions(request)
+            if handler is None:
+                raise exceptions.MethodNotAllowed(request.method)
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        return self.finalize_response(request, response)
+
+    def call_sync_view(self, request, *args, **kwargs):
+        # render in the worker thread, not in another hop from the handler
+        return as_http_response(self.sync_view_func(request, *args, **kwargs))
+
+    def get_renderers(self):
+        return [renderer() for renderer in self.renderer_classes]
+
+    def perform_content_negotiation(self, request):
+        renderers = self.get_renderers()
+        try:
+            return request.negotiator.select_renderer(request, renderers)
+        except exceptions.NotAcceptable:
+            # render the 406 with the default renderer
+            request.accepted_renderer, request.accepted_media_type = renderers[0], renderers[0].media_type
+            raise
+
+    def get_authenticators(self):
+        return [authentication() for authentication in self.authentication_classes]
+
+    async def authenticate(self, request):
+        for authenticator in request.authenticators:
+            if hasattr(authenticator, 'aauthenticate'):
+                user_auth_tuple = await authenticator.aauthenticate(request)
+            else:
+                # the test client's ForcedAuthentication, no I/O
+                user_auth_tuple = authenticator.authenticate(request)
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+        request._not_authenticated()
+
+    def check_permissions(self, request):
+        for permission in [permission() for permission in self.permission_classes]:
+            if not permission.has_permission(request, self):
+                if request._authenticator is None and self.authentication_classes:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+
+    def check_object_permissions(self, request, obj):
+        for permission in [permission() for permission in self.permission_classes]:
+            if not permission.has_object_permission(request, self, obj):
+                raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+
+    def handle_exception(self, exc):
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)) and self.authentication_classes:
+            exc.auth_header = self.authentication_classes[0]().authenticate_header(self.request)
+        response = exception_handler(exc, {'view': self, 'request': self.request})
+        if response is None:
+            raise exc
+        response.exception = True
+        return response
+
+    def finalize_response(self, request, response):
+        if not isinstance(response, Response):
+            # a plain Django response, e.g. a stream
+            return response
+        response.accepted_renderer = request.accepted_renderer
+        response.accepted_media_type = request.accepted_media_type
+        response.renderer_context = {'view': self, 'request': request, 'response': response}
+        if len(self.renderer_classes) > 1:
+            patch_vary_headers(response, ('Accept',))
+        return as_http_response(response)
+
+
+def as_http_response(response):
+    """
+    Render a DRF Response into a plain HttpResponse. Django's async handler
+    renders anything with a ``render()`` method through sync_to_async, which
+    would cost a thread hop even for an already rendered response.
+    """
+    response.render()
+    rendered = HttpResponse(response.content, status=response.status_code)
+    for header, value in response.items():
+        rendered[header] = value
+    if 'Content-Type' not in response:
+        del rendered['Content-Type']
+    # like Response.data, for callers that inspect it (e.g. APIClient)
+    rendered.data = response.data
+    return rendered
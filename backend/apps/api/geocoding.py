@@ -0,0 +1,252 @@
+"""
+Forward geocoding through the backend, for /api/geocode/.
+
+Every request to the upstream service is paid for and slow, and search boxes
+send one per debounced keystroke, so the Geocoder in front of the upstream
+client:
+
+- normalizes queries (Unicode NFKC, case folded, whitespace collapsed) and
+  options into the cache key, so ``Paris`` and `` paris `` are one entry;
+- keeps responses in a per-process LRU cache whose entries expire after
+  ``GEOCODING_CACHE_TTL`` seconds;
+- coalesces identical queries in flight: the first one asks upstream and the
+  others wait for its response instead of sending their own.
+
+The upstream client is ``GEOCODING_CLIENT``, any class with a ``geocode()``
+method like MapboxClient's that raises GeocodingError on failure.
+"""
+import asyncio
+import http.client
+import json
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from urllib.parse import quote, urlencode, urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+class GeocodingError(Exception):
+    """The upstream service failed; ``status_code`` is the one to answer with"""
+
+    def __init__(self, message, status_code=502):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def normalize_query(value):
+    return ' '.join(unicodedata.normalize('NFKC', value).casefold().split())
+
+
+class LRUCache:
+    """Thread-safe LRU mapping whose entries expire ``ttl`` seconds after being set"""
+
+    def __init__(self, max_entries, ttl, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self.clock():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (self.clock() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SingleFlight:
+    """
+    Runs one call per key at a time: callers of a key already in flight get
+    the future of the running call. Futures are thread-safe, so sync and async
+    callers (on any event loop) can share a call.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def join(self, key):
+        """Return the future of the call for ``key`` and whether the caller must run it"""
+        with self.lock:
+            future = self.calls.get(key)
+            if future is not None:
+                return future, False
+            future = self.calls[key] = Future()
+            return future, True
+
+    def run(self, key, future, fn):
+        try:
+            result = fn()
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+
+class MapboxClient:
+    """
+    Mapbox forward geocoding (v5). Each thread keeps its connection to the
+    service open between requests, saving the TCP and TLS handshakes.
+    """
+
+    def __init__(self, url=None, token=None, timeout=None):
+        url = urlsplit(url or settings.GEOCODING_URL)
+        self.connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        self.netloc = url.netloc
+        self.path = url.path.rstrip('/') + '/'
+        self.token = settings.MAPBOX_TOKEN if token is None else token
+        self.timeout = settings.GEOCODING_TIMEOUT if timeout is None else timeout
+        self.local = threading.local()
+
+    def geocode(self, query, types=(), limit=5, proximity=None, bbox=None, autocomplete=True):
+        params = {'access_token': self.token, 'limit': limit, 'autocomplete': str(autocomplete).lower()}
+        if types:
+            params['types'] = ','.join(types)
+        if proximity is not None:
+            params['proximity'] = ','.join(map(str, proximity))
+        if bbox is not None:
+            params['bbox'] = ','.join(map(str, bbox))
+        status, body = self.get(f'{self.path}{quote(query, safe="")}.json?{urlencode(params)}')
+        if status == 429:
+            raise GeocodingError('Geocoding rate limit reached, try again later.', 503)
+        if status != 200:
+            raise GeocodingError(f'Geocoding service answered {status}.')
+        try:
+            return json.loads(body)
+        except ValueError:
+            raise GeocodingError('Geocoding service sent invalid JSON.')
+
+    def get(self, path):
+        while True:
+            connection = getattr(self.local, 'connection', None)
+            reused = connection is not None
+            if not reused:
+                connection = self.local.connection = self.connection_class(self.netloc, timeout=self.timeout)
+            try:
+                return self.request(connection, path)
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                self.local.connection = None
+                if reused and isinstance(e, (ConnectionResetError, BrokenPipeError)):
+                    # the service closed the idle connection, retry on a new one
+                    continue
+                if isinstance(e, TimeoutError):
+                    raise GeocodingError('Geocoding service timed out.', 504)
+                raise GeocodingError('Geocoding service unreachable.')
+
+    @staticmethod
+    def request(connection, path):
+        connection.request('GET', path, headers={'Accept': 'application/json'})
+        response = connection.getresponse()
+        return response.status, response.read()
+
+
+class Geocoder:
+
+    def __init__(self, client, max_entries, ttl):
+        self.client = client
+        self.cache = LRUCache(max_entries, ttl)
+        self.flights = SingleFlight()
+        self.stats_lock = threading.Lock()
+        self.stats = {'cache_hits': 0, 'upstream_requests': 0, 'coalesced': 0}
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            import_string(settings.GEOCODING_CLIENT)(), settings.GEOCODING_CACHE_SIZE, settings.GEOCODING_CACHE_TTL
+        )
+
+    @staticmethod
+    def key(query, options):
+        return query, tuple(sorted(options.items()))
+
+    def count(self, stat):
+        with self.stats_lock:
+            self.stats[stat] += 1
+
+    def cached(self, key):
+        data = self.cache.get(key)
+        if data is not None:
+            self.count('cache_hits')
+        return data
+
+    def fetch(self, key, query, options):
+        self.count('upstream_requests')
+        data = self.client.geocode(query, **options)
+        self.cache.set(key, data)
+        return data
+
+    def geocode(self, query, **options):
+        """Geocode a normalized ``query``; options must be hashable"""
+        key = self.key(query, options)
+        data = self.cached(key)
+        if data is not None:
+            return data
+        future, leader = self.flights.join(key)
+        if leader:
+            self.flights.run(key, future, lambda: self.fetch(key, query, options))
+        else:
+            self.count('coalesced')
+        return future.result()
+
+    async def ageocode(self, query, **options):
+        """geocode() for async views, the upstream request runs in a worker thread"""
+        key = self.key(query, options)
+        data = self.cached(key)
+        if data is not None:
+            return data
+        future, leader = self.flights.join(key)
+        if leader:
+            # not the thread sync views share: they must not wait behind the upstream service
+            await sync_to_async(self.flights.run, thread_sensitive=False)(
+                key, future, lambda: self.fetch(key, query, options)
+            )
+        else:
+            self.count('coalesced')
+        return await asyncio.wrap_future(future)
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder():
+    global _geocoder
+    if _geocoder is None:
+        with _geocoder_lock:
+            if _geocoder is None:
+                _geocoder = Geocoder.from_settings()
+    return _geocoder
+
+
+@receiver(setting_changed)
+def reset_geocoder(setting, **kwargs):
+    global _geocoder
+    if setting.startswith('GEOCODING_') or setting == 'MAPBOX_TOKEN':
+        _geocoder = None
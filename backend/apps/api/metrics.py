@@ -0,0 +1,197 @@
+"""
+Per-process request metrics in the Prometheus text format.
+
+MetricsMiddleware observes every request: latency, response size, number of
+database queries and time spent in them, by method and URL route (the
+pattern, e.g. ``api/pois/<int:pk>/``, so the number of series stays bounded),
+plus a request counter by status code. Database work is counted by an
+execute wrapper installed on every connection (see signals.py), which adds
+to the stats of the request running in the current context, including the
+threads async views run their queries in.
+
+Like the connection pools, metrics are kept per process. Run one scrape
+target per process, or aggregate the processes in the collector.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+UNMATCHED_ROUTE = '<unmatched>'
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# stats of the request being served, shared with the threads it runs queries in
+request_stats = ContextVar('request_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - start
+
+
+class Histogram:
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [count per bucket (last one +Inf)..., sum]
+        self.series = {}
+
+    def observe(self, label_values, value):
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = [0] * (len(self.buckets) + 1) + [0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self, lines):
+        lines.append(f'# HELP {self.name} {self.help}')
+        lines.append(f'# TYPE {self.name} histogram')
+        for label_values, series in sorted(self.series.items()):
+            labels = format_labels(self.labels, label_values)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {series[-1]}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+
+
+class Counter:
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series = {}
+
+    def inc(self, label_values):
+        self.series[label_values] = self.series.get(label_values, 0) + 1
+
+    def render(self, lines):
+        lines.append(f'# HELP {self.name} {self.help}')
+        lines.append(f'# TYPE {self.name} counter')
+        for label_values, value in sorted(self.series.items()):
+            lines.append(f'{self.name}{{{format_labels(self.labels, label_values)}}} {value}')
+
+
+def escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def format_labels(names, values):
+    return ','.join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        labels = ('method', 'route')
+        self.requests = Counter('http_requests_total', 'Requests served.', ('method', 'route', 'status'))
+        self.metrics = (
+            self.requests,
+            Histogram('http_request_duration_seconds', 'Time to build the response.', labels, LATENCY_BUCKETS),
+            Histogram('http_response_size_bytes', 'Size of non-streaming response bodies.', labels, SIZE_BUCKETS),
+            Histogram('http_request_db_queries', 'Database queries per request.', labels, QUERY_BUCKETS),
+            Histogram('http_request_db_seconds', 'Time per request spent in database queries.', labels,
+                      LATENCY_BUCKETS),
+        )
+        _, self.duration, self.size, self.queries, self.db_seconds = self.metrics
+
+    def observe(self, method, route, status, seconds, size, stats):
+        labels = (method, route)
+        with self.lock:
+            self.requests.inc((method, route, status))
+            self.duration.observe(labels, seconds)
+            if size is not None:
+                self.size.observe(labels, size)
+            self.queries.observe(labels, stats.queries)
+            self.db_seconds.observe(labels, stats.db_seconds)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for metric in self.metrics:
+                metric.render(lines)
+        render_pool_stats(lines)
+        render_geocoder_stats(lines)
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self.lock:
+            for metric in self.metrics:
+                metric.series.clear()
+
+
+POOL_GAUGES = {
+    'pool_size': 'Connections managed by the pool.',
+    'pool_available': 'Idle connections in the pool.',
+    'pool_in_use': 'Connections checked out of the pool.',
+    'requests_waiting': 'Requests waiting for a connection.',
+}
+POOL_COUNTERS = {
+    'requests_num': 'Connections requested from the pool.',
+    'requests_queued': 'Connection requests that had to wait.',
+    'requests_wait_ms': 'Milliseconds spent waiting for a connection.',
+    'requests_errors': 'Connection requests that timed out.',
+    'connections_lost': 'Connections found broken on checkout.',
+}
+
+
+def render_pool_stats(lines):
+    from apps.core.postgresql.base import pool_stats
+
+    stats = pool_stats()
+    for kinds, kind in ((POOL_GAUGES, 'gauge'), (POOL_COUNTERS, 'counter')):
+        for key, help in kinds.items():
+            name = f'db_{key}_total' if kind == 'counter' else f'db_{key}'
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for alias, values in sorted(stats.items()):
+                # psycopg_pool leaves out counters that are still 0
+                lines.append(f'{name}{{alias="{escape(alias)}"}} {values.get(key, 0)}')
+
+
+GEOCODER_COUNTERS = {
+    'cache_hits': 'Geocoding queries answered from the cache.',
+    'upstream_requests': 'Geocoding queries sent to the upstream service.',
+    'coalesced': 'Geocoding queries that waited for an identical one in flight.',
+}
+
+
+def render_geocoder_stats(lines):
+    from .geocoding import get_geocoder
+
+    stats = get_geocoder().stats
+    for key, help in GEOCODER_COUNTERS.items():
+        name = f'geocode_{key}_total'
+        lines.append(f'# HELP {name} {help}')
+        lines.append(f'# TYPE {name} counter')
+        lines.append(f'{name} {stats[key]}')
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,79 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import OperationalError
+from django.http import JsonResponse
+from django.utils.deprecation import MiddlewareMixin
+from psycopg_pool import PoolTimeout
+
+from .metrics import UNMATCHED_ROUTE, RequestStats, request_metrics, request_stats
+
+# seconds clients are asked to wait before retrying
+RETRY_AFTER = 1
+
+
+class DatabaseUnavailableMiddleware(MiddlewareMixin):
+    """
+    Answers 503 instead of 500 when a view couldn't check a connection out of
+    the pool in time (see apps.core.postgresql): the pool is exhausted, the
+    request can simply be retried later.
+    """
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, OperationalError) and isinstance(exception.__cause__, PoolTimeout):
+            response = JsonResponse({'detail': 'Service temporarily busy, try again later.'}, status=503)
+            response['Retry-After'] = str(RETRY_AFTER)
+            return response
+        return None
+
+
+class MetricsMiddleware:
+    """
+    Records the metrics of every request (see apps.api.metrics) and reports
+    its database and total time in a ``Server-Timing`` header. Runs natively
+    in both sync and async stacks, so async views pay no thread hop for it.
+    """
+    sync_capable = True
+    async_capable = True
+
+    METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            request_stats.reset(token)
+        return self.observe(request, response, stats, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_stats.reset(token)
+        return self.observe(request, response, stats, time.perf_counter() - start)
+
+    def observe(self, request, response, stats, seconds):
+        # label values come from the URLconf and a fixed set, not from clients
+        method = request.method if request.method in self.METHODS else 'other'
+        route = request.resolver_match.route if request.resolver_match is not None else UNMATCHED_ROUTE
+        size = None if response.streaming else len(response.content)
+        request_metrics.observe(method, route, response.status_code, seconds, size, stats)
+        timing = f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries", total;dur={seconds * 1000:.1f}'
+        if response.has_header('Server-Timing'):
+            timing = f'{response["Server-Timing"]}, {timing}'
+        response['Server-Timing'] = timing
+        return response
@@ -1,10 +1,47 @@
 from rest_framework import serializers
 
-# Add your serializers here
-# Example:
-# from .models import YourModel
-#
-# class YourModelSerializer(serializers.ModelSerializer):
-#     class Meta:
-#         model = YourModel
-#         fields = '__all__'
+from apps.pois.geo import parse_bbox
+from .geocoding import normalize_query
+
+GEOCODING_TYPES = ('country', 'region', 'postcode', 'district', 'place', 'locality', 'neighborhood', 'address', 'poi')
+
+
+class GeocodeQuerySerializer(serializers.Serializer):
+    """
+    Parameters of /api/geocode/, normalized so that equivalent queries share
+    a cache entry: coordinates are rounded, to ~1km for the proximity bias
+    """
+    q = serializers.CharField(max_length=256)
+    types = serializers.CharField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=10, default=5)
+    proximity = serializers.CharField(required=False)
+    bbox = serializers.CharField(required=False)
+    autocomplete = serializers.BooleanField(default=True)
+
+    def validate_q(self, value):
+        value = normalize_query(value)
+        if not value:
+            raise serializers.ValidationError("q must not be blank.")
+        return value
+
+    def validate_types(self, value):
+        types = sorted({name.strip() for name in value.split(',') if name.strip()})
+        unknown = [name for name in types if name not in GEOCODING_TYPES]
+        if unknown:
+            raise serializers.ValidationError(f"Unknown types: {', '.join(unknown)}.")
+        return tuple(types)
+
+    def validate_proximity(self, value):
+        try:
+            longitude, latitude = (float(part) for part in value.split(','))
+        except ValueError:
+            raise serializers.ValidationError("proximity must be 'lng,lat'.")
+        if not (-180 <= longitude <= 180 and -90 <= latitude <= 90):
+            raise serializers.ValidationError("proximity is out of range.")
+        return round(longitude, 2), round(latitude, 2)
+
+    def validate_bbox(self, value):
+        try:
+            return tuple(round(float(part), 4) for part in parse_bbox(value))
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
@@ -0,0 +1,13 @@
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .metrics import record_query
+
+
+@receiver(connection_created)
+def count_queries(sender, connection, **kwargs):
+    """Count the queries of every connection towards the request they run for"""
+    if record_query not in connection.execute_wrappers:
+        # first in the list, so outermost: it times the other wrappers too, and
+        # execute_wrapper() blocks, which pop the last wrapper on exit, leave it in place
+        connection.execute_wrappers.insert(0, record_query)
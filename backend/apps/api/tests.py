@@ -0,0 +1,364 @@
+import asyncio
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import AsyncClient, SimpleTestCase, override_settings
+from django.urls import reverse
+from psycopg_pool import PoolTimeout
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .geocoding import Geocoder, LRUCache, MapboxClient, get_geocoder
+from .metrics import Histogram, request_metrics
+
+User = get_user_model()
+
+
+class HealthCheckTests(APITestCase):
+    def setUp(self):
+        self.health_url = reverse('api:health-check')
+
+    async def test_health_check(self):
+        response = await AsyncClient().get(self.health_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'status': 'ok', 'message': 'API is running'})
+
+    async def test_method_not_allowed(self):
+        response = await AsyncClient().post(self.health_url)
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_sync_client(self):
+        response = self.client.get(self.health_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class DatabasePoolTests(APITestCase):
+    def setUp(self):
+        self.pool_url = reverse('api:database-pool')
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='testpass123')
+
+    def test_pool_timeout_is_503(self):
+        async def exhausted(user_id):
+            try:
+                raise PoolTimeout("couldn't get a connection after 5.00 sec")
+            except PoolTimeout as e:
+                raise OperationalError(str(e)) from e
+
+        self.client.force_authenticate(user=self.user)
+        with patch('apps.pois.async_views.aget_data_version', exhausted):
+            response = self.client.get(reverse('api:pois:pois'))
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_other_database_errors_are_not_handled(self):
+        async def broken(user_id):
+            raise OperationalError('server closed the connection unexpectedly')
+
+        self.client.force_authenticate(user=self.user)
+        with patch('apps.pois.async_views.aget_data_version', broken):
+            with self.assertRaises(OperationalError):
+                self.client.get(reverse('api:pois:pois'))
+
+    def test_stats_require_admin(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.pool_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_stats(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(self.pool_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        if connection.vendor == 'postgresql' and connection.pool is not None:
+            self.assertIn('default', response.data['pools'])
+            self.assertGreaterEqual(response.data['pools']['default']['pool_in_use'], 1)
+        else:
+            self.assertEqual(response.data['pools'], {})
+
+    @skipUnless(getattr(connection, 'pool', None) is not None, 'needs the pooled PostgreSQL backend')
+    def test_checkout_replaces_broken_connections(self):
+        pool = connection.pool
+        with pool.connection() as conn:
+            pid = conn.info.backend_pid
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_terminate_backend(%s, 5000)', [pid])
+        lost = pool.get_stats().get('connections_lost', 0)
+        for _ in range(pool.max_size):
+            with pool.connection() as conn:
+                self.assertEqual(conn.execute('SELECT 1').fetchone(), (1,))
+        self.assertEqual(pool.get_stats().get('connections_lost', 0), lost + 1)
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.auth_headers = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        self.metrics_url = reverse('api:metrics')
+        self.health_url = reverse('api:health-check')
+        self.pois_url = reverse('api:pois:pois')
+        request_metrics.reset()
+        cache.clear()
+
+    def server_timing(self, response):
+        match = re.fullmatch(r'db;dur=([\d.]+);desc="(\d+) queries", total;dur=([\d.]+)', response['Server-Timing'])
+        self.assertIsNotNone(match, response['Server-Timing'])
+        return float(match[1]), int(match[2]), float(match[3])
+
+    def test_server_timing(self):
+        response = self.client.get(self.health_url)
+        self.assertEqual(self.server_timing(response)[1], 0)
+
+        response = self.client.get(self.pois_url, headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        db, queries, total = self.server_timing(response)
+        self.assertGreater(queries, 0)
+        self.assertLessEqual(db, total)
+
+    async def test_server_timing_async(self):
+        response = await AsyncClient().get(self.pois_url, headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # queries run in worker threads and still count towards the request
+        self.assertGreater(self.server_timing(response)[1], 0)
+
+    def test_metrics(self):
+        self.client.get(self.health_url)
+        self.client.get(self.health_url)
+        self.client.get(self.pois_url, headers=self.auth_headers)
+        self.client.get('/nowhere/')
+
+        with self.settings(METRICS_TOKEN='secret'):
+            response = self.client.get(self.metrics_url, headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        lines = response.content.decode().splitlines()
+        self.assertIn('# TYPE http_requests_total counter', lines)
+        self.assertIn('http_requests_total{method="GET",route="api/health/",status="200"} 2', lines)
+        self.assertIn('http_requests_total{method="GET",route="api/pois/",status="200"} 1', lines)
+        self.assertIn('http_requests_total{method="GET",route="<unmatched>",status="404"} 1', lines)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="api/health/"} 2', lines)
+        self.assertIn('http_request_db_queries_bucket{method="GET",route="api/health/",le="0"} 2', lines)
+        self.assertIn('http_request_db_queries_bucket{method="GET",route="api/pois/",le="0"} 0', lines)
+        self.assertIn('http_response_size_bytes_bucket{method="GET",route="api/health/",le="100"} 2', lines)
+
+    def test_metrics_token(self):
+        with self.settings(METRICS_TOKEN='secret'):
+            response = self.client.get(self.metrics_url)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            response = self.client.get(self.metrics_url, headers={'Authorization': 'Bearer secret'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_metrics_without_token_need_staff(self):
+        with self.settings(METRICS_TOKEN=''):
+            response = self.client.get(self.metrics_url)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+            self.client.force_login(self.user)
+            response = self.client.get(self.metrics_url)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+            self.client.force_login(User.objects.create_user(username='admin', password='admin1234', is_staff=True))
+            response = self.client.get(self.metrics_url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_histogram(self):
+        histogram = Histogram('latency', 'Latency.', ('route',), (0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(('a"b',), value)
+        lines = []
+        histogram.render(lines)
+        self.assertEqual(lines, [
+            '# HELP latency Latency.',
+            '# TYPE latency histogram',
+            'latency_bucket{route="a\\"b",le="0.1"} 2',
+            'latency_bucket{route="a\\"b",le="1"} 3',
+            'latency_bucket{route="a\\"b",le="+Inf"} 4',
+            'latency_sum{route="a\\"b"} 3.65',
+            'latency_count{route="a\\"b"} 4',
+        ])
+
+
+class StubGeocodingHandler(BaseHTTPRequestHandler):
+    """Answers like the Mapbox geocoding API, as configured on its server"""
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        time.sleep(self.server.delay)
+        body = json.dumps({'type': 'FeatureCollection', 'features': [{'place_name': self.path}]}).encode()
+        self.send_response(self.server.status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        # closed without telling the client, like an idle timeout
+        self.close_connection = self.server.drop_connections
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubGeocodingServer(ThreadingHTTPServer):
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubGeocodingHandler)
+        self.paths, self.connections = [], 0
+        self.status, self.delay, self.drop_connections = 200, 0, False
+
+    def handle_error(self, request, client_address):
+        # clients that timed out hang up before the response
+        pass
+
+
+class GeocodeTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.auth_headers = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        self.geocode_url = reverse('api:geocode')
+        self.server = StubGeocodingServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        settings = override_settings(
+            GEOCODING_URL=f'http://127.0.0.1:{self.server.server_port}/geocoding/v5/mapbox.places/',
+            MAPBOX_TOKEN='test-token',
+            GEOCODING_TIMEOUT=1,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        request_metrics.reset()
+
+    def test_requires_authentication(self):
+        response = self.client.get(self.geocode_url, {'q': 'paris'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.server.paths, [])
+
+    def test_geocode(self):
+        response = self.client.get(self.geocode_url, {
+            'q': 'Paris', 'types': 'poi,place', 'limit': 8, 'proximity': '2.3522,48.8566',
+        }, headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Cache-Control'], 'private, max-age=300')
+        self.assertEqual(response.data['type'], 'FeatureCollection')
+        path, = self.server.paths
+        self.assertTrue(path.startswith('/geocoding/v5/mapbox.places/paris.json?'), path)
+        for param in ('access_token=test-token', 'limit=8', 'types=place%2Cpoi', 'proximity=2.35%2C48.86',
+                      'autocomplete=true'):
+            self.assertIn(param, path)
+
+    def test_equivalent_queries_are_cached(self):
+        for q in ('Paris', '  paris ', 'PARIS'):
+            response = self.client.get(self.geocode_url, {'q': q}, headers=self.auth_headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(self.server.paths), 1)
+
+        response = self.client.get(self.geocode_url, {'q': 'paris', 'types': 'place'}, headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(self.server.paths), 2)
+        self.assertEqual(get_geocoder().stats, {'cache_hits': 2, 'upstream_requests': 2, 'coalesced': 0})
+
+    def test_invalid_parameters(self):
+        for params in ({}, {'q': '   '}, {'q': 'x' * 257}, {'q': 'paris', 'types': 'city'},
+                       {'q': 'paris', 'limit': 11}, {'q': 'paris', 'proximity': '2.35'},
+                       {'q': 'paris', 'proximity': '200,48'}, {'q': 'paris', 'bbox': '1,2,3'}):
+            response = self.client.get(self.geocode_url, params, headers=self.auth_headers)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+        self.assertEqual(self.server.paths, [])
+
+    def test_upstream_errors(self):
+        for upstream_status, expected in ((500, status.HTTP_502_BAD_GATEWAY),
+                                          (429, status.HTTP_503_SERVICE_UNAVAILABLE)):
+            self.server.status = upstream_status
+            response = self.client.get(self.geocode_url, {'q': 'paris'}, headers=self.auth_headers)
+            self.assertEqual(response.status_code, expected)
+            self.assertIn('detail', response.data)
+
+        # errors are not cached
+        self.server.status = 200
+        response = self.client.get(self.geocode_url, {'q': 'paris'}, headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(self.server.paths), 3)
+
+    def test_upstream_timeout(self):
+        self.server.delay = 0.5
+        with self.settings(GEOCODING_TIMEOUT=0.1):
+            response = self.client.get(self.geocode_url, {'q': 'paris'}, headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_504_GATEWAY_TIMEOUT)
+
+    def test_upstream_unreachable(self):
+        with self.settings(GEOCODING_URL='http://127.0.0.1:1/'):
+            response = self.client.get(self.geocode_url, {'q': 'paris'}, headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_502_BAD_GATEWAY)
+
+    async def test_concurrent_queries_are_coalesced(self):
+        self.server.delay = 0.3
+        client = AsyncClient()
+        responses = await asyncio.gather(*(
+            client.get(self.geocode_url, {'q': q}, headers=self.auth_headers) for q in ('Rome', 'rome', ' ROME')
+        ))
+        self.assertEqual([response.status_code for response in responses], [status.HTTP_200_OK] * 3)
+        self.assertEqual(len({response.content for response in responses}), 1)
+        self.assertEqual(len(self.server.paths), 1)
+        self.assertEqual(get_geocoder().stats['coalesced'], 2)
+
+    def test_concurrent_queries_are_coalesced_across_threads(self):
+        self.server.delay = 0.3
+        geocoder = Geocoder(MapboxClient(), 100, 60)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(geocoder.geocode('rome'))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 5)
+        self.assertEqual(len(self.server.paths), 1)
+        self.assertEqual(geocoder.stats, {'cache_hits': 0, 'upstream_requests': 1, 'coalesced': 4})
+
+    def test_connection_reuse(self):
+        client = MapboxClient()
+        for q in ('paris', 'rome', 'oslo'):
+            client.geocode(q)
+        self.assertEqual(self.server.connections, 1)
+
+        # a connection the service closed while idle is replaced
+        self.server.drop_connections = True
+        client.geocode('bern')
+        client.geocode('riga')
+        self.assertEqual(len(self.server.paths), 5)
+        self.assertEqual(self.server.connections, 2)
+
+    def test_metrics(self):
+        self.client.get(self.geocode_url, {'q': 'paris'}, headers=self.auth_headers)
+        self.client.get(self.geocode_url, {'q': 'paris'}, headers=self.auth_headers)
+        with self.settings(METRICS_TOKEN='secret'):
+            response = self.client.get(reverse('api:metrics'), headers={'Authorization': 'Bearer secret'})
+        lines = response.content.decode().splitlines()
+        self.assertIn('geocode_upstream_requests_total 1', lines)
+        self.assertIn('geocode_cache_hits_total 1', lines)
+        self.assertIn('geocode_coalesced_total 0', lines)
+
+
+class LRUCacheTests(SimpleTestCase):
+    def test_eviction_and_expiry(self):
+        now = [0]
+        lru = LRUCache(2, ttl=10, clock=lambda: now[0])
+        lru.set('a', 1)
+        lru.set('b', 2)
+        self.assertEqual(lru.get('a'), 1)
+        lru.set('c', 3)
+        # b was the least recently used
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual((lru.get('a'), lru.get('c')), (1, 3))
+
+        now[0] = 10
+        self.assertIsNone(lru.get('a'))
+        self.assertEqual(len(lru), 1)
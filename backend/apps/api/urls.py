@@ -5,6 +5,10 @@ app_name = 'api'
 
 urlpatterns = [
     path('health/', views.health_check, name='health-check'),
+    path('database/pool/', views.database_pool, name='database-pool'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('geocode/', views.geocode, name='geocode'),
     path('users/', include('apps.users.urls', namespace='apps.users')),
     path('pois/', include('apps.pois.urls', namespace='apps.pois')),
+    path('places/', include('apps.places.urls', namespace='apps.places')),
 ]
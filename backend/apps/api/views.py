@@ -1,5 +1,16 @@
-from rest_framework.decorators import api_view
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from apps.core.postgresql.base import pool_stats
+from .async_views import AsyncAPIView
+from .geocoding import GeocodingError, get_geocoder
+from .metrics import CONTENT_TYPE, request_metrics
+from .serializers import GeocodeQuerySerializer
 
 # Example view - you can expand this with your models and serializers
 
@@ -15,7 +26,60 @@ def api_root(request):
     })
 
 
-@api_view(['GET'])
-def health_check(request):
+class HealthCheckView(AsyncAPIView):
     """Health check endpoint"""
-    return Response({'status': 'ok', 'message': 'API is running'})
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+
+    async def get(self, request):
+        return Response({'status': 'ok', 'message': 'API is running'})
+
+
+health_check = HealthCheckView.as_view()
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def database_pool(request):
+    """Connection pool statistics of the process serving the request"""
+    return Response({'pools': pool_stats()})
+
+
+def metrics(request):
+    """
+    Request and connection pool metrics of the serving process, for
+    Prometheus. Needs ``Authorization: Bearer <METRICS_TOKEN>``, or a staff
+    session when no token is set: routes and volumes are not public.
+    """
+    if request.method != 'GET':
+        return HttpResponse(status=405, headers={'Allow': 'GET'})
+    if settings.METRICS_TOKEN:
+        expected = f'Bearer {settings.METRICS_TOKEN}'
+        if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected.encode()):
+            return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer realm="metrics"'})
+    elif not (request.user.is_active and request.user.is_staff):
+        return HttpResponse(status=404)
+    return HttpResponse(request_metrics.render(), content_type=CONTENT_TYPE)
+
+
+class GeocodeView(AsyncAPIView):
+    """
+    Forward geocoding (Mapbox ``FeatureCollection``) through the cache and
+    request coalescing of apps.api.geocoding
+    """
+    permission_classes = (IsAuthenticated,)
+
+    async def get(self, request):
+        query = GeocodeQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = dict(query.validated_data)
+        try:
+            data = await get_geocoder().ageocode(params.pop('q'), **params)
+        except GeocodingError as e:
+            return Response({'detail': str(e)}, status=e.status_code)
+        # lets the browser answer repeated keystrokes on its own too
+        return Response(data, headers={'Cache-Control': f'private, max-age={settings.GEOCODING_BROWSER_CACHE_TTL}'})
+
+
+geocode = GeocodeView.as_view()
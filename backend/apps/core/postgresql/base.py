@@ -0,0 +1,125 @@
+"""
+PostgreSQL backend with a psycopg_pool connection pool.
+
+Django 5.0 opens a new connection for every request (``CONN_MAX_AGE = 0``).
+With ``OPTIONS['pool']`` set (``True`` or ConnectionPool keyword arguments
+such as ``min_size``, ``max_size`` and ``timeout``) connections are checked
+out of a per-process pool instead and returned to it when Django closes them,
+which it still does at the end of every request. This is the ``pool`` option
+Django 5.1 adds to its own backend, so the ENGINE can go back to
+``django.db.backends.postgresql`` after upgrading.
+
+With ``CONN_HEALTH_CHECKS`` a connection is checked on checkout and replaced
+if the server went away. When every connection stays in use for ``timeout``
+seconds the checkout fails with an OperationalError caused by
+``psycopg_pool.PoolTimeout``, see ``apps.api.middleware``.
+
+Pools are opened on first use, so they are not shared by forked workers as
+long as nothing queries the database before the fork.
+"""
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base, creation
+from psycopg import IsolationLevel
+from psycopg_pool import ConnectionPool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def create_test_db(self, *args, **kwargs):
+        # pooled connections would keep pointing at the database being replaced
+        self.connection.close_pool()
+        return super().create_test_db(*args, **kwargs)
+
+    def destroy_test_db(self, *args, **kwargs):
+        # a database can't be dropped while pooled connections are open
+        self.connection.close_pool()
+        super().destroy_test_db(*args, **kwargs)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    # one pool per alias and process, shared by the wrappers of every thread
+    _connection_pools = {}
+    _pools_lock = threading.Lock()
+
+    @property
+    def pool(self):
+        pool_options = self.settings_dict['OPTIONS'].get('pool')
+        if self.alias == NO_DB_ALIAS or not pool_options:
+            return None
+        if self.alias not in self._connection_pools:
+            if self.settings_dict['CONN_MAX_AGE'] != 0:
+                raise ImproperlyConfigured('Pooled connections require CONN_MAX_AGE = 0.')
+            with self._pools_lock:
+                if self.alias not in self._connection_pools:
+                    self._connection_pools[self.alias] = ConnectionPool(
+                        kwargs=self.get_connection_params(),
+                        open=False,
+                        configure=self.configure_connection,
+                        check=ConnectionPool.check_connection if self.settings_dict['CONN_HEALTH_CHECKS'] else None,
+                        name=self.alias,
+                        **(pool_options if isinstance(pool_options, dict) else {}),
+                    )
+        return self._connection_pools[self.alias]
+
+    def close_pool(self):
+        self.close()
+        with self._pools_lock:
+            pool = self._connection_pools.pop(self.alias, None)
+        if pool is not None:
+            pool.close()
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    def get_isolation_level(self):
+        try:
+            return IsolationLevel(self.settings_dict['OPTIONS'].get('isolation_level', IsolationLevel.READ_COMMITTED))
+        except ValueError:
+            raise ImproperlyConfigured(
+                f'Invalid transaction isolation level {self.settings_dict["OPTIONS"]["isolation_level"]} '
+                f'specified. Use one of the psycopg.IsolationLevel values.'
+            )
+
+    def configure_connection(self, connection):
+        # runs once per pooled connection, like the parent's get_new_connection
+        if 'isolation_level' in self.settings_dict['OPTIONS']:
+            connection.isolation_level = self.get_isolation_level()
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        self.isolation_level = self.get_isolation_level()
+        # no-op once the pool is open
+        pool.open()
+        return pool.getconn()
+
+    def _close(self):
+        # the pool the connection came from, even if close_pool() replaced it
+        pool = getattr(self.connection, '_pool', None)
+        if pool is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            pool.putconn(self.connection)
+            self.connection = None
+
+
+def pool_stats():
+    """
+    Statistics of the pools open in this process, by alias, with psycopg_pool's
+    counters (``requests_waiting``, ``requests_wait_ms``, ``requests_errors``
+    for timeouts, ...) and ``pool_in_use``.
+    """
+    stats = {}
+    for alias, pool in list(DatabaseWrapper._connection_pools.items()):
+        values = pool.get_stats()
+        values['pool_in_use'] = values.get('pool_size', 0) - values.get('pool_available', 0)
+        stats[alias] = values
+    return stats
@@ -0,0 +1,84 @@
+"""
+Read replica routing.
+
+Views opt in with ``replica_reads``: the ORM reads they make go to one of
+``DATABASE_REPLICAS``, picked once per request so every read of the request
+sees the same point of replication. Everything else, including all writes,
+uses ``default``.
+
+Replicas lag behind the primary, so a user who just wrote is pinned to the
+primary for ``REPLICA_PIN_SECONDS`` after the write commits (read your
+writes). Writes call ``pin_to_primary``; the pin lives in the cache so it
+holds across processes when the cache is shared (Redis).
+"""
+import random
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# alias the reads of the current request go to, None for the primary
+read_alias = ContextVar('read_alias', default=None)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        return read_alias.get()
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+def pin_key(user_id):
+    return f'replicas:pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Send the user's reads to the primary until the current write has replicated"""
+    if not settings.DATABASE_REPLICAS or user_id is None:
+        return
+    cache.set(pin_key(user_id), True, settings.REPLICA_PIN_SECONDS)
+    # the lag counts from the commit
+    transaction.on_commit(lambda: cache.set(pin_key(user_id), True, settings.REPLICA_PIN_SECONDS))
+
+
+def choose_replica(pinned):
+    if pinned or not settings.DATABASE_REPLICAS:
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+def replica_reads(handler):
+    """
+    Decorate a view's (sync or async) safe method handler so its reads go to
+    a replica, unless ``request.user`` is pinned to the primary.
+    """
+    if iscoroutinefunction(handler):
+        @wraps(handler)
+        async def wrapper(self, request, *args, **kwargs):
+            user_id = request.user.pk
+            pinned = bool(settings.DATABASE_REPLICAS) and user_id is not None and await cache.aget(pin_key(user_id))
+            token = read_alias.set(choose_replica(pinned))
+            try:
+                return await handler(self, request, *args, **kwargs)
+            finally:
+                read_alias.reset(token)
+    else:
+        @wraps(handler)
+        def wrapper(self, request, *args, **kwargs):
+            user_id = request.user.pk
+            pinned = bool(settings.DATABASE_REPLICAS) and user_id is not None and cache.get(pin_key(user_id))
+            token = read_alias.set(choose_replica(pinned))
+            try:
+                return handler(self, request, *args, **kwargs)
+            finally:
+                read_alias.reset(token)
+    return wrapper
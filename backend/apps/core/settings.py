@@ -1,6 +1,7 @@
 """
 Django settings for proxication project.
 """
+import copy
 import os
 from pathlib import Path
 from datetime import timedelta
@@ -40,9 +41,11 @@ INSTALLED_APPS = [
     'apps.api',
     'apps.users',
     'apps.pois',
+    'apps.places',
 ]
 
 MIDDLEWARE = [
+    'apps.api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -51,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.api.middleware.DatabaseUnavailableMiddleware',
 ]
 
 ROOT_URLCONF = 'apps.core.urls'
@@ -77,17 +81,105 @@ WSGI_APPLICATION = 'apps.core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Connections come from a per-process pool (see apps.core.postgresql) unless
+# DB_POOL is False; checkouts wait at most DB_POOL_TIMEOUT seconds
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'apps.core.postgresql',
         'NAME': os.getenv('DB_NAME', 'proxication_db'),
         'USER': os.getenv('DB_USER', 'postgres'),
         'PASSWORD': os.getenv('DB_PASSWORD', 'postgres'),
         'HOST': os.getenv('DB_HOST', 'localhost'),
         'PORT': os.getenv('DB_PORT', '5432'),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': os.getenv('DB_POOL', 'True') == 'True' and {
+                'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+                'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+                'timeout': float(os.getenv('DB_POOL_TIMEOUT', '5')),
+            },
+        },
     }
 }
 
+# Read replicas, DB_REPLICA_HOSTS=host[:port],... with the credentials of the
+# primary. Views opt in to replica reads, see apps.core.routers.
+
+DATABASE_REPLICAS = []
+for index, replica_host in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(','))):
+    replica_host, _, replica_port = replica_host.partition(':')
+    DATABASES[f'replica_{index}'] = {
+        **copy.deepcopy(DATABASES['default']),
+        'HOST': replica_host,
+        'PORT': replica_port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{index}')
+
+DATABASE_ROUTERS = ['apps.core.routers.ReplicaRouter']
+
+# Seconds a user's reads stay on the primary after they wrote, longer than
+# the replication lag
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '5'))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Redis (requires the redis package) when REDIS_URL is set, else a per-process
+# locmem cache bounded to CACHE_MAX_ENTRIES
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'proxication',
+            'OPTIONS': {
+                'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '10000')),
+            },
+        }
+    }
+
+# Seconds a serialized POI list/detail payload stays cached
+POI_CACHE_TIMEOUT = int(os.getenv('POI_CACHE_TIMEOUT', '300'))
+
+# Seconds an authenticated user row stays cached
+USER_CACHE_TIMEOUT = int(os.getenv('USER_CACHE_TIMEOUT', '60'))
+
+# Seconds between each process pulling tokens revoked by other processes
+TOKEN_REVOCATION_SYNC_INTERVAL = int(os.getenv('TOKEN_REVOCATION_SYNC_INTERVAL', '5'))
+
+# Bearer token /api/metrics/ requires; if empty, only staff sessions (e.g. of the admin) can read it
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Upstream of /api/geocode/: a client class (see apps.api.geocoding) and its settings
+GEOCODING_CLIENT = os.getenv('GEOCODING_CLIENT', 'apps.api.geocoding.MapboxClient')
+GEOCODING_URL = os.getenv('GEOCODING_URL', 'https://api.mapbox.com/geocoding/v5/mapbox.places/')
+GEOCODING_TIMEOUT = float(os.getenv('GEOCODING_TIMEOUT', '5'))
+MAPBOX_TOKEN = os.getenv('MAPBOX_TOKEN', '')
+# Geocoding responses cached per process, for how many seconds, and by browsers
+GEOCODING_CACHE_SIZE = int(os.getenv('GEOCODING_CACHE_SIZE', '10000'))
+GEOCODING_CACHE_TTL = int(os.getenv('GEOCODING_CACHE_TTL', '3600'))
+GEOCODING_BROWSER_CACHE_TTL = int(os.getenv('GEOCODING_BROWSER_CACHE_TTL', '300'))
+
+# Push of POI changes (/api/pois/events/): the broker class (see
+# apps.pois.events), events queued per stream before a slow client must
+# reload, and seconds between heartbeats on idle streams
+POI_EVENTS_BROKER = os.getenv('POI_EVENTS_BROKER', 'apps.pois.events.LocalBroker')
+POI_EVENTS_QUEUE_SIZE = int(os.getenv('POI_EVENTS_QUEUE_SIZE', '100'))
+POI_EVENTS_HEARTBEAT = float(os.getenv('POI_EVENTS_HEARTBEAT', '20'))
+
+# City autocomplete: an index written by build_gazetteer, or a GeoNames cities
+# file indexed in memory on first use. Autocomplete answers 503 without one.
+GAZETTEER_PATH = os.getenv('GAZETTEER_PATH', '')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -140,7 +232,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.users.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
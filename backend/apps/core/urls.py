@@ -2,9 +2,9 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
-    TokenRefreshView,
     TokenVerifyView,
 )
+from apps.users.views import TokenRefreshView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -0,0 +1,281 @@
+"""
+Offline city autocomplete for /api/places/autocomplete/.
+
+The gazetteer is built from a GeoNames cities file (``cities500.txt`` and the
+like: tab separated, one populated place per line) into a single binary index
+that is memory-mapped, so opening it costs nothing and the processes of a
+server share its pages. The index holds:
+
+- the places: GeoNames id, coordinates, population, country code and name,
+  in fixed-width arrays plus a blob of names;
+- the search keys, normalized names (see normalize) in sorted order, each
+  pointing to its place. The keys starting with a prefix are a contiguous
+  range, found by binary search;
+- for every prefix matching more than ``scan_limit`` keys, its ``top_k``
+  most populated places, computed when building. Smaller ranges are ranked
+  when queried.
+
+A lookup is then a binary search over the keys, a short one to find where
+their range ends, and either a binary search over the prefixes or ranking at
+most ``scan_limit`` keys. Arrays are in native byte order: build the index on the architecture
+that serves it.
+"""
+import bisect
+import heapq
+import io
+import mmap
+import re
+import struct
+import threading
+import unicodedata
+import zipfile
+from array import array
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+MAGIC = b'GAZETTR1'
+SCAN_LIMIT = 128
+TOP_K = 20
+# ids, latitudes, longitudes, populations, country codes, name offsets, names, key offsets, keys,
+# key places, top prefix offsets, top prefixes, top places
+SECTIONS = 'IddIBIBIBIIBI'
+HEADER = struct.Struct(f'<8sII{len(SECTIONS) * 2}Q')
+# padding of top place lists shorter than top_k
+NO_PLACE = 0xFFFFFFFF
+GEONAMES_COLUMNS = 19
+
+
+class GazetteerUnavailable(Exception):
+    pass
+
+
+def normalize(value):
+    """Case folded, without accents, words separated by single spaces"""
+    value = unicodedata.normalize('NFKD', value)
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(re.sub(r'[\W_]+', ' ', value.casefold()).split())
+
+
+def read_geonames(file, min_population=0, alternate_names=False):
+    """
+    Yield ``(id, name, latitude, longitude, population, country_code, names)``
+    for the lines of a GeoNames file, ``names`` being those it is searched by.
+    Raises ValueError.
+    """
+    for number, line in enumerate(file, 1):
+        fields = line.rstrip('\r\n').split('\t')
+        if len(fields) != GEONAMES_COLUMNS:
+            raise ValueError(f'Line {number}: expected {GEONAMES_COLUMNS} tab separated columns.')
+        try:
+            geoname_id, latitude, longitude = int(fields[0]), float(fields[4]), float(fields[5])
+            population = int(fields[14] or 0)
+        except ValueError:
+            raise ValueError(f'Line {number}: invalid id, coordinates or population.')
+        if population < min_population:
+            continue
+        names = [fields[1], fields[2]]
+        if alternate_names and fields[3]:
+            names += fields[3].split(',')
+        yield geoname_id, fields[1], latitude, longitude, population, fields[8], names
+
+
+def open_source(path):
+    """A GeoNames text file, or the text file in a GeoNames zip archive"""
+    if zipfile.is_zipfile(path):
+        archive = zipfile.ZipFile(path)
+        name = next((name for name in archive.namelist() if name.endswith('.txt')), None)
+        if name is None:
+            raise ValueError(f'No .txt file in {path}.')
+        return io.TextIOWrapper(archive.open(name), encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+class Blob:
+    """Byte strings stored end to end, with the offset of each"""
+
+    def __init__(self):
+        self.offsets = array('I', [0])
+        self.data = bytearray()
+
+    def add(self, value):
+        self.data += value
+        self.offsets.append(len(self.data))
+
+
+def build(places, scan_limit=SCAN_LIMIT, top_k=TOP_K):
+    """Return the index of ``places``, as yielded by read_geonames()"""
+    ids, latitudes, longitudes, populations = array('I'), array('d'), array('d'), array('I')
+    countries, names = bytearray(), Blob()
+    entries = []
+    for index, (geoname_id, name, latitude, longitude, population, country_code, aliases) in enumerate(places):
+        ids.append(geoname_id)
+        latitudes.append(latitude)
+        longitudes.append(longitude)
+        populations.append(population)
+        countries += country_code.encode('ascii', 'replace')[:2].ljust(2)
+        names.add(name.encode())
+        entries.extend((key, index) for key in {normalize(alias) for alias in aliases} if key)
+    entries.sort()
+
+    keys = [key for key, _ in entries]
+    key_places = array('I', (index for _, index in entries))
+    top = {}
+    rank_range(keys, key_places, lambda index: (-populations[index], index), scan_limit, top_k, 0, len(keys), 0, top)
+
+    encoded_keys, top_prefixes, top_places = Blob(), Blob(), array('I')
+    for key in keys:
+        encoded_keys.add(key.encode())
+    for prefix in sorted(top):
+        top_prefixes.add(prefix.encode())
+        top_places.extend(top[prefix] + [NO_PLACE] * (top_k - len(top[prefix])))
+
+    sections = [
+        ids, latitudes, longitudes, populations, countries, names.offsets, names.data,
+        encoded_keys.offsets, encoded_keys.data, key_places, top_prefixes.offsets, top_prefixes.data, top_places,
+    ]
+    out = io.BytesIO()
+    out.seek(HEADER.size)
+    layout = []
+    for section in sections:
+        out.write(b'\0' * (-out.tell() % 8))
+        layout += [out.tell(), len(section) * (section.itemsize if isinstance(section, array) else 1)]
+        out.write(section)
+    out.seek(0)
+    out.write(HEADER.pack(MAGIC, scan_limit, top_k, *layout))
+    return out.getvalue()
+
+
+def rank_range(keys, key_places, rank, scan_limit, top_k, lo, hi, depth, top):
+    """
+    Return the ``top_k`` best ranked places of ``keys[lo:hi]``, which share
+    their first ``depth`` characters, and record those of the prefixes of
+    more than ``scan_limit`` keys in ``top``. Merging the places of the
+    subranges is enough: a place among the best of a range is among the best
+    of every subrange it is in.
+    """
+    if hi - lo <= scan_limit:
+        return heapq.nsmallest(top_k, set(key_places[lo:hi]), key=rank)
+    candidates = set()
+    start = lo
+    # keys equal to the prefix sort first
+    while start < hi and len(keys[start]) == depth:
+        candidates.add(key_places[start])
+        start += 1
+    while start < hi:
+        prefix = keys[start][:depth + 1]
+        end = bisect.bisect_left(keys, prefix + '\U0010ffff', start, hi)
+        candidates.update(rank_range(keys, key_places, rank, scan_limit, top_k, start, end, depth + 1, top))
+        start = end
+    places = heapq.nsmallest(top_k, candidates, key=rank)
+    top[keys[lo][:depth]] = places
+    return places
+
+
+class Strings:
+    """Sequence of the byte strings of a blob starting at ``start`` in ``buffer``, for bisect"""
+
+    def __init__(self, offsets, buffer, start):
+        self.offsets = offsets
+        # slicing the mmap or bytes object itself copies once, unlike a memoryview
+        self.buffer = buffer
+        self.start = start
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return self.buffer[self.start + self.offsets[index]:self.start + self.offsets[index + 1]]
+
+
+class Gazetteer:
+
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        magic, self.scan_limit, self.top_k, *layout = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError('Not a gazetteer index.')
+        starts = layout[::2]
+        (self.ids, self.latitudes, self.longitudes, self.populations, self.countries, name_offsets, _,
+         key_offsets, _, self.key_places, top_offsets, _, self.top_places) = (
+            view[start:start + length].cast(code) for code, start, length in zip(SECTIONS, starts, layout[1::2])
+        )
+        self.names = Strings(name_offsets, buffer, starts[6])
+        self.keys = Strings(key_offsets, buffer, starts[8])
+        self.top_prefixes = Strings(top_offsets, buffer, starts[11])
+
+    @classmethod
+    def open(cls, path):
+        """Map an index built by build_gazetteer, or build one from a GeoNames file"""
+        with open(path, 'rb') as file:
+            if file.read(len(MAGIC)) == MAGIC:
+                return cls(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+        with open_source(path) as file:
+            return cls(build(read_geonames(file)))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rank(self, index):
+        return -self.populations[index], index
+
+    def complete(self, q, limit=10):
+        """The ``limit`` (at most top_k) most populated places with a name starting with ``q``"""
+        prefix = normalize(q).encode()
+        limit = min(limit, self.top_k)
+        if not prefix:
+            return []
+        lo = bisect.bisect_left(self.keys, prefix)
+        # no UTF-8 sequence contains 0xff; only whether the range is small matters past scan_limit keys
+        hi = bisect.bisect_left(self.keys, prefix + b'\xff', lo, min(lo + self.scan_limit + 1, len(self.keys)))
+        if hi - lo > self.scan_limit:
+            start = bisect.bisect_left(self.top_prefixes, prefix) * self.top_k
+            places = [index for index in self.top_places[start:start + limit] if index != NO_PLACE]
+        else:
+            places = heapq.nsmallest(limit, set(self.key_places[lo:hi]), key=self.rank)
+        return [self.place(index) for index in places]
+
+    def place(self, index):
+        return {
+            'id': self.ids[index],
+            'name': self.names[index].decode(),
+            'country_code': self.countries[index * 2:index * 2 + 2].tobytes().decode().strip(),
+            'latitude': self.latitudes[index],
+            'longitude': self.longitudes[index],
+            'population': self.populations[index],
+        }
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """The gazetteer at ``GAZETTEER_PATH``, opened on first use"""
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                if not settings.GAZETTEER_PATH:
+                    raise GazetteerUnavailable('No gazetteer is configured.')
+                try:
+                    _gazetteer = Gazetteer.open(settings.GAZETTEER_PATH)
+                except (OSError, ValueError) as e:
+                    raise GazetteerUnavailable(f'Cannot open the gazetteer: {e}')
+    return _gazetteer
+
+
+async def aget_gazetteer():
+    if _gazetteer is not None:
+        return _gazetteer
+    # building from a GeoNames file takes seconds, keep it off the event loop
+    return await sync_to_async(get_gazetteer, thread_sensitive=False)()
+
+
+@receiver(setting_changed)
+def reset_gazetteer(setting, **kwargs):
+    global _gazetteer
+    if setting == 'GAZETTEER_PATH':
+        _gazetteer = None
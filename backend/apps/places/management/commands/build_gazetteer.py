@@ -0,0 +1,37 @@
+import os
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.places.gazetteer import Gazetteer, build, open_source, read_geonames
+
+
+class Command(BaseCommand):
+    help = 'Build the autocomplete index of a GeoNames cities file (e.g. cities500.txt or cities500.zip)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='GeoNames file, tab separated, or a zip archive of one')
+        parser.add_argument('output', help='Index file to write, for GAZETTEER_PATH')
+        parser.add_argument('--min-population', type=int, default=0, help='Skip smaller places')
+        parser.add_argument('--alternate-names', action='store_true',
+                            help='Also match the alternate names of places (a larger index)')
+
+    def handle(self, *args, **options):
+        output = Path(options['output'])
+        start = time.perf_counter()
+        try:
+            with open_source(options['source']) as file:
+                index = build(read_geonames(file, options['min_population'], options['alternate_names']))
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        # replaced in one step: running servers keep the old file mapped until they restart
+        partial = output.with_name(f'.{output.name}.partial')
+        partial.write_bytes(index)
+        os.replace(partial, output)
+        places = len(Gazetteer(index))
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {places:,} places in {time.perf_counter() - start:.1f}s, '
+            f'{len(index) / 2 ** 20:.1f} MiB written to {output}.'
+        ))
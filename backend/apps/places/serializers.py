@@ -0,0 +1,13 @@
+from rest_framework import serializers
+
+from .gazetteer import TOP_K, normalize
+
+
+class AutocompleteQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+    limit = serializers.IntegerField(min_value=1, max_value=TOP_K, default=10)
+
+    def validate_q(self, value):
+        if not normalize(value):
+            raise serializers.ValidationError("q must contain a letter or digit.")
+        return value
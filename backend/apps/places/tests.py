@@ -0,0 +1,162 @@
+import random
+import tempfile
+import zipfile
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .gazetteer import Gazetteer, build, normalize, read_geonames
+
+User = get_user_model()
+
+# id, name, ascii name, alternate names, latitude, longitude, country, population
+CITIES = [
+    (2988507, 'Paris', 'Paris', 'Lutetia,Parigi', 48.85341, 2.3488, 'FR', 2138551),
+    (4717560, 'Paris', 'Paris', '', 33.66094, -95.55551, 'US', 24171),
+    (3171457, 'Parma', 'Parma', '', 44.80107, 10.32897, 'IT', 146299),
+    (3383330, 'Paramaribo', 'Paramaribo', '', 5.86638, -55.16682, 'SR', 223757),
+    (3448439, 'São Paulo', 'Sao Paulo', 'Sampa', -23.5475, -46.63611, 'BR', 10021295),
+    (2980291, 'Saint-Étienne', 'Saint-Etienne', '', 45.43389, 4.39, 'FR', 171483),
+    (2950159, 'Berlin', 'Berlin', '', 52.52437, 13.41053, 'DE', 3426354),
+    (4930956, 'Boston', 'Boston', '', 42.35843, -71.05977, 'US', 617594),
+    (2643743, 'London', 'London', '', 51.50853, -0.12574, 'GB', 8961989),
+    (6058560, 'London', 'London', '', 42.98339, -81.23304, 'CA', 346765),
+]
+
+
+def geonames_line(geoname_id, name, ascii_name, alternate_names, latitude, longitude, country_code, population):
+    return '\t'.join(map(str, [
+        geoname_id, name, ascii_name, alternate_names, latitude, longitude, 'P', 'PPL', country_code, '', '', '', '',
+        '', population, '', '', 'Europe/Paris', '2024-01-01',
+    ])) + '\n'
+
+
+def geonames(cities=CITIES):
+    return ''.join(geonames_line(*city) for city in cities)
+
+
+class GazetteerTests(SimpleTestCase):
+    def setUp(self):
+        self.gazetteer = Gazetteer(build(read_geonames(StringIO(geonames()))))
+
+    def names(self, q, **kwargs):
+        return [(place['name'], place['country_code']) for place in self.gazetteer.complete(q, **kwargs)]
+
+    def test_complete(self):
+        self.assertEqual(self.names('par'), [('Paris', 'FR'), ('Paramaribo', 'SR'), ('Parma', 'IT'), ('Paris', 'US')])
+        self.assertEqual(self.names('par', limit=2), [('Paris', 'FR'), ('Paramaribo', 'SR')])
+        self.assertEqual(self.names('paris'), [('Paris', 'FR'), ('Paris', 'US')])
+        self.assertEqual(self.names('parisx'), [])
+        self.assertEqual(self.names('Lut'), [])
+        self.assertEqual(self.gazetteer.complete('berl'), [{
+            'id': 2950159, 'name': 'Berlin', 'country_code': 'DE', 'latitude': 52.52437, 'longitude': 13.41053,
+            'population': 3426354,
+        }])
+
+    def test_normalization(self):
+        self.assertEqual(normalize('  Saint-Étienne '), 'saint etienne')
+        self.assertEqual(self.names('SAO p'), [('São Paulo', 'BR')])
+        self.assertEqual(self.names('são'), [('São Paulo', 'BR')])
+        self.assertEqual(self.names('saint-ét'), [('Saint-Étienne', 'FR')])
+        self.assertEqual(self.names('-'), [])
+
+    def test_alternate_names(self):
+        gazetteer = Gazetteer(build(read_geonames(StringIO(geonames()), alternate_names=True)))
+        self.assertEqual([place['name'] for place in gazetteer.complete('lut')], ['Paris'])
+        self.assertEqual([place['name'] for place in gazetteer.complete('samp')], ['São Paulo'])
+
+    def test_precomputed_prefixes_rank_like_scanning(self):
+        rng = random.Random(0)
+        syllables = ['ba', 'be', 'sa', 'san', 'to', 'ri', 'o', 'ka', 'l', 'mo']
+        cities = [
+            (number, ''.join(rng.choices(syllables, k=rng.randint(1, 4))).title(), '', '', 0, 0, 'XX',
+             rng.choice([0, 100, int(rng.paretovariate(1.2) * 1000)]))
+            for number in range(1, 2000)
+        ]
+        places = list(read_geonames(StringIO(geonames(cities))))
+        scanned = Gazetteer(build(places, scan_limit=10 ** 9))
+        precomputed = Gazetteer(build(places, scan_limit=4))
+        prefixes = {normalize(name)[:length] for _, name, *_ in cities for length in range(1, 6)}
+        for prefix in sorted(prefixes):
+            self.assertEqual(precomputed.complete(prefix, limit=20), scanned.complete(prefix, limit=20), prefix)
+
+    def test_invalid_source(self):
+        with self.assertRaisesMessage(ValueError, 'Line 2: expected 19 tab separated columns.'):
+            list(read_geonames(StringIO(geonames(CITIES[:1]) + 'Paris\t2.35\n')))
+        with self.assertRaisesMessage(ValueError, 'Not a gazetteer index.'):
+            Gazetteer(b'\0' * 1024)
+
+
+class BuildGazetteerTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.source = self.directory / 'cities.txt'
+        self.source.write_text(geonames(), encoding='utf-8')
+
+    def test_build(self):
+        output = self.directory / 'cities.idx'
+        out = StringIO()
+        call_command('build_gazetteer', str(self.source), str(output), '--min-population', '200000', stdout=out)
+        self.assertIn('Indexed 7 places', out.getvalue())
+        gazetteer = Gazetteer.open(output)
+        self.assertEqual([place['name'] for place in gazetteer.complete('par')], ['Paris', 'Paramaribo'])
+
+    def test_build_from_zip(self):
+        archive = self.directory / 'cities.zip'
+        with zipfile.ZipFile(archive, 'w') as file:
+            file.write(self.source, 'cities.txt')
+        output = self.directory / 'cities.idx'
+        call_command('build_gazetteer', str(archive), str(output), stdout=StringIO())
+        self.assertEqual(len(Gazetteer.open(output)), len(CITIES))
+
+    def test_invalid_source(self):
+        self.source.write_text('not a gazetteer\n')
+        with self.assertRaisesMessage(CommandError, 'Line 1: expected 19 tab separated columns.'):
+            call_command('build_gazetteer', str(self.source), str(self.directory / 'cities.idx'))
+
+
+class AutocompleteTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.auth_headers = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        self.autocomplete_url = reverse('api:places:autocomplete')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.source = Path(directory.name) / 'cities.txt'
+        self.source.write_text(geonames(), encoding='utf-8')
+
+    def test_autocomplete(self):
+        with override_settings(GAZETTEER_PATH=str(self.source)):
+            response = self.client.get(self.autocomplete_url, {'q': 'Lon', 'limit': 1}, headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [{
+            'id': 2643743, 'name': 'London', 'country_code': 'GB', 'latitude': 51.50853, 'longitude': -0.12574,
+            'population': 8961989,
+        }])
+
+    def test_requires_authentication(self):
+        with override_settings(GAZETTEER_PATH=str(self.source)):
+            response = self.client.get(self.autocomplete_url, {'q': 'Lon'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_parameters(self):
+        with override_settings(GAZETTEER_PATH=str(self.source)):
+            for params in ({}, {'q': ' - '}, {'q': 'lon', 'limit': 0}, {'q': 'lon', 'limit': 21}):
+                response = self.client.get(self.autocomplete_url, params, headers=self.auth_headers)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_unavailable(self):
+        for path in ('', str(self.source.with_name('missing.txt'))):
+            with override_settings(GAZETTEER_PATH=path):
+                response = self.client.get(self.autocomplete_url, {'q': 'lon'}, headers=self.auth_headers)
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertIn('detail', response.data)
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'places'
+
+urlpatterns = [
+    path('autocomplete/', views.AutocompleteView.as_view(), name='autocomplete'),
+]
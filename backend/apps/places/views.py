@@ -0,0 +1,24 @@
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from apps.api.async_views import AsyncAPIView
+
+from .gazetteer import GazetteerUnavailable, aget_gazetteer
+from .serializers import AutocompleteQuerySerializer
+
+
+class AutocompleteView(AsyncAPIView):
+    """Cities whose name starts with ``q``, most populated first"""
+    permission_classes = (IsAuthenticated,)
+
+    async def get(self, request):
+        query = AutocompleteQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            gazetteer = await aget_gazetteer()
+        except GazetteerUnavailable as e:
+            return Response({'detail': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        # an in-memory lookup of microseconds, no need for a worker thread
+        return Response({'results': gazetteer.complete(**query.validated_data)})
@@ -0,0 +1,134 @@
+"""
+Async versions of the hot read endpoints (list, detail, nearby, search).
+
+They mirror the GET handlers in views.py with the async ORM, so under ASGI a
+request waiting on the database or a slow client doesn't hold a thread.
+Writes on the same URLs are served by the sync views (see AsyncAPIView).
+"""
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.shortcuts import aget_object_or_404
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from apps.api.async_views import AsyncAPIView
+from apps.core.routers import replica_reads
+
+from . import cache, events, views
+from .models import POI
+from .nearby import anearest
+from .pagination import POICursorPagination
+from .permissions import IsOwner
+from .renderers import POIColumnsRenderer
+from .search import asearch
+from .serializers import (
+    NearbyQuerySerializer, POINearbySerializer, POISerializer, POIValuesSerializer, SearchQuerySerializer,
+)
+from .versions import aget_data_version, is_not_modified, make_etag, with_data_version
+
+
+class POIsView(AsyncAPIView):
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = (JSONRenderer, POIColumnsRenderer)
+    sync_view = views.POIsView
+
+    @replica_reads
+    async def get(self, request):
+        version = await aget_data_version(request.user.pk)
+        etag = make_etag(request, version)
+        if is_not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        try:
+            pois = views.list_queryset(request)
+        except ValueError as e:
+            return Response({'bbox': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        async def compute():
+            paginator = POICursorPagination()
+            page = await paginator.apaginate_queryset(pois, request, view=self)
+            return views.page_data(request, paginator, page)
+
+        data = await cache.aget_payload(version, etag, compute)
+        return Response(data, status=status.HTTP_200_OK, headers={'ETag': etag})
+
+
+class POIView(AsyncAPIView):
+    permission_classes = (IsAuthenticated, IsOwner,)
+    sync_view = views.POIView
+
+    @replica_reads
+    async def get(self, request, pk):
+        # ownership before the ETag, see views.POIView
+        poi = await aget_object_or_404(with_data_version(POI.objects.only('created_by'), request.user.pk), pk=pk)
+        self.check_object_permissions(request, poi)
+        version = poi.data_version or 0
+        etag = make_etag(request, version)
+        if is_not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        async def compute():
+            return POISerializer(await aget_object_or_404(POI.objects.select_related('created_by'), pk=pk)).data
+
+        data = await cache.aget_payload(version, etag, compute)
+        return Response(data, status=status.HTTP_200_OK, headers={'ETag': etag})
+
+
+class NearbyView(AsyncAPIView):
+    permission_classes = (IsAuthenticated,)
+    sync_view = views.NearbyView
+
+    async def get(self, request):
+        query = NearbyQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = query.validated_data
+        pois = POIValuesSerializer.values(POI.objects.filter(created_by=request.user))
+        results = await anearest(pois, params['lat'], params['lng'], params['k'], params.get('radius_m'))
+        serializer = POINearbySerializer(results, many=True)
+        return Response({'results': serializer.data}, status=status.HTTP_200_OK)
+
+
+class SearchView(AsyncAPIView):
+    permission_classes = (IsAuthenticated,)
+    sync_view = views.SearchView
+
+    @replica_reads
+    async def get(self, request):
+        query = SearchQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = query.validated_data
+
+        version = await aget_data_version(request.user.pk)
+        etag = make_etag(request, version)
+        if is_not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        async def compute():
+            results = await asearch(views.search_scope(request, params), params['q'], params['limit'])
+            return views.search_data(params, results)
+
+        data = await cache.aget_payload(version, etag, compute)
+        return Response(data, status=status.HTTP_200_OK, headers={'ETag': etag})
+
+
+class EventsView(AsyncAPIView):
+    """Server-sent events of the changes to the user's POIs, see events.py"""
+    permission_classes = (IsAuthenticated,)
+
+    async def get(self, request):
+        if not isinstance(request._request, ASGIRequest):
+            # a WSGI worker would buffer the endless response, and be held by it
+            return Response(
+                {'detail': 'Event streams need an ASGI server.'}, status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+        # streams end with the access token they were opened with, clients reconnect with a fresh one
+        expires_at = request.auth['exp'] if request.auth is not None else None
+        response = StreamingHttpResponse(events.stream(request.user.pk, expires_at), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # or nginx buffers the events
+        response['X-Accel-Buffering'] = 'no'
+        return response
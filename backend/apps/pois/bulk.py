@@ -0,0 +1,106 @@
+"""
+Batched POI writes for ``POST /api/pois/bulk/``.
+
+A batch is all or nothing: every operation is validated first, and only a
+fully valid batch is written, with one bulk INSERT, one bulk UPDATE and one
+DELETE in a single transaction. Results are returned per operation, in
+request order.
+"""
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+
+from . import events
+from .models import POI
+from .serializers import POISerializer
+from .versions import bump_data_version
+
+MAX_OPERATIONS = 500
+
+
+class BulkOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=['create', 'update', 'delete'])
+    id = serializers.IntegerField(required=False)
+    data = serializers.DictField(required=False)
+
+    def validate(self, attrs):
+        if attrs['op'] != 'create' and 'id' not in attrs:
+            raise serializers.ValidationError({'id': f"This field is required for '{attrs['op']}'."})
+        if attrs['op'] != 'delete' and 'data' not in attrs:
+            raise serializers.ValidationError({'data': f"This field is required for '{attrs['op']}'."})
+        return attrs
+
+
+class BulkRequestSerializer(serializers.Serializer):
+    operations = BulkOperationSerializer(many=True, allow_empty=False, max_length=MAX_OPERATIONS)
+
+
+def apply_operations(user, operations):
+    """
+    Validate and apply a batch of operations for ``user``.
+    Returns ``(applied, results)``; nothing is written unless every
+    operation is valid.
+    """
+    results = [None] * len(operations)
+    targets = {}
+    for index, operation in enumerate(operations):
+        if operation['op'] == 'create':
+            continue
+        if operation['id'] in targets:
+            results[index] = {'status': status.HTTP_400_BAD_REQUEST, 'errors': {'id': ['Duplicate id in batch.']}}
+        targets.setdefault(operation['id'], index)
+
+    instances = POI.objects.select_related('created_by').filter(created_by=user).in_bulk(list(targets))
+    for pk, index in targets.items():
+        if pk not in instances:
+            results[index] = {'status': status.HTTP_404_NOT_FOUND, 'errors': {'id': ['Not found.']}}
+
+    # creates and updates share the same payload rules, validate them in one pass
+    writes = [index for index, operation in enumerate(operations) if operation['op'] != 'delete']
+    serializer = POISerializer(data=[operations[index]['data'] for index in writes], many=True)
+    if not serializer.is_valid():
+        for index, errors in zip(writes, serializer.errors):
+            if errors and results[index] is None:
+                results[index] = {'status': status.HTTP_400_BAD_REQUEST, 'errors': errors}
+
+    if any(results):
+        failed = [result or {'status': status.HTTP_424_FAILED_DEPENDENCY} for result in results]
+        return False, failed
+
+    created, updated = [], []
+    now = timezone.now()
+    for index, validated_data in zip(writes, serializer.validated_data):
+        operation = operations[index]
+        if operation['op'] == 'create':
+            created.append((index, POI(created_by=user, **validated_data)))
+        else:
+            poi = instances[operation['id']]
+            for attr, value in validated_data.items():
+                setattr(poi, attr, value)
+            poi.updated_at = now
+            updated.append((index, poi))
+    deleted = [(index, operation['id']) for index, operation in enumerate(operations) if operation['op'] == 'delete']
+
+    with transaction.atomic():
+        POI.objects.bulk_create([poi for _, poi in created])
+        POI.objects.bulk_update(
+            [poi for _, poi in updated], ['name', 'description', 'latitude', 'longitude', 'updated_at']
+        )
+        POI.objects.filter(created_by=user, id__in=[pk for _, pk in deleted]).delete()
+        bump_data_version(user.pk)
+
+    for index, poi in created:
+        results[index] = {'status': status.HTTP_201_CREATED, 'data': POISerializer(poi).data}
+    for index, poi in updated:
+        results[index] = {'status': status.HTTP_200_OK, 'data': POISerializer(poi).data}
+    for index, pk in deleted:
+        results[index] = {'status': status.HTTP_204_NO_CONTENT, 'id': pk}
+    # committed already, unless the caller's transaction is still open
+    events.publish_on_commit(user.pk, [
+        events.created(results[index]['data']) for index, _ in created
+    ] + [
+        events.updated(results[index]['data']) for index, _ in updated
+    ] + [
+        events.deleted(pk) for _, pk in deleted
+    ])
+    return True, results
@@ -0,0 +1,93 @@
+"""
+Per-user caching for derived POI data (clusters, vector tiles) and for the
+serialized payloads of the list and detail endpoints.
+
+Every cached key embeds the user's data version (see versions.py). Writes
+bump the version, so all of a user's cached entries are invalidated at once
+without having to find and delete them; stale entries simply age out of the
+cache. The backend, its size bound and the payload TTL are configured in
+settings (``CACHES``, ``POI_CACHE_TIMEOUT``).
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+CLUSTER_TIMEOUT = 60 * 60
+TILE_TIMEOUT = 60 * 60
+
+
+def cluster_key(user_id, version, zoom, x, y):
+    return f'pois:clusters:{user_id}:{version}:{zoom}:{x}:{y}'
+
+
+def get_clusters(user_id, version, zoom, tiles, compute):
+    """
+    Return the clusters for each tile, calling ``compute(x, y)`` for tiles
+    that are not cached yet. Version 0 is never cached, see get_payload().
+    """
+    if not version:
+        return [cluster for tile in tiles for cluster in compute(*tile)]
+    keys = {tile: cluster_key(user_id, version, zoom, *tile) for tile in tiles}
+    cached = cache.get_many(keys.values())
+    missing = {}
+    clusters = []
+    for tile, key in keys.items():
+        if key in cached:
+            clusters += cached[key]
+        else:
+            missing[key] = compute(*tile)
+            clusters += missing[key]
+    if missing:
+        cache.set_many(missing, CLUSTER_TIMEOUT)
+    return clusters
+
+
+def tile_key(user_id, version, zoom, x, y):
+    return f'pois:tile:{user_id}:{version}:{zoom}:{x}:{y}'
+
+
+def get_tile(user_id, version, zoom, x, y, compute):
+    """Return the encoded tile for ``version``, calling ``compute()`` on a miss. Version 0 is never cached"""
+    if not version:
+        return compute()
+    key = tile_key(user_id, version, zoom, x, y)
+    tile = cache.get(key)
+    if tile is None:
+        tile = compute()
+        cache.set(key, tile, TILE_TIMEOUT)
+    return tile
+
+
+def payload_key(etag):
+    return f'pois:payload:{etag.strip(chr(34))}'
+
+
+def get_payload(version, etag, compute):
+    """
+    Return the response data for ``etag``, calling ``compute()`` on a miss.
+
+    The version must be read before ``compute()`` queries the data. A writer
+    committing in between can then only make the cached payload newer than
+    its version, never older, and its bump moves readers to a new key.
+    Version 0 means no write was ever recorded for the user (e.g. rows loaded
+    by hand), which nothing would invalidate, so it is never cached.
+    """
+    if not version:
+        return compute()
+    key = payload_key(etag)
+    data = cache.get(key)
+    if data is None:
+        data = compute()
+        cache.set(key, data, settings.POI_CACHE_TIMEOUT)
+    return data
+
+
+async def aget_payload(version, etag, compute):
+    """get_payload() for async views, ``compute`` is a coroutine function"""
+    if not version:
+        return await compute()
+    key = payload_key(etag)
+    data = await cache.aget(key)
+    if data is None:
+        data = await compute()
+        await cache.aset(key, data, settings.POI_CACHE_TIMEOUT)
+    return data
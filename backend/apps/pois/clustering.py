@@ -0,0 +1,55 @@
+from django.db.models import Avg, Count, FloatField, Min, Value
+from django.db.models.functions import Cast, Floor, Greatest, Least
+
+from .geo import tile_bounds, tile_q
+from .models import POI
+
+# each tile is split into GRID_SIZE x GRID_SIZE cells
+GRID_SIZE = 8
+
+
+def cluster_tile(user_id, zoom, x, y):
+    """
+    Aggregate a user's POIs in one tile into grid clusters.
+    The grouping runs in the database, so the cost depends on the number of
+    cells rather than on the number of POIs returned to the client.
+    """
+    west, south, east, north = tile_bounds(zoom, x, y)
+    cell_width = (east - west) / GRID_SIZE
+    cell_height = (north - south) / GRID_SIZE
+    cells = (
+        POI.objects
+        .filter(created_by_id=user_id)
+        .filter(tile_q(zoom, x, y))
+        .annotate(
+            cell_x=Least(
+                Floor((Cast('longitude', FloatField()) - Value(west)) / Value(cell_width)),
+                Value(GRID_SIZE - 1.0),
+            ),
+            # POIs beyond the mercator limit belong to the outermost row of cells
+            cell_y=Greatest(
+                Least(
+                    Floor((Value(north) - Cast('latitude', FloatField())) / Value(cell_height)),
+                    Value(GRID_SIZE - 1.0),
+                ),
+                Value(0.0),
+            ),
+        )
+        .values('cell_x', 'cell_y')
+        .annotate(
+            count=Count('id'),
+            centroid_latitude=Avg(Cast('latitude', FloatField())),
+            centroid_longitude=Avg(Cast('longitude', FloatField())),
+            poi_id=Min('id'),
+        )
+        .order_by()
+    )
+    return [
+        {
+            'count': cell['count'],
+            'latitude': round(cell['centroid_latitude'], 6),
+            'longitude': round(cell['centroid_longitude'], 6),
+            'poi_id': cell['poi_id'],
+        }
+        for cell in cells
+    ]
@@ -0,0 +1,110 @@
+"""
+Compact columnar encoding of a page of POIs for map clients.
+
+Layout (all integers little-endian, every column aligned for typed arrays)::
+
+    offset  size           field
+    0       4              magic b'POIC'
+    4       2              format version (1)
+    6       2              reserved (0)
+    8       4              n, number of POIs
+    12      4              m, number of distinct names
+    16      8 * n          ids, int64
+            4 * n          latitudes, int32 micro-degrees (degrees * 1e6)
+            4 * n          longitudes, int32 micro-degrees
+            4 * n          name index of each POI into the name table, uint32
+            4 * (m + 1)    name table offsets into the name bytes, uint32
+            offsets[m]     name bytes, UTF-8, concatenated
+            4              length of the next page URL, uint32 (0 if none)
+            ...            next page URL, UTF-8
+
+Coordinates are stored with six decimal places, so micro-degrees are exact.
+"""
+import struct
+import sys
+from array import array
+from decimal import Decimal
+
+MAGIC = b'POIC'
+VERSION = 1
+HEADER = struct.Struct('<4sHHII')
+SCALE = Decimal(1_000_000)
+
+FIELDS = ('id', 'name', 'latitude', 'longitude', 'created_at')
+
+
+def little_endian(values):
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def to_micro_degrees(value):
+    return int(Decimal(value) * SCALE)
+
+
+def encode_columns(rows, next_url=None):
+    """Encode ``rows`` (dicts with id, name, latitude and longitude)"""
+    ids = array('q')
+    latitudes = array('i')
+    longitudes = array('i')
+    name_indexes = array('I')
+    names = {}
+    for row in rows:
+        ids.append(row['id'])
+        latitudes.append(to_micro_degrees(row['latitude']))
+        longitudes.append(to_micro_degrees(row['longitude']))
+        name_indexes.append(names.setdefault(row['name'], len(names)))
+
+    offsets = array('I', [0])
+    name_bytes = bytearray()
+    for name in names:
+        name_bytes += name.encode()
+        offsets.append(len(name_bytes))
+    next_bytes = (next_url or '').encode()
+
+    return b''.join((
+        HEADER.pack(MAGIC, VERSION, 0, len(ids), len(names)),
+        little_endian(ids),
+        little_endian(latitudes),
+        little_endian(longitudes),
+        little_endian(name_indexes),
+        little_endian(offsets),
+        bytes(name_bytes),
+        struct.pack('<I', len(next_bytes)),
+        next_bytes,
+    ))
+
+
+def decode_columns(data):
+    """Inverse of ``encode_columns``, returns ``(rows, next_url)``"""
+    magic, version, _, count, name_count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('Not a POI column page.')
+    offset = HEADER.size
+
+    def column(typecode, length):
+        nonlocal offset
+        values = array(typecode)
+        values.frombytes(data[offset:offset + values.itemsize * length])
+        if sys.byteorder == 'big':
+            values.byteswap()
+        offset += values.itemsize * length
+        return values
+
+    ids = column('q', count)
+    latitudes = column('i', count)
+    longitudes = column('i', count)
+    name_indexes = column('I', count)
+    offsets = column('I', name_count + 1)
+    name_bytes = data[offset:offset + offsets[-1]]
+    offset += offsets[-1]
+    names = [name_bytes[start:end].decode() for start, end in zip(offsets, offsets[1:])]
+    (next_length,) = struct.unpack_from('<I', data, offset)
+    next_url = data[offset + 4:offset + 4 + next_length].decode() or None
+
+    rows = [
+        {'id': id, 'name': names[index], 'latitude': Decimal(lat) / SCALE, 'longitude': Decimal(lng) / SCALE}
+        for id, lat, lng, index in zip(ids, latitudes, longitudes, name_indexes)
+    ]
+    return rows, next_url
@@ -0,0 +1,200 @@
+"""
+Push of POI changes to their owner's open clients, for /api/pois/events/.
+
+Writes publish one event per created, updated or deleted POI once their
+transaction commits (publish_on_commit), and every stream of the owner
+receives it as a server-sent event:
+
+    event: created | updated
+    data: <the POI, as the REST endpoints render it>
+
+    event: deleted
+    data: {"id": <id>}
+
+Streams are meant to stay open for hours, mostly idle, so each one costs a
+coroutine and a small queue, never a thread: the view is async and needs an
+ASGI server. A publish touches only the streams of the owner, encodes the
+event once for all of them, and wakes each event loop with them once. A
+stream whose client reads too slowly to keep up with ``POI_EVENTS_QUEUE_SIZE``
+events gets a ``resync`` event instead of the missed ones and is closed;
+clients reload their POIs then, and after reconnecting.
+
+The broker is ``POI_EVENTS_BROKER``. LocalBroker only reaches the streams of
+the process that published; a broker for several processes (e.g. on Redis
+pub/sub) subclasses it, sends in ``publish()`` and calls ``deliver()`` with
+what every process receives.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.utils.encoders import JSONEncoder
+
+RESYNC = b'event: resync\ndata: {}\n\n'
+# keeps proxies from closing idle streams and finds dead connections
+HEARTBEAT = b': heartbeat\n\n'
+RETRY_MS = 5000
+
+
+def encode(event):
+    """The server-sent event frame of ``{'type': ..., 'data': ...}``"""
+    data = json.dumps(event['data'], cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+    return f'event: {event["type"]}\ndata: {data}\n\n'.encode()
+
+
+def created(data):
+    return {'type': 'created', 'data': data}
+
+
+def updated(data):
+    return {'type': 'updated', 'data': data}
+
+
+def deleted(pk):
+    return {'type': 'deleted', 'data': {'id': pk}}
+
+
+class Subscription:
+    """An open stream: the frames waiting to be sent to it, on its event loop"""
+
+    def __init__(self, user_id, loop, max_size):
+        self.user_id = user_id
+        self.loop = loop
+        self.max_size = max_size
+        self.queue = asyncio.Queue()
+        self.overflowed = False
+
+    def put(self, frame):
+        """Queue ``frame``; must run on the subscription's event loop"""
+        if self.overflowed:
+            return
+        if self.queue.qsize() >= self.max_size:
+            # the client missed events: drop the queued ones and have it reload
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            return
+        self.queue.put_nowait(frame)
+
+    async def get(self, timeout):
+        """The next frame, or None after ``timeout`` seconds without one"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+def fan_out(subscriptions, frame):
+    for subscription in subscriptions:
+        subscription.put(frame)
+
+
+class LocalBroker:
+    """Delivers the events published in this process to its streams"""
+
+    def __init__(self, queue_size):
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        # user id -> event loop -> subscriptions, so that one callback per loop delivers an event
+        self.subscriptions = defaultdict(lambda: defaultdict(set))
+
+    @classmethod
+    def from_settings(cls):
+        return cls(settings.POI_EVENTS_QUEUE_SIZE)
+
+    def subscribe(self, user_id):
+        """Open a subscription to the user's events; must run on the event loop serving the stream"""
+        subscription = Subscription(user_id, asyncio.get_running_loop(), self.queue_size)
+        with self.lock:
+            self.subscriptions[user_id][subscription.loop].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            loops = self.subscriptions.get(subscription.user_id)
+            if loops is None:
+                return
+            loops[subscription.loop].discard(subscription)
+            if not loops[subscription.loop]:
+                del loops[subscription.loop]
+            if not loops:
+                del self.subscriptions[subscription.user_id]
+
+    def count(self):
+        with self.lock:
+            return sum(len(subscriptions) for loops in self.subscriptions.values() for subscriptions in loops.values())
+
+    def publish(self, user_id, events):
+        """Send ``events`` to the streams of ``user_id``; callable from any thread"""
+        self.deliver(user_id, b''.join(map(encode, events)))
+
+    def deliver(self, user_id, frame):
+        with self.lock:
+            loops = self.subscriptions.get(user_id)
+            if not loops:
+                return
+            targets = [(loop, tuple(subscriptions)) for loop, subscriptions in loops.items()]
+        for loop, subscriptions in targets:
+            try:
+                loop.call_soon_threadsafe(fan_out, subscriptions, frame)
+            except RuntimeError:
+                # the loop was closed, its streams are gone
+                pass
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.POI_EVENTS_BROKER).from_settings()
+    return _broker
+
+
+async def stream(user_id, expires_at=None):
+    """
+    The frames of a stream of the user's events, until ``expires_at`` (epoch
+    seconds) or its queue overflows. Subscribes on the first iteration, so a
+    response never sent holds no subscription.
+    """
+    broker = get_broker()
+    subscription = broker.subscribe(user_id)
+    try:
+        yield f'retry: {RETRY_MS}\n\n'.encode()
+        while True:
+            timeout = settings.POI_EVENTS_HEARTBEAT
+            if expires_at is not None:
+                timeout = min(timeout, expires_at - time.time())
+                if timeout <= 0:
+                    return
+            frame = await subscription.get(timeout)
+            yield HEARTBEAT if frame is None else frame
+            if frame is RESYNC:
+                return
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def publish_on_commit(user_id, events):
+    """Publish ``events`` once the current transaction commits, right away outside of one"""
+    if events:
+        transaction.on_commit(lambda: get_broker().publish(user_id, events))
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    global _broker
+    if setting.startswith('POI_EVENTS_'):
+        _broker = None
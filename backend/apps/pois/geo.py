@@ -0,0 +1,190 @@
+import math
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import FloatField, Q, Value
+from django.db.models.functions import ASin, Cast, Cos, Least, Power, Radians, Sin, Sqrt
+
+from . import geohash
+
+MIN_LATITUDE = Decimal(-90)
+MAX_LATITUDE = Decimal(90)
+MIN_LONGITUDE = Decimal(-180)
+MAX_LONGITUDE = Decimal(180)
+
+# mean earth radius (IUGG)
+EARTH_RADIUS_M = 6371008.8
+MAX_DISTANCE_M = math.pi * EARTH_RADIUS_M
+
+
+def parse_bbox(value):
+    """
+    Parse a ``minLng,minLat,maxLng,maxLat`` string into four Decimals.
+    A box whose minLng is greater than its maxLng crosses the antimeridian.
+    Raises ValueError with a user facing message when the box is malformed.
+    """
+    parts = value.split(',')
+    if len(parts) != 4:
+        raise ValueError("bbox must be 'minLng,minLat,maxLng,maxLat'.")
+    try:
+        min_lng, min_lat, max_lng, max_lat = (Decimal(part.strip()) for part in parts)
+    except InvalidOperation:
+        raise ValueError("bbox coordinates must be numbers.")
+    if not all(part.is_finite() for part in (min_lng, min_lat, max_lng, max_lat)):
+        raise ValueError("bbox coordinates must be numbers.")
+    if not (MIN_LATITUDE <= min_lat <= MAX_LATITUDE and MIN_LATITUDE <= max_lat <= MAX_LATITUDE):
+        raise ValueError("bbox latitudes must be between -90 and 90 degrees.")
+    if not (MIN_LONGITUDE <= min_lng <= MAX_LONGITUDE and MIN_LONGITUDE <= max_lng <= MAX_LONGITUDE):
+        raise ValueError("bbox longitudes must be between -180 and 180 degrees.")
+    if min_lat > max_lat:
+        raise ValueError("bbox minLat must not be greater than maxLat.")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def geohash_q(min_lng, min_lat, max_lng, max_lat):
+    """
+    Build a prefix filter on the geohash cells covering the box, so the
+    (created_by, geohash) index can narrow the candidates. Matches everything
+    when the box is too large for a useful covering.
+    """
+    # pad by ~10cm so rounding of the box edges never cuts a cell off
+    pad = 1e-6
+    prefixes = geohash.covering(
+        max(float(min_lng) - pad, -180.0),
+        max(float(min_lat) - pad, -90.0),
+        min(float(max_lng) + pad, 180.0),
+        min(float(max_lat) + pad, 90.0),
+    )
+    q = Q()
+    for prefix in prefixes or []:
+        q |= Q(geohash__startswith=prefix)
+    return q
+
+
+def bbox_q(min_lng, min_lat, max_lng, max_lat):
+    """
+    Build a filter matching POIs inside the box.
+    The geohash covering narrows the candidates and the coordinate ranges are
+    the exact test; an antimeridian crossing box becomes two longitude ranges.
+    """
+    q = geohash_q(min_lng, min_lat, max_lng, max_lat) & Q(latitude__gte=min_lat, latitude__lte=max_lat)
+    if min_lng <= max_lng:
+        return q & Q(longitude__gte=min_lng, longitude__lte=max_lng)
+    return q & (Q(longitude__gte=min_lng) | Q(longitude__lte=max_lng))
+
+
+def radius_bbox(latitude, longitude, radius_m):
+    """
+    Return the smallest ``(min_lng, min_lat, max_lng, max_lat)`` box containing
+    the circle of ``radius_m`` around a point, in the format bbox_q expects.
+    """
+    angle = radius_m / EARTH_RADIUS_M
+    # pad by ~10cm so rounding to the column's precision never cuts the circle
+    pad = 1e-6
+    min_lat = latitude - math.degrees(angle) - pad
+    max_lat = latitude + math.degrees(angle) + pad
+    if min_lat <= -90 or max_lat >= 90 or angle >= math.pi / 2:
+        # the circle covers a pole, so it spans every longitude
+        return -180.0, max(min_lat, -90.0), 180.0, min(max_lat, 90.0)
+
+    ratio = math.sin(angle) / math.cos(math.radians(latitude))
+    if ratio >= 1:
+        return -180.0, min_lat, 180.0, max_lat
+    delta = math.degrees(math.asin(ratio)) + pad
+    min_lng = longitude - delta
+    max_lng = longitude + delta
+    if min_lng < -180:
+        min_lng += 360
+    if max_lng > 180:
+        max_lng -= 360
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def haversine_distance(latitude, longitude):
+    """
+    Great-circle distance in meters from a point to each POI, as a database
+    expression so it is evaluated by the database over the candidate rows.
+    """
+    poi_lat = Radians(Cast('latitude', FloatField()))
+    poi_lng = Radians(Cast('longitude', FloatField()))
+    lat = math.radians(latitude)
+    lng = math.radians(longitude)
+    a = (
+        Power(Sin((poi_lat - Value(lat)) / Value(2.0)), 2)
+        + Value(math.cos(lat)) * Cos(poi_lat) * Power(Sin((poi_lng - Value(lng)) / Value(2.0)), 2)
+    )
+    return Value(2 * EARTH_RADIUS_M) * ASin(Sqrt(Least(a, Value(1.0))))
+
+
+# Slippy map (web mercator) tiles, as used by Mapbox GL
+MAX_ZOOM = 22
+MAX_MERCATOR_LATITUDE = 85.0511287798066
+
+
+def tile_x(longitude, zoom):
+    n = 2 ** zoom
+    return min(n - 1, max(0, math.floor((float(longitude) + 180) / 360 * n)))
+
+
+def tile_y(latitude, zoom):
+    n = 2 ** zoom
+    latitude = math.radians(min(MAX_MERCATOR_LATITUDE, max(-MAX_MERCATOR_LATITUDE, float(latitude))))
+    y = (1 - math.log(math.tan(latitude) + 1 / math.cos(latitude)) / math.pi) / 2 * n
+    return min(n - 1, max(0, math.floor(y)))
+
+
+def tile_bounds(zoom, x, y):
+    """Return the (west, south, east, north) edges of a tile in degrees"""
+    n = 2 ** zoom
+
+    def latitude(tile_y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / n))))
+
+    return x / n * 360 - 180, latitude(y + 1), (x + 1) / n * 360 - 180, latitude(y)
+
+
+def tile_ranges(min_lng, min_lat, max_lng, max_lat, zoom):
+    """Return the x ranges and the y range of the tiles covering a bbox, splitting it at the antimeridian"""
+    ys = range(tile_y(max_lat, zoom), tile_y(min_lat, zoom) + 1)
+    if min_lng <= max_lng:
+        xs = [range(tile_x(min_lng, zoom), tile_x(max_lng, zoom) + 1)]
+    else:
+        xs = [range(tile_x(min_lng, zoom), 2 ** zoom), range(0, tile_x(max_lng, zoom) + 1)]
+    return xs, ys
+
+
+def count_tiles(min_lng, min_lat, max_lng, max_lat, zoom):
+    """Count the tiles covering a bbox without listing them"""
+    xs, ys = tile_ranges(min_lng, min_lat, max_lng, max_lat, zoom)
+    return sum(map(len, xs)) * len(ys)
+
+
+def tiles_for_bbox(min_lng, min_lat, max_lng, max_lat, zoom):
+    """List the (x, y) tiles covering a bbox, splitting it at the antimeridian"""
+    xs, ys = tile_ranges(min_lng, min_lat, max_lng, max_lat, zoom)
+    return [(x, y) for x_range in xs for x in x_range for y in ys]
+
+
+def tile_q(zoom, x, y):
+    """
+    Build a filter matching POIs inside a tile.
+    Tiles are half open (west and north edges inclusive) so a POI on a shared
+    edge lands in exactly one tile, and the outermost tiles extend to the
+    poles and to +180 so no POI falls outside every tile.
+    """
+    n = 2 ** zoom
+    west, south, east, north = tile_bounds(zoom, x, y)
+    q = geohash_q(
+        west if x > 0 else -180,
+        south if y < n - 1 else -90,
+        east if x < n - 1 else 180,
+        north if y > 0 else 90,
+    )
+    if x > 0:
+        q &= Q(longitude__gte=west)
+    if x < n - 1:
+        q &= Q(longitude__lt=east)
+    if y > 0:
+        q &= Q(latitude__lte=north)
+    if y < n - 1:
+        q &= Q(latitude__gt=south)
+    return q
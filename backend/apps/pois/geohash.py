@@ -0,0 +1,133 @@
+"""
+Geohash encoding and bbox coverings for prefix-indexed spatial lookups.
+
+A geohash interleaves the bits of a longitude and a latitude bisection
+(longitude first) and writes them five at a time in base32, so every prefix of
+a POI's geohash is the cell containing it at a coarser precision. Filtering on
+``geohash__startswith`` for the few cells covering a box is then a handful of
+index range scans on (created_by, geohash).
+
+Cells are half open: a point on a cell's west or south edge belongs to that
+cell, and the north pole and +180 belong to the last row and column.
+
+Cell size per precision (degrees, and kilometers at the equator):
+
+    =========  ===================  ==================
+    precision  lng x lat (degrees)  width x height
+    =========  ===================  ==================
+    1          45 x 45              5,000 x 5,000 km
+    2          11.25 x 5.625        1,250 x 625 km
+    3          1.40625 x 1.40625    156 x 156 km
+    4          0.352 x 0.176        39.1 x 19.5 km
+    5          0.0439 x 0.0439      4.89 x 4.89 km
+    6          0.0110 x 0.00549     1.22 x 0.61 km
+    7          0.00137 x 0.00137    153 x 153 m
+    8          0.000343 x 0.000172  38.2 x 19.1 m
+    9          4.29e-5 x 4.29e-5    4.77 x 4.77 m
+    10         1.07e-5 x 5.36e-6    1.19 x 0.60 m
+    11         1.34e-6 x 1.34e-6    149 x 149 mm
+    12         3.35e-7 x 1.68e-7    37.2 x 18.6 mm
+    =========  ===================  ==================
+
+Cells keep their height towards the poles but get narrower, by cos(latitude).
+"""
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION = 12
+
+# coverings with more cells than this are not worth the extra index scans
+MAX_COVERING_CELLS = 16
+MAX_COVERING_PRECISION = 8
+
+
+def bit_counts(precision):
+    """Return the number of (longitude, latitude) bits in a geohash"""
+    total = 5 * precision
+    return (total + 1) // 2, total // 2
+
+
+def cell_index(value, low, high, bits):
+    index = 0
+    for _ in range(bits):
+        mid = (low + high) / 2
+        index <<= 1
+        if value >= mid:
+            index |= 1
+            low = mid
+        else:
+            high = mid
+    return index
+
+
+def cell_indexes(latitude, longitude, precision):
+    """Return the (longitude, latitude) cell indexes of a point"""
+    lng_bits, lat_bits = bit_counts(precision)
+    return (
+        cell_index(float(longitude), -180.0, 180.0, lng_bits),
+        cell_index(float(latitude), -90.0, 90.0, lat_bits),
+    )
+
+
+def from_indexes(lng_index, lat_index, precision):
+    lng_bits, lat_bits = bit_counts(precision)
+    chars = []
+    value = 0
+    for bit in range(5 * precision):
+        if bit % 2 == 0:
+            lng_bits -= 1
+            value = (value << 1) | (lng_index >> lng_bits) & 1
+        else:
+            lat_bits -= 1
+            value = (value << 1) | (lat_index >> lat_bits) & 1
+        if bit % 5 == 4:
+            chars.append(BASE32[value])
+            value = 0
+    return ''.join(chars)
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    return from_indexes(*cell_indexes(latitude, longitude, precision), precision)
+
+
+def decode_bounds(geohash):
+    """Return the (west, south, east, north) edges of a geohash cell"""
+    lng_index = lat_index = lng_bits = lat_bits = 0
+    for bit in range(5 * len(geohash)):
+        value = BASE32.index(geohash[bit // 5]) >> (4 - bit % 5) & 1
+        if bit % 2 == 0:
+            lng_index, lng_bits = (lng_index << 1) | value, lng_bits + 1
+        else:
+            lat_index, lat_bits = (lat_index << 1) | value, lat_bits + 1
+    width = 360 / 2 ** lng_bits
+    height = 180 / 2 ** lat_bits
+    west = -180 + lng_index * width
+    south = -90 + lat_index * height
+    return west, south, west + width, south + height
+
+
+def covering(min_lng, min_lat, max_lng, max_lat, max_cells=MAX_COVERING_CELLS):
+    """
+    Return the geohash prefixes of the cells covering a bbox, at the finest
+    precision (up to MAX_COVERING_PRECISION) that needs at most ``max_cells``
+    cells, or None when even single characters would need more.
+    A box whose min_lng is greater than its max_lng crosses the antimeridian.
+    """
+    if min_lng > max_lng:
+        boxes = [(min_lng, min_lat, 180, max_lat), (-180, min_lat, max_lng, max_lat)]
+    else:
+        boxes = [(min_lng, min_lat, max_lng, max_lat)]
+
+    for precision in range(MAX_COVERING_PRECISION, 0, -1):
+        ranges = []
+        for west, south, east, north in boxes:
+            min_lng_index, min_lat_index = cell_indexes(south, west, precision)
+            max_lng_index, max_lat_index = cell_indexes(north, east, precision)
+            ranges.append((min_lng_index, max_lng_index, min_lat_index, max_lat_index))
+        cells = sum((x1 - x0 + 1) * (y1 - y0 + 1) for x0, x1, y0, y1 in ranges)
+        if cells <= max_cells:
+            return sorted({
+                from_indexes(x, y, precision)
+                for x0, x1, y0, y1 in ranges
+                for x in range(x0, x1 + 1)
+                for y in range(y0, y1 + 1)
+            })
+    return None
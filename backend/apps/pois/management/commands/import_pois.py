@@ -0,0 +1,213 @@
+import csv
+import json
+import re
+import time
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from apps.pois import geohash
+from apps.pois.models import POI
+from apps.pois.serializers import POISerializer
+from apps.pois.versions import bump_data_version
+
+User = get_user_model()
+
+FORMATS = {'.csv': 'csv', '.geojson': 'geojson', '.json': 'geojson', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+READ_SIZE = 1 << 16
+COORDINATE_PLACES = Decimal('0.000001')
+
+
+def read_csv(file):
+    for row in csv.DictReader(file):
+        yield row
+
+
+def read_ndjson(file):
+    for line in file:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield {'error': 'Invalid JSON.'}
+
+
+def read_geojson(file, read_size=READ_SIZE):
+    """
+    Yield the features of a FeatureCollection one at a time, without loading
+    the whole document into memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+
+    def fill():
+        nonlocal buffer, eof
+        data = file.read(read_size)
+        eof = not data
+        buffer += data
+
+    while True:
+        match = re.search(r'"features"\s*:\s*\[', buffer)
+        if match:
+            buffer = buffer[match.end():]
+            break
+        if eof:
+            raise CommandError('No "features" array found in the GeoJSON file.')
+        fill()
+
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,')
+        if buffer.startswith(']'):
+            return
+        try:
+            feature, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise CommandError('Truncated or malformed GeoJSON file.')
+            fill()
+            continue
+        yield feature_to_row(feature)
+        buffer = buffer[end:]
+
+
+def feature_to_row(feature):
+    geometry = feature.get('geometry') or {}
+    properties = feature.get('properties') or {}
+    if geometry.get('type') != 'Point':
+        return {'error': 'Only Point geometries can be imported.'}
+    coordinates = geometry.get('coordinates')
+    if not (
+        isinstance(coordinates, list) and len(coordinates) >= 2
+        and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in coordinates[:2])
+    ):
+        return {'error': 'Point coordinates must be a list of at least two numbers.'}
+    longitude, latitude = coordinates[:2]
+    return {
+        'name': properties.get('name'),
+        'description': properties.get('description'),
+        'latitude': latitude,
+        'longitude': longitude,
+    }
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson, 'geojson': read_geojson}
+
+
+def clean_row(row):
+    """
+    Return ``(name, description, latitude, longitude)`` for an input row,
+    applying the same rules as POISerializer. Raises ValueError.
+    """
+    if not isinstance(row, dict):
+        raise ValueError('Expected an object.')
+    if 'error' in row:
+        raise ValueError(row['error'])
+    name = row.get('name') or ''
+    description = row.get('description') or None
+    if not isinstance(name, str) or not isinstance(description, (str, type(None))):
+        raise ValueError('name and description must be strings.')
+    name = name.strip()
+    if not name:
+        raise ValueError('name is required.')
+    if len(name) > POI._meta.get_field('name').max_length:
+        raise ValueError('name is too long.')
+    try:
+        latitude = Decimal(str(row['latitude'])).quantize(COORDINATE_PLACES)
+        longitude = Decimal(str(row['longitude'])).quantize(COORDINATE_PLACES)
+    except (KeyError, InvalidOperation):
+        raise ValueError('latitude and longitude must be numbers.')
+    if not (latitude.is_finite() and longitude.is_finite()):
+        raise ValueError('latitude and longitude must be numbers.')
+    validator = POISerializer()
+    try:
+        validator.validate_latitude(latitude)
+        validator.validate_longitude(longitude)
+    except serializers.ValidationError as e:
+        raise ValueError(' '.join(e.detail))
+    return name, description, latitude, longitude
+
+
+class Command(BaseCommand):
+    help = 'Import POIs for a user from a CSV, GeoJSON or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File with name, description, latitude and longitude per POI')
+        parser.add_argument('--user', required=True, help='Username of the owner of the imported POIs')
+        parser.add_argument('--format', choices=sorted(READERS), help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--strict', action='store_true', help='Abort on the first invalid row')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        file_format = options['format'] or FORMATS.get(path.suffix.lower())
+        if file_format is None:
+            raise CommandError(f'Cannot tell the format of {path.name}, use --format.')
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist.")
+
+        write = self.copy_batch if connection.vendor == 'postgresql' else self.insert_batch
+        batch_size = options['batch_size']
+        imported = skipped = 0
+        batch = []
+        start = time.perf_counter()
+        with path.open(newline='', encoding='utf-8') as file:
+            for number, row in enumerate(READERS[file_format](file), 1):
+                try:
+                    batch.append(clean_row(row))
+                except ValueError as e:
+                    if options['strict']:
+                        raise CommandError(f'Row {number}: {e}')
+                    self.stderr.write(f'Skipping row {number}: {e}')
+                    skipped += 1
+                    continue
+                if len(batch) >= batch_size:
+                    imported += self.write_batch(write, user, batch)
+                    batch = []
+                    self.report_progress(imported, start)
+        if batch:
+            imported += self.write_batch(write, user, batch)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported:,} POIs in {elapsed:.1f}s ({imported / max(elapsed, 1e-9):,.0f} rows/s), '
+            f'skipped {skipped:,} invalid rows.'
+        ))
+
+    def write_batch(self, write, user, batch):
+        with transaction.atomic():
+            write(user, batch)
+            bump_data_version(user.pk)
+        return len(batch)
+
+    def report_progress(self, imported, start):
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'{imported:,} rows imported ({imported / max(elapsed, 1e-9):,.0f} rows/s)')
+
+    def copy_batch(self, user, batch):
+        """Load a batch with PostgreSQL COPY through psycopg 3"""
+        now = timezone.now()
+        columns = ['name', 'description', 'latitude', 'longitude', 'geohash', 'created_by_id', 'created_at', 'updated_at']
+        quote = connection.ops.quote_name
+        sql = f'COPY {quote(POI._meta.db_table)} ({", ".join(quote(column) for column in columns)}) FROM STDIN'
+        with connection.cursor() as cursor, cursor.copy(sql) as copy:
+            for name, description, latitude, longitude in batch:
+                copy.write_row((
+                    name, description, latitude, longitude, geohash.encode(latitude, longitude), user.pk, now, now,
+                ))
+
+    def insert_batch(self, user, batch):
+        POI.objects.bulk_create(
+            (
+                POI(name=name, description=description, latitude=latitude, longitude=longitude, created_by=user)
+                for name, description, latitude, longitude in batch
+            ),
+            batch_size=1000,
+        )
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pois', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='poi',
+            index=models.Index(fields=['created_by', 'latitude', 'longitude'], name='pois_owner_lat_lng_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pois', '0002_poi_owner_lat_lng_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='poi',
+            index=models.Index(fields=['created_by', '-created_at', '-id'], name='pois_owner_created_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+from apps.pois.geohash import encode
+
+
+def backfill_geohash(apps, schema_editor):
+    POI = apps.get_model('pois', 'POI')
+    db_alias = schema_editor.connection.alias
+    pois = POI.objects.using(db_alias).order_by('pk').only('pk', 'latitude', 'longitude')
+    last_pk = 0
+    while True:
+        batch = list(pois.filter(pk__gt=last_pk)[:2000])
+        if not batch:
+            break
+        for poi in batch:
+            poi.geohash = encode(poi.latitude, poi.longitude)
+        POI.objects.using(db_alias).bulk_update(batch, ['geohash'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pois', '0003_poi_owner_created_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='poi',
+            name='geohash',
+            field=models.CharField(default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='poi',
+            index=models.Index(fields=['created_by', 'geohash'], name='pois_owner_geohash_idx', opclasses=['int8_ops', 'varchar_pattern_ops']),
+        ),
+    ]
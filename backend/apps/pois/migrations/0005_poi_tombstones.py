@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-18 13:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pois', '0004_poi_geohash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='POITombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('poi_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='poi',
+            index=models.Index(fields=['created_by', 'updated_at', 'id'], name='pois_owner_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='poitombstone',
+            name='created_by',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='poi_tombstones', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='poitombstone',
+            index=models.Index(fields=['created_by', 'deleted_at', 'id'], name='pois_tombstone_owner_idx'),
+        ),
+    ]
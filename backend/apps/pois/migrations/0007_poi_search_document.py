@@ -0,0 +1,47 @@
+# Generated by Django 5.0.1 on 2026-10-18 14:56
+
+import apps.pois.search
+from django.db import DatabaseError, migrations, models, transaction
+
+
+def create_search_indexes(apps, schema_editor):
+    # the fallback search of other databases has no index to use
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE INDEX pois_search_idx ON pois_poi USING gin (search_document)')
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    try:
+        # trusted since PostgreSQL 13, but the role may still lack CREATE on the database
+        with transaction.atomic(using=connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DatabaseError:
+        return
+    schema_editor.execute('CREATE INDEX pois_name_trgm_idx ON pois_poi USING gin (name gin_trgm_ops)')
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS pois_name_trgm_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS pois_search_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pois', '0006_poi_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='poi',
+            name='search_document',
+            field=models.GeneratedField(db_persist=True, expression=apps.pois.search.SearchDocument(), output_field=apps.pois.search.SearchDocumentField()),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
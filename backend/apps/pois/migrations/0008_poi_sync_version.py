@@ -0,0 +1,54 @@
+# Generated by Django 5.0.1 on 2026-10-18 15:48
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def stamp_existing_rows(apps, schema_editor):
+    # at their owner's current version: cursors of the timestamp format are
+    # rejected, so clients start over and receive them all
+    POIDataVersion = apps.get_model('pois', 'POIDataVersion')
+    for model_name in ('POI', 'POITombstone'):
+        model = apps.get_model('pois', model_name)
+        version = POIDataVersion.objects.filter(user_id=OuterRef('created_by_id')).values('version')
+        model.objects.update(sync_version=Coalesce(Subquery(version), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pois', '0007_poi_search_document'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='poi',
+            name='pois_owner_updated_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='poitombstone',
+            name='pois_tombstone_owner_idx',
+        ),
+        migrations.AddField(
+            model_name='poi',
+            name='sync_version',
+            field=models.PositiveBigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='poitombstone',
+            name='sync_version',
+            field=models.PositiveBigIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(stamp_existing_rows, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='poi',
+            index=models.Index(fields=['created_by', 'sync_version', 'id'], name='pois_owner_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poitombstone',
+            index=models.Index(fields=['created_by', 'sync_version', 'id'], name='pois_tombstone_sync_idx'),
+        ),
+    ]
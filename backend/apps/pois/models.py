@@ -1,14 +1,59 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth import get_user_model
+from . import geohash
+from .search import SearchDocument, SearchDocumentField
 
 User = get_user_model()
 
 
+class POIQuerySet(models.QuerySet):
+    """Keeps ``POI.geohash`` in sync for the bulk paths that skip ``save()``"""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.set_geohash()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if 'latitude' in fields or 'longitude' in fields:
+            objs = list(objs)
+            for obj in objs:
+                obj.set_geohash()
+            fields = [*fields, 'geohash']
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs):
+        # changed rows wait for the next data version, see bump_data_version()
+        kwargs.setdefault('sync_version', None)
+        # bulk_update() goes through here with the geohash already computed
+        if ('latitude' in kwargs or 'longitude' in kwargs) and 'geohash' not in kwargs:
+            try:
+                kwargs['geohash'] = geohash.encode(kwargs['latitude'], kwargs['longitude'])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError('latitude and longitude must be updated together, as plain values.')
+        return super().update(**kwargs)
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            POITombstone.objects.using(self.db).bulk_create(
+                POITombstone(poi_id=pk, created_by_id=created_by_id)
+                for pk, created_by_id in self.values_list('pk', 'created_by_id').order_by()
+            )
+            return super().delete()
+
+
 class POI(models.Model):
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True, null=True)
     latitude = models.DecimalField(max_digits=9, decimal_places=6)
     longitude = models.DecimalField(max_digits=9, decimal_places=6)
+    # derived from latitude/longitude, see apps.pois.geohash
+    geohash = models.CharField(max_length=geohash.PRECISION, editable=False, default='')
+    # derived from name/description by the database, see apps.pois.search
+    search_document = models.GeneratedField(
+        expression=SearchDocument(), output_field=SearchDocumentField(), db_persist=True
+    )
     created_by = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -16,11 +61,87 @@ class POI(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # data version of the last write, None until bump_data_version() stamps it, see apps.pois.sync
+    sync_version = models.PositiveBigIntegerField(null=True, editable=False)
+
+    objects = POIQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']  # Newest first by default
         verbose_name = 'Point of Interest'
         verbose_name_plural = 'Points of Interest'
+        indexes = [
+            # serves the per-user viewport (bbox) queries
+            models.Index(fields=['created_by', 'latitude', 'longitude'], name='pois_owner_lat_lng_idx'),
+            # serves keyset pagination of the list
+            models.Index(fields=['created_by', '-created_at', '-id'], name='pois_owner_created_idx'),
+            # serves the delta sync (changes) endpoint, and stamping the rows of a write
+            models.Index(fields=['created_by', 'sync_version', 'id'], name='pois_owner_sync_idx'),
+            # serves geohash prefix (LIKE 'abc%') lookups on PostgreSQL
+            models.Index(
+                fields=['created_by', 'geohash'],
+                name='pois_owner_geohash_idx',
+                opclasses=['int8_ops', 'varchar_pattern_ops'],
+            ),
+        ]
+
+    def set_geohash(self):
+        self.geohash = geohash.encode(self.latitude, self.longitude)
+
+    def save(self, *args, **kwargs):
+        self.set_geohash()
+        self.sync_version = None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = {*update_fields, 'sync_version'}
+            if 'latitude' in update_fields or 'longitude' in update_fields:
+                update_fields.add('geohash')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
+    def delete(self, using=None, keep_parents=False):
+        using = using or router.db_for_write(POI, instance=self)
+        with transaction.atomic(using=using):
+            POITombstone.objects.using(using).create(poi_id=self.pk, created_by_id=self.created_by_id)
+            return super().delete(using=using, keep_parents=keep_parents)
 
     def __str__(self):
         return f"{self.name} ({self.latitude}, {self.longitude})"
+
+
+class POITombstone(models.Model):
+    """Records a deleted POI so delta sync clients learn about the deletion"""
+    poi_id = models.BigIntegerField()
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='poi_tombstones'
+    )
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    # as POI.sync_version
+    sync_version = models.PositiveBigIntegerField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_by', 'sync_version', 'id'], name='pois_tombstone_sync_idx'),
+        ]
+
+    def __str__(self):
+        return f"POI {self.poi_id} deleted at {self.deleted_at}"
+
+
+class POIDataVersion(models.Model):
+    """
+    Per-user version of the POI data, bumped in the same transaction as every
+    write. ETags and cache keys are derived from it.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='poi_data_version'
+    )
+    version = models.PositiveBigIntegerField()
+
+    def __str__(self):
+        return f"{self.user_id}: {self.version}"
@@ -0,0 +1,93 @@
+"""
+Minimal Mapbox Vector Tile (v2.1) encoder for point layers.
+
+Only the parts of https://github.com/mapbox/vector-tile-spec needed to ship
+POIs are implemented: one layer per tile, point features with an id and string
+properties. The protobuf wire format is written by hand so tiles can be built
+and tested without protobuf or any Mapbox service.
+"""
+import math
+
+from .geo import MAX_MERCATOR_LATITUDE
+
+EXTENT = 4096
+
+# protobuf wire types
+VARINT = 0
+LENGTH_DELIMITED = 2
+
+# geometry
+POINT = 1
+MOVE_TO = 1
+
+
+def varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def field(number, wire_type):
+    return varint((number << 3) | wire_type)
+
+
+def length_delimited(number, payload):
+    return field(number, LENGTH_DELIMITED) + varint(len(payload)) + payload
+
+
+def packed(number, values):
+    return length_delimited(number, b''.join(varint(value) for value in values))
+
+
+def project(longitude, latitude, zoom, x, y, extent=EXTENT):
+    """Project a coordinate to integer pixel coordinates inside tile (zoom, x, y)"""
+    n = 2 ** zoom
+    latitude = math.radians(min(MAX_MERCATOR_LATITUDE, max(-MAX_MERCATOR_LATITUDE, float(latitude))))
+    world_x = (float(longitude) + 180) / 360 * n
+    world_y = (1 - math.log(math.tan(latitude) + 1 / math.cos(latitude)) / math.pi) / 2 * n
+    return round((world_x - x) * extent), round((world_y - y) * extent)
+
+
+def encode_tile(layer_name, features, zoom, x, y, extent=EXTENT):
+    """
+    Encode point features into a vector tile.
+    ``features`` is an iterable of ``(id, longitude, latitude, properties)``
+    where properties maps string keys to string values.
+    """
+    keys, values = {}, {}
+    encoded = []
+    for feature_id, longitude, latitude, properties in features:
+        tags = []
+        for key, value in properties.items():
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault(value, len(values)))
+        px, py = project(longitude, latitude, zoom, x, y, extent)
+        feature = (
+            field(1, VARINT) + varint(feature_id)
+            + (packed(2, tags) if tags else b'')
+            + field(3, VARINT) + varint(POINT)
+            + packed(4, [(MOVE_TO & 0x7) | (1 << 3), zigzag(px), zigzag(py)])
+        )
+        encoded.append(length_delimited(2, feature))
+    if not encoded:
+        return b''
+
+    layer = (
+        field(15, VARINT) + varint(2)
+        + length_delimited(1, layer_name.encode())
+        + b''.join(encoded)
+        + b''.join(length_delimited(3, key.encode()) for key in keys)
+        + b''.join(length_delimited(4, length_delimited(1, value.encode())) for value in values)
+        + field(5, VARINT) + varint(extent)
+    )
+    return length_delimited(3, layer)
@@ -0,0 +1,56 @@
+from .geo import MAX_DISTANCE_M, bbox_q, haversine_distance, radius_bbox
+
+# first radius tried when looking for the k nearest POIs without a radius
+INITIAL_RADIUS_M = 2_000
+
+
+def within(queryset, latitude, longitude, radius_m):
+    """
+    POIs within ``radius_m`` of a point, nearest first, annotated with
+    ``distance``. The bounding box of the circle is filtered first so the
+    distance is only computed for candidates found through the index.
+    """
+    return (
+        queryset
+        .filter(bbox_q(*radius_bbox(latitude, longitude, radius_m)))
+        .annotate(distance=haversine_distance(latitude, longitude))
+        .filter(distance__lte=radius_m)
+        .order_by('distance', 'id')
+    )
+
+
+def nearest(queryset, latitude, longitude, k, radius_m=None):
+    """
+    Return the ``k`` POIs nearest to a point, optionally limited to ``radius_m``.
+    Without a radius the search circle grows until it holds ``k`` POIs; once
+    it does, those are the k nearest overall.
+    """
+    if radius_m is not None:
+        return list(within(queryset, latitude, longitude, radius_m)[:k])
+
+    for radius_m in search_radii():
+        results = list(within(queryset, latitude, longitude, radius_m)[:k])
+        if len(results) >= k:
+            break
+    return results
+
+
+async def anearest(queryset, latitude, longitude, k, radius_m=None):
+    """nearest() using async iteration"""
+    if radius_m is not None:
+        return [poi async for poi in within(queryset, latitude, longitude, radius_m)[:k]]
+
+    for radius_m in search_radii():
+        results = [poi async for poi in within(queryset, latitude, longitude, radius_m)[:k]]
+        if len(results) >= k:
+            break
+    return results
+
+
+def search_radii():
+    """Growing search radii, ending with one that covers the whole globe"""
+    radius_m = INITIAL_RADIUS_M
+    while radius_m < MAX_DISTANCE_M:
+        yield radius_m
+        radius_m *= 8
+    yield MAX_DISTANCE_M
@@ -0,0 +1,57 @@
+from rest_framework.renderers import BaseRenderer
+
+from .columns import encode_columns
+
+
+class MVTRenderer(BaseRenderer):
+    """
+    Lets clients ask for ``application/vnd.mapbox-vector-tile``.
+    Tiles are returned as ready made HttpResponses, so this only renders the
+    (empty) body of error responses.
+    """
+    media_type = 'application/vnd.mapbox-vector-tile'
+    format = 'mvt'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data if isinstance(data, bytes) else b''
+
+
+class ExportRenderer(BaseRenderer):
+    """
+    Selects the export format, by ``?format=`` or the Accept header. Exports
+    are streamed by ExportView and its errors rendered with JSONRenderer, so
+    there is nothing to render.
+    """
+
+
+class GeoJSONRenderer(ExportRenderer):
+    media_type = 'application/geo+json'
+    format = 'geojson'
+
+
+class NDJSONRenderer(ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class POIColumnsRenderer(BaseRenderer):
+    """
+    Packed columns of a POI list page, see ``apps.pois.columns`` for the
+    layout. Error responses have an empty body.
+    """
+    media_type = 'application/vnd.proxication.poi-columns'
+    format = 'columns'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, dict) or 'results' not in data:
+            return b''
+        return encode_columns(data['results'], data.get('next'))
@@ -0,0 +1,113 @@
+"""
+Ranked search over POI names and descriptions.
+
+On PostgreSQL ``POI.search_document`` is a stored, weighted ``tsvector`` of
+the name (A) and description (B), generated by the database and indexed by
+GIN (migration 0007). The words of the query are matched as prefixes and
+results ranked with ``ts_rank``, which reads the stored vectors instead of
+parsing the text of every candidate again. When the ``pg_trgm`` extension
+could be installed, names that are a close match of the query (typos) are
+found too, through a trigram index. Other databases (SQLite in tests) fall
+back to case-insensitive substring matching of every word, which scans the
+user's POIs.
+"""
+import re
+
+from asgiref.sync import sync_to_async
+from django.db import connections, models
+from django.db.models import BooleanField, Case, F, FloatField, Func, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+
+# text search configuration: no stemming or stop words, POI names are in any language
+CONFIG = 'simple'
+MAX_TERMS = 10
+
+
+class SearchDocumentField(models.Field):
+    """``tsvector`` on PostgreSQL, text elsewhere"""
+
+    def db_type(self, connection):
+        return 'tsvector' if connection.vendor == 'postgresql' else 'text'
+
+
+class SearchDocument(Func):
+    """The generation expression of ``POI.search_document``"""
+
+    def __init__(self):
+        super().__init__(F('name'), Coalesce(F('description'), Value('')), output_field=SearchDocumentField())
+
+    def as_sql(self, compiler, connection, **extra_context):
+        (name, name_params), (description, description_params) = map(compiler.compile, self.source_expressions)
+        return f"({name} || ' ' || {description})", (*name_params, *description_params)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        (name, name_params), (description, description_params) = map(compiler.compile, self.source_expressions)
+        sql = (f"(setweight(to_tsvector('{CONFIG}', {name}), 'A') || "
+               f"setweight(to_tsvector('{CONFIG}', {description}), 'B'))")
+        return sql, (*name_params, *description_params)
+
+
+# database alias -> whether pg_trgm is installed there
+_trigram = {}
+
+
+def parse_terms(value):
+    """The lowercased words of a query, at most MAX_TERMS"""
+    return re.findall(r'\w+', value.lower())[:MAX_TERMS]
+
+
+def has_trigram(using):
+    if using not in _trigram:
+        connection = connections[using]
+        if connection.vendor != 'postgresql':
+            _trigram[using] = False
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                _trigram[using] = cursor.fetchone() is not None
+    return _trigram[using]
+
+
+def search_queryset(queryset, terms, trigram=False):
+    """``queryset`` filtered to the POIs matching ``terms``, best match first"""
+    if connections[queryset.db].vendor != 'postgresql':
+        return fallback_queryset(queryset, terms)
+
+    # terms are \w+ words, quoted anyway so none is read as an operator
+    tsquery = ' & '.join(f"'{term}':*" for term in terms)
+    match_sql = f"pois_poi.search_document @@ to_tsquery('{CONFIG}', %s)"
+    rank_sql = f"ts_rank(pois_poi.search_document, to_tsquery('{CONFIG}', %s))"
+    match_params, rank_params = [tsquery], [tsquery]
+    if trigram:
+        text = ' '.join(terms)
+        match_sql = f'({match_sql} OR %s <%% pois_poi.name)'
+        rank_sql = f'greatest({rank_sql}, word_similarity(%s, pois_poi.name))'
+        match_params.append(text)
+        rank_params.append(text)
+    return (
+        queryset
+        .filter(RawSQL(match_sql, match_params, output_field=BooleanField()))
+        .annotate(rank=RawSQL(rank_sql, rank_params, output_field=FloatField()))
+        .order_by('-rank', '-id')
+    )
+
+
+def fallback_queryset(queryset, terms):
+    """Every term in the name or description; name matches rank first"""
+    rank = Value(0)
+    for term in terms:
+        queryset = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+        rank = rank + Case(When(name__icontains=term, then=Value(1)), default=Value(0), output_field=IntegerField())
+    return queryset.annotate(rank=rank).order_by('-rank', '-id')
+
+
+def search(queryset, terms, limit):
+    return list(search_queryset(queryset, terms, has_trigram(queryset.db))[:limit])
+
+
+async def asearch(queryset, terms, limit):
+    """search() using async iteration"""
+    using = queryset.db
+    trigram = _trigram[using] if using in _trigram else await sync_to_async(has_trigram)(using)
+    return [poi async for poi in search_queryset(queryset, terms, trigram)[:limit]]
@@ -1,5 +1,8 @@
+from django.db.models import F
 from rest_framework import serializers
+from .geo import MAX_DISTANCE_M, parse_bbox
 from .models import POI
+from .search import parse_terms
 
 
 class POISerializer(serializers.ModelSerializer):
@@ -35,3 +38,83 @@ class POISerializer(serializers.ModelSerializer):
         if value < -180 or value > 180:
             raise serializers.ValidationError("Longitude must be between -180 and 180 degrees.")
         return value
+
+
+class POIValuesSerializer(serializers.BaseSerializer):
+    """
+    Read-only serializer for rows produced by ``POIValuesSerializer.values()``.
+    Renders the same payload as POISerializer without building model instances
+    or running per-field serializer machinery, which dominates large lists.
+    """
+    fields = ('id', 'name', 'description', 'latitude', 'longitude', 'created_by', 'created_at', 'updated_at')
+
+    @classmethod
+    def values(cls, queryset):
+        return queryset.values(*cls.fields, created_by_username=F('created_by__username'))
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'description': row['description'],
+            # the db already hands back Decimals quantized to the column's 6 places
+            'latitude': str(row['latitude']),
+            'longitude': str(row['longitude']),
+            'created_by': row['created_by'],
+            'created_by_username': row['created_by_username'],
+            'created_at': format_datetime(row['created_at']),
+            'updated_at': format_datetime(row['updated_at']),
+        }
+
+
+class POINearbySerializer(POIValuesSerializer):
+    """POIValuesSerializer for rows annotated with their ``distance`` in meters"""
+
+    def to_representation(self, row):
+        data = super().to_representation(row)
+        data['distance_m'] = round(row['distance'], 1)
+        return data
+
+
+class NearbyQuerySerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lng = serializers.FloatField(min_value=-180, max_value=180)
+    radius_m = serializers.FloatField(min_value=0, max_value=MAX_DISTANCE_M, required=False)
+    k = serializers.IntegerField(min_value=1, max_value=500, default=20)
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+    bbox = serializers.CharField(required=False)
+    lat = serializers.FloatField(min_value=-90, max_value=90, required=False)
+    lng = serializers.FloatField(min_value=-180, max_value=180, required=False)
+    radius_m = serializers.FloatField(min_value=0, max_value=MAX_DISTANCE_M, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+    def validate_q(self, value):
+        terms = parse_terms(value)
+        if not terms:
+            raise serializers.ValidationError("q must contain at least one word.")
+        return terms
+
+    def validate_bbox(self, value):
+        try:
+            return parse_bbox(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+    def validate(self, data):
+        circle = [name for name in ('lat', 'lng', 'radius_m') if name in data]
+        if circle and len(circle) < 3:
+            raise serializers.ValidationError("lat, lng and radius_m must be given together.")
+        if circle and 'bbox' in data:
+            raise serializers.ValidationError("Filter by bbox or by lat, lng and radius_m, not both.")
+        return data
+
+
+def format_datetime(value):
+    """Format a UTC datetime the way DRF's DateTimeField does"""
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
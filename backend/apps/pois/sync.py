@@ -0,0 +1,78 @@
+"""
+Delta sync of a user's POIs.
+
+Clients keep the opaque cursor from each response and send it back as
+``since`` to receive only the POIs created or updated, and the ids of those
+deleted, after it. Changed POIs and tombstones are two independent keyset
+streams, ordered by (sync_version, id); the cursor holds the position reached
+in each.
+
+``sync_version`` is the user's data version of the write that last touched a
+row. Data versions are handed out under a per-user row lock held until the
+write commits (see bump_data_version), so they increase in commit order:
+once a version is visible every smaller one is, and a cursor never moves past
+a write that commits later. Timestamps taken before commit give no such
+guarantee. A POI changed again after being returned is returned again.
+"""
+import base64
+import binascii
+
+from django.db.models import F, Q
+from rest_framework.exceptions import ValidationError
+
+from .models import POI, POITombstone
+from .serializers import POIValuesSerializer
+
+START = ((0, 0), (0, 0))
+
+
+def encode_cursor(position):
+    (changed_version, changed_id), (deleted_version, deleted_id) = position
+    raw = f'{changed_version}|{changed_id}|{deleted_version}|{deleted_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        changed_version, changed_id, deleted_version, deleted_id = map(int, raw.split('|'))
+        return (changed_version, changed_id), (deleted_version, deleted_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValidationError({'since': ['Invalid cursor.']})
+
+
+def after(position):
+    version, pk = position
+    return Q(sync_version__gt=version) | Q(sync_version=version, id__gt=pk)
+
+
+def get_changes(user, since=None, limit=500):
+    """Return up to ``limit`` changed POIs and deleted ids after ``since``"""
+    changed_position, deleted_position = decode_cursor(since) if since else START
+
+    changed = list(
+        POIValuesSerializer.values(POI.objects.filter(created_by=user))
+        .filter(after(changed_position))
+        .annotate(version=F('sync_version'))
+        .order_by('sync_version', 'id')[:limit + 1]
+    )
+    deleted = list(
+        POITombstone.objects
+        .filter(created_by=user)
+        .filter(after(deleted_position))
+        .order_by('sync_version', 'id')
+        .values('id', 'poi_id', 'sync_version')[:limit + 1]
+    )
+    has_more = len(changed) > limit or len(deleted) > limit
+    changed, deleted = changed[:limit], deleted[:limit]
+
+    if changed:
+        changed_position = (changed[-1]['version'], changed[-1]['id'])
+    if deleted:
+        deleted_position = (deleted[-1]['sync_version'], deleted[-1]['id'])
+    return {
+        'changed': POIValuesSerializer(changed, many=True).data,
+        'deleted': [tombstone['poi_id'] for tombstone in deleted],
+        'cursor': encode_cursor((changed_position, deleted_position)),
+        'has_more': has_more,
+    }
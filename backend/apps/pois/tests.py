@@ -1,10 +1,39 @@
+from asgiref.sync import sync_to_async
 from rest_framework.test import APIClient
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
-from django.urls import reverse
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections, router
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.test import AsyncClient, SimpleTestCase, override_settings
+from django.urls import resolve, reverse
 from rest_framework import status
+from datetime import timedelta
 from decimal import Decimal
+import asyncio
+import csv
+import io
+import inspect
+import json
+import tempfile
+import time
+import tracemalloc
+from unittest import mock, skipUnless
+from apps.core.routers import ReplicaRouter, pin_key, read_alias
+from .management.commands.import_pois import read_geojson
+from .geo import MAX_ZOOM, count_tiles, radius_bbox, tile_bounds, tile_x, tile_y, tiles_for_bbox
+from . import events, geohash
+from .models import POI, POIDataVersion, POITombstone
+from .columns import decode_columns, encode_columns
+from .mvt import encode_tile
+from .search import parse_terms, search_queryset
+from .serializers import POISerializer, POIValuesSerializer
+from .sync import get_changes
+from .versions import aget_data_version, bump_data_version
 
 User = get_user_model()
 
@@ -53,7 +82,7 @@ class PoisTests(APITestCase):
 
         response = self.authenticated_client.get(self.pois_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
         data = {
             'name': 'this place',
@@ -67,12 +96,12 @@ class PoisTests(APITestCase):
 
         response = self.authenticated_client.get(self.pois_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
 
         # only get pois belonging to the user
         response = self.authenticated_client2.get(self.pois_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 0)
+        self.assertEqual(len(response.data['results']), 0)
 
 
 class PoiTests(APITestCase):
@@ -210,3 +239,1497 @@ class PoiTests(APITestCase):
         id = response.data['id']
         response = self.authenticated_client2.delete(reverse('api:pois:poi', kwargs={'pk': id}))
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class PoisBboxTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dered', email='dered@dered.com', password='dered1234')
+        refresh = RefreshToken.for_user(self.user)
+        self.authenticated_client = APIClient()
+        self.authenticated_client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        self.user2 = User.objects.create_user(username='dered2', email='dered2@dered.com', password='dered1234')
+
+        self.pois_url = reverse('api:pois:pois')
+
+    def create_poi(self, name, latitude, longitude, user=None):
+        return POI.objects.create(
+            name=name,
+            latitude=latitude,
+            longitude=longitude,
+            created_by=user or self.user,
+        )
+
+    def get_names(self, bbox):
+        response = self.authenticated_client.get(self.pois_url, {'bbox': bbox})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(poi['name'] for poi in response.data['results'])
+
+    def test_bbox_filters_pois(self):
+        self.create_poi('denver', 39.7392, -104.9903)
+        self.create_poi('boulder', 40.0150, -105.2705)
+        self.create_poi('paris', 48.8566, 2.3522)
+        self.create_poi('other users denver', 39.7392, -104.9903, user=self.user2)
+
+        self.assertEqual(self.get_names('-106,39,-104,41'), ['boulder', 'denver'])
+        self.assertEqual(self.get_names('2,48,3,49'), ['paris'])
+        self.assertEqual(self.get_names('0,0,1,1'), [])
+
+    def test_bbox_edges_are_inclusive(self):
+        self.create_poi('corner', 10, 20)
+        self.assertEqual(self.get_names('20,10,21,11'), ['corner'])
+        self.assertEqual(self.get_names('19,9,20,10'), ['corner'])
+
+    def test_bbox_crossing_antimeridian(self):
+        self.create_poi('fiji', -17.7134, 178.0650)
+        self.create_poi('samoa', -13.7590, -172.1046)
+        self.create_poi('sydney', -33.8688, 151.2093)
+
+        self.assertEqual(self.get_names('170,-20,-170,-10'), ['fiji', 'samoa'])
+        self.assertEqual(self.get_names('179,-20,-179,-10'), [])
+
+    def test_bbox_invalid(self):
+        for bbox in ['1,2,3', 'a,b,c,d', '0,0,0,nan', '0,-91,1,1', '-181,0,1,1', '0,10,1,5']:
+            response = self.authenticated_client.get(self.pois_url, {'bbox': bbox})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, bbox)
+            self.assertIn('bbox', response.data)
+
+
+class PoisPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dered', email='dered@dered.com', password='dered1234')
+        refresh = RefreshToken.for_user(self.user)
+        self.authenticated_client = APIClient()
+        self.authenticated_client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        self.pois_url = reverse('api:pois:pois')
+
+    def test_pages_follow_next_cursor(self):
+        pois = [POI.objects.create(name=f'poi {i}', latitude=i, longitude=i, created_by=self.user) for i in range(7)]
+        # equal timestamps must be ordered by the id tiebreaker, not skipped or repeated
+        POI.objects.filter(id__in=[poi.id for poi in pois[2:5]]).update(created_at=pois[2].created_at)
+
+        ids = []
+        url = self.pois_url + '?page_size=3'
+        while url:
+            response = self.authenticated_client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 3)
+            ids += [poi['id'] for poi in response.data['results']]
+            url = response.data['next']
+
+        expected = sorted(POI.objects.all(), key=lambda poi: (poi.created_at, poi.id), reverse=True)
+        self.assertEqual(ids, [poi.id for poi in expected])
+
+    def test_last_page_has_no_next(self):
+        POI.objects.create(name='only', latitude=0, longitude=0, created_by=self.user)
+        response = self.authenticated_client.get(self.pois_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+    def test_invalid_cursor(self):
+        response = self.authenticated_client.get(self.pois_url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PoisQueryCountTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dered', email='dered@dered.com', password='dered1234')
+        refresh = RefreshToken.for_user(self.user)
+        self.authenticated_client = APIClient()
+        self.authenticated_client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        self.pois_url = reverse('api:pois:pois')
+
+    def create_pois(self, count):
+        POI.objects.bulk_create(
+            POI(name=f'poi {i}', latitude=i % 90, longitude=i % 180, created_by=self.user) for i in range(count)
+        )
+
+    def test_list_query_count_is_constant(self):
+        created = 0
+        for size in [1, 10, 50]:
+            self.create_pois(size - created)
+            created = size
+            # the user is cached after the first request: read their data version, fetch the page
+            with self.assertNumQueries(3 if size == 1 else 2):
+                response = self.authenticated_client.get(self.pois_url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data['results']), size)
+
+    def test_detail_query_count(self):
+        self.create_pois(1)
+        poi = POI.objects.get()
+        with self.assertNumQueries(3):
+            response = self.authenticated_client.get(reverse('api:pois:poi', kwargs={'pk': poi.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created_by_username'], self.user.username)
+
+    def test_values_serializer_matches_model_serializer(self):
+        POI.objects.create(name='a', description=None, latitude='-12.345678', longitude='100.5', created_by=self.user)
+        POI.objects.create(name='b', description='desc', latitude=0, longitude=-180, created_by=self.user)
+        queryset = POI.objects.filter(created_by=self.user).order_by('id')
+        self.assertEqual(
+            POIValuesSerializer(POIValuesSerializer.values(queryset), many=True).data,
+            POISerializer(queryset, many=True).data,
+        )
+
+
+class TileTests(SimpleTestCase):
+    def test_tile_of_point(self):
+        self.assertEqual((tile_x(0, 0), tile_y(0, 0)), (0, 0))
+        self.assertEqual((tile_x(-104.99, 10), tile_y(39.74, 10)), (213, 388))
+        self.assertEqual((tile_x(180, 3), tile_y(-90, 3)), (7, 7))
+        self.assertEqual((tile_x(-180, 3), tile_y(90, 3)), (0, 0))
+
+    def test_tile_bounds(self):
+        west, south, east, north = tile_bounds(1, 1, 0)
+        self.assertEqual((west, south, east), (0, 0, 180))
+        self.assertAlmostEqual(north, 85.0511287798, places=6)
+
+    def test_tiles_for_bbox_crossing_antimeridian(self):
+        self.assertEqual(tiles_for_bbox(170, -10, -170, 10, 2), [(3, 1), (3, 2), (0, 1), (0, 2)])
+        self.assertEqual(count_tiles(170, -10, -170, 10, 2), 4)
+
+    def test_count_tiles(self):
+        self.assertEqual(count_tiles(0, 0, 1, 1, 0), 1)
+        self.assertEqual(count_tiles(-180, -85, 180, 85, 3), 64)
+        self.assertEqual(count_tiles(-180, -90, 180, 90, MAX_ZOOM), 4 ** MAX_ZOOM)
+
+
+class PoiClustersTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='dered', email='dered@dered.com', password='dered1234')
+        refresh = RefreshToken.for_user(self.user)
+        self.authenticated_client = APIClient()
+        self.authenticated_client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        self.user2 = User.objects.create_user(username='dered2', email='dered2@dered.com', password='dered1234')
+
+        self.pois_url = reverse('api:pois:pois')
+        self.clusters_url = reverse('api:pois:clusters')
+
+    def get_clusters(self, bbox, zoom):
+        response = self.authenticated_client.get(self.clusters_url, {'bbox': bbox, 'zoom': zoom})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(response.data['clusters'], key=lambda cluster: -cluster['count'])
+
+    def test_clusters_group_nearby_pois(self):
+        denver = [
+            POI.objects.create(name=f'denver {i}', latitude=39.7 + i / 100, longitude=-105 + i / 100, created_by=self.user)
+            for i in range(3)
+        ]
+        paris = POI.objects.create(name='paris', latitude=48.85, longitude=2.35, created_by=self.user)
+        POI.objects.create(name='not mine', latitude=39.7, longitude=-105, created_by=self.user2)
+
+        clusters = self.get_clusters('-180,-85,180,85', 2)
+        self.assertEqual(len(clusters), 2)
+        self.assertEqual(clusters[0]['count'], 3)
+        self.assertAlmostEqual(clusters[0]['latitude'], 39.71)
+        self.assertAlmostEqual(clusters[0]['longitude'], -104.99)
+        self.assertEqual(clusters[0]['poi_id'], denver[0].id)
+        self.assertEqual(clusters[1], {'count': 1, 'latitude': 48.85, 'longitude': 2.35, 'poi_id': paris.id})
+
+        # zoomed in far enough the denver POIs separate
+        clusters = self.get_clusters('-105.01,39.69,-104.97,39.73', 14)
+        self.assertEqual([cluster['count'] for cluster in clusters], [1, 1, 1])
+
+    def test_poi_on_tile_edge_is_counted_once(self):
+        POI.objects.create(name='origin', latitude=0, longitude=0, created_by=self.user)
+        POI.objects.create(name='pole', latitude=90, longitude=180, created_by=self.user)
+        clusters = self.get_clusters('-180,-90,180,90', 1)
+        self.assertEqual(sum(cluster['count'] for cluster in clusters), 2)
+
+    def test_writes_invalidate_cached_clusters(self):
+        data = {'name': 'cool', 'description': 'cool place', 'latitude': 1, 'longitude': 1}
+        self.assertEqual(self.get_clusters('0,0,2,2', 5), [])
+
+        response = self.authenticated_client.post(self.pois_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        poi_url = reverse('api:pois:poi', kwargs={'pk': response.data['id']})
+        self.assertEqual(len(self.get_clusters('0,0,2,2', 5)), 1)
+
+        data['latitude'] = -20
+        response = self.authenticated_client.put(poi_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_clusters('0,0,2,2', 5), [])
+        self.assertEqual(len(self.get_clusters('0,-21,2,-19', 5)), 1)
+
+        response = self.authenticated_client.delete(poi_url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.get_clusters('0,-21,2,-19', 5), [])
+
+    def test_clusters_are_cached(self):
+        POI.objects.create(name='cool', latitude=1, longitude=1, created_by=self.user)
+        bump_data_version(self.user.pk)
+        self.get_clusters('0,0,2,2', 5)
+        POI.objects.all().delete()  # bypasses the write paths, so the cache is not invalidated
+        self.assertEqual(len(self.get_clusters('0,0,2,2', 5)), 1)
+
+    def test_users_without_a_version_are_not_cached(self):
+        POI.objects.create(name='cool', latitude=1, longitude=1, created_by=self.user)
+        self.assertEqual(len(self.get_clusters('0,0,2,2', 5)), 1)
+        POI.objects.all().delete()
+        self.assertEqual(self.get_clusters('0,0,2,2', 5), [])
+
+    def test_invalid_params(self):
+        for params in [{}, {'bbox': '0,0,1,1'}, {'bbox': '0,0,1,1', 'zoom': 23}, {'bbox': '-180,-85,180,85', 'zoom': 10}]:
+            response = self.authenticated_client.get(self.clusters_url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_world_bbox_at_high_zoom_is_rejected_without_listing_tiles(self):
+        with mock.patch('apps.pois.views.tiles_for_bbox') as tiles_for_bbox:
+            for bbox in ('-180,-85,180,85', '170,-85,-170,85'):
+                response = self.authenticated_client.get(self.clusters_url, {'bbox': bbox, 'zoom': MAX_ZOOM})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, bbox)
+                self.assertIn('bbox', response.data)
+        tiles_for_bbox.assert_not_called()
+
+
+def decode_message(data):
+    """Decode a protobuf message into {field number: [values]} for the mvt tests"""
+    fields = {}
+    position = 0
+
+    def read_varint():
+        nonlocal position
+        value = shift = 0
+        while True:
+            byte = data[position]
+            position += 1
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                return value
+
+    while position < len(data):
+        key = read_varint()
+        if key & 0x7 == 0:
+            value = read_varint()
+        else:
+            length = read_varint()
+            value = data[position:position + length]
+            position += length
+        fields.setdefault(key >> 3, []).append(value)
+    return fields
+
+
+def decode_varints(data):
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            values.append(value)
+            value = shift = 0
+    return values
+
+
+class MVTTests(SimpleTestCase):
+    def test_encode_point(self):
+        tile = decode_message(encode_tile('pois', [(7, 0, 0, {'name': 'origin'})], 1, 1, 1))
+        layer = decode_message(tile[3][0])
+        self.assertEqual(layer[15], [2])
+        self.assertEqual(layer[1], [b'pois'])
+        self.assertEqual(layer[3], [b'name'])
+        self.assertEqual(decode_message(layer[4][0]), {1: [b'origin']})
+        self.assertEqual(layer[5], [4096])
+
+        feature = decode_message(layer[2][0])
+        self.assertEqual(feature[1], [7])
+        self.assertEqual(decode_varints(feature[2][0]), [0, 0])
+        self.assertEqual(feature[3], [1])
+        # MoveTo(1) to the tile's top left corner
+        self.assertEqual(decode_varints(feature[4][0]), [9, 0, 0])
+
+    def test_encode_shares_keys_and_values(self):
+        features = [(1, 10, 10, {'name': 'a'}), (2, 11, 11, {'name': 'b'}), (3, 12, 12, {'name': 'a'})]
+        layer = decode_message(decode_message(encode_tile('pois', features, 0, 0, 0))[3][0])
+        self.assertEqual(len(layer[2]), 3)
+        self.assertEqual(layer[3], [b'name'])
+        self.assertEqual(len(layer[4]), 2)
+        self.assertEqual(decode_varints(decode_message(layer[2][2])[2][0]), [0, 0])
+
+    def test_encode_negative_pixel_coordinates(self):
+        layer = decode_message(decode_message(encode_tile('pois', [(1, -180, 0, {})], 1, 1, 0))[3][0])
+        geometry = decode_varints(decode_message(layer[2][0])[4][0])
+        # zigzag(-4096), zigzag(4096)
+        self.assertEqual(geometry, [9, 8191, 8192])
+
+    def test_empty_tile(self):
+        self.assertEqual(encode_tile('pois', [], 0, 0, 0), b'')
+
+
+class PoiTileTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='dered', email='dered@dered.com', password='dered1234')
+        refresh = RefreshToken.for_user(self.user)
+        self.authenticated_client = APIClient()
+        self.authenticated_client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        self.user2 = User.objects.create_user(username='dered2', email='dered2@dered.com', password='dered1234')
+
+    def tile_url(self, z, x, y):
+        return reverse('api:pois:tile', kwargs={'z': z, 'x': x, 'y': y})
+
+    def feature_ids(self, response):
+        if not response.content:
+            return []
+        layer = decode_message(decode_message(response.content)[3][0])
+        return sorted(decode_message(feature)[1][0] for feature in layer[2])
+
+    def test_get_tile(self):
+        denver = POI.objects.create(name='denver', latitude=39.74, longitude=-104.99, created_by=self.user)
+        POI.objects.create(name='paris', latitude=48.85, longitude=2.35, created_by=self.user)
+        POI.objects.create(name='not mine', latitude=39.74, longitude=-104.99, created_by=self.user2)
+
+        response = self.authenticated_client.get(self.tile_url(10, 213, 388), HTTP_ACCEPT='application/vnd.mapbox-vector-tile')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        self.assertEqual(self.feature_ids(response), [denver.id])
+
+        response = self.authenticated_client.get(self.tile_url(10, 0, 0))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.feature_ids(response), [])
+
+    def test_tile_etag(self):
+        POI.objects.create(name='denver', latitude=39.74, longitude=-104.99, created_by=self.user)
+        url = self.tile_url(0, 0, 0)
+        response = self.authenticated_client.get(url)
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):  # data version only, the user is cached
+            response = self.authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.authenticated_client.post(
+            reverse('api:pois:pois'), {'name': 'paris', 'latitude': 48.85, 'longitude': 2.35}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.authenticated_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(self.feature_ids(response)), 2)
+
+    def test_tiles_of_users_without_a_version_are_not_cached(self):
+        POI.objects.create(name='denver', latitude=39.74, longitude=-104.99, created_by=self.user)
+        self.assertEqual(len(self.feature_ids(self.authenticated_client.get(self.tile_url(0, 0, 0)))), 1)
+        POI.objects.all().delete()
+        self.assertEqual(self.feature_ids(self.authenticated_client.get(self.tile_url(0, 0, 0))), [])
+
+    def test_tile_out_of_range(self):
+        response = self.authenticated_client.get(self.tile_url(1, 2, 0))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.authenticated_client.get(self.tile_url(23, 0, 0))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RadiusBboxTests(SimpleTestCase):
+    def test_radius_bbox(self):
+        min_lng, min_lat, max_lng, max_lat = radius_bbox(0, 0, 111_195)  # ~1 degree
+        self.assertAlmostEqual(min_lat, -1, places=3)
+        self.assertAlmostEqual(max_lat, 1, places=3)
+        self.assertAlmostEqual(min_lng, -1, places=3)
+        self.assertAlmostEqual(max_lng, 1, places=3)
+
+    def test_radius_bbox_crossing_antimeridian(self):
+        min_lng, min_lat, max_lng, max_lat = radius_bbox(0, 179.5, 111_195)
+        self.assertAlmostEqual(min_lng, 178.5, places=3)
+        self.assertAlmostEqual(max_lng, -179.5, places=3)
+
+    def test_radius_bbox_covering_pole(self):
+        min_lng, min_lat, max_lng, max_lat = radius_bbox(89.5, 10, 111_195)
+        self.assertEqual((min_lng, max_lng, max_lat), (-180, 180, 90))
+        self.assertAlmostEqual(min_lat, 88.5, places=3)
+
+
+class PoiNearbyTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dered', email='dered@dered.com', password='dered1234')
+        refresh = RefreshToken.for_user(self.user)
+        self.authenticated_client = APIClient()
+        self.authenticated_client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        self.user2 = User.objects.create_user(username='dered2', email='dered2@dered.com', password='dered1234')
+
+        self.nearby_url = reverse('api:pois:nearby')
+
+    def create_poi(self, name, latitude, longitude, user=None):
+        return POI.objects.create(name=name, latitude=latitude, longitude=longitude, created_by=user or self.user)
+
+    def get_nearby(self, **params):
+        response = self.authenticated_client.get(self.nearby_url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(poi['name'], poi['distance_m']) for poi in response.data['results']]
+
+    def test_nearest_first_with_distance(self):
+        self.create_poi('denver', 39.7392, -104.9903)
+        self.create_poi('boulder', 40.0150, -105.2705)
+        self.create_poi('paris', 48.8566, 2.3522)
+        self.create_poi('not mine', 39.7392, -104.9903, user=self.user2)
+
+        results = self.get_nearby(lat=39.7392, lng=-104.9903)
+        self.assertEqual([name for name, _ in results], ['denver', 'boulder', 'paris'])
+        self.assertEqual(results[0][1], 0)
+        self.assertAlmostEqual(results[1][1], 38_900, delta=200)
+        self.assertAlmostEqual(results[2][1], 7_860_000, delta=20_000)
+
+    def test_k_limits_results(self):
+        for i in range(5):
+            self.create_poi(f'poi {i}', i, i)
+        results = self.get_nearby(lat=0, lng=0, k=2)
+        self.assertEqual([name for name, _ in results], ['poi 0', 'poi 1'])
+
+    def test_radius_limits_results(self):
+        self.create_poi('near', 0, 0.001)
+        self.create_poi('far', 0, 0.01)
+        self.assertEqual([name for name, _ in self.get_nearby(lat=0, lng=0, radius_m=200)], ['near'])
+        self.assertEqual(self.get_nearby(lat=10, lng=10, radius_m=200), [])
+
+    def test_nearby_across_antimeridian_and_pole(self):
+        self.create_poi('east', 0, 179.99)
+        self.create_poi('west', 0, -179.99)
+        self.create_poi('pole', 89.999, 45)
+        self.assertEqual([name for name, _ in self.get_nearby(lat=0, lng=-179.995, radius_m=2000)], ['west', 'east'])
+        self.assertEqual([name for name, _ in self.get_nearby(lat=90, lng=-135, radius_m=1000)], ['pole'])
+
+    def test_invalid_params(self):
+        for params in [{}, {'lat': 0}, {'lat': 91, 'lng': 0}, {'lat': 0, 'lng': 0, 'k': 0}, {'lat': 0, 'lng': 0, 'radius_m': -1}]:
+            response = self.authenticated_client.get(self.nearby_url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class GeohashTests(SimpleTestCase):
+    def test_encode(self):
+        self.assertEqual(geohash.encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(geohash.encode(Decimal('39.739200'), Decimal('-104.990300')), '9xj64fk3sey1')
+
+    def test_cell_boundaries(self):
+        # west and south edges belong to the cell, east and north edges to the next one
+        self.assertEqual(geohash.encode(0, 0, 1), 's')
+        self.assertEqual(geohash.encode(-0.000001, 0, 1), 'k')
+        self.assertEqual(geohash.encode(0, -0.000001, 1), 'e')
+        self.assertEqual(geohash.encode(-0.000001, -0.000001, 1), '7')
+        self.assertEqual(geohash.encode(45, 45, 2), 'v0')
+        self.assertEqual(geohash.encode(44.999999, 44.999999, 2), 'sz')
+
+    def test_poles_and_antimeridian(self):
+        self.assertEqual(geohash.encode(90, 180), 'zzzzzzzzzzzz')
+        self.assertEqual(geohash.encode(-90, -180), '000000000000')
+        self.assertEqual(geohash.encode(90, 0, 2), 'up')
+        self.assertEqual(geohash.encode(-90, 0, 2), 'h0')
+        west, south, east, north = geohash.decode_bounds(geohash.encode(90, -180, 3))
+        self.assertEqual((west, north), (-180, 90))
+
+    def test_decode_bounds_contain_point(self):
+        for latitude, longitude in [(39.7392, -104.9903), (-33.8688, 151.2093), (89.9999, 179.9999)]:
+            west, south, east, north = geohash.decode_bounds(geohash.encode(latitude, longitude, 7))
+            self.assertTrue(west <= longitude < east and south <= latitude < north)
+
+    def test_covering(self):
+        cells = geohash.covering(-105.3, 39.6, -104.8, 40.1)
+        self.assertLessEqual(len(cells), geohash.MAX_COVERING_CELLS)
+        for latitude, longitude in [(39.6, -105.3), (40.1, -104.8), (39.85, -105)]:
+            self.assertTrue(any(geohash.encode(latitude, longitude).startswith(cell) for cell in cells))
+
+    def test_covering_across_antimeridian_and_poles(self):
+        cells = geohash.covering(179, -1, -179, 1)
+        for longitude in [179, 180, -180, -179]:
+            self.assertTrue(any(geohash.encode(0, longitude).startswith(cell) for cell in cells))
+        cells = geohash.covering(-180, 89, 180, 90)
+        self.assertIn(geohash.encode(90, 0, len(cells[0])), cells)
+        self.assertIsNone(geohash.covering(-180, -90, 180, 90))
+
+
+class PoiGeohashTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dered', email='dered@dered.com', password='dered1234')
+
+    def test_geohash_kept_in_sync(self):
+        poi = POI.objects.create(name='denver', latitude='39.739200', longitude='-104.990300', created_by=self.user)
+        self.assertEqual(POI.objects.get(pk=poi.pk).geohash, '9xj64fk3sey1')
+
+        poi.latitude, poi.longitude = 48.8566, 2.3522
+        poi.save(update_fields=['latitude', 'longitude'])
+        self.assertEqual(POI.objects.get(pk=poi.pk).geohash, geohash.encode(48.8566, 2.3522))
+
+        POI.objects.filter(pk=poi.pk).update(latitude=0, longitude=0)
+        self.assertEqual(POI.objects.get(pk=poi.pk).geohash, geohash.encode(0, 0))
+        with self.assertRaises(ValueError):
+            POI.objects.filter(pk=poi.pk).update(latitude=1)
+
+    def test_geohash_kept_in_sync_in_bulk(self):
+        POI.objects.bulk_create([
+            POI(name='a', latitude=1, longitude=1, created_by=self.user),
+            POI(name='b', latitude=-1, longitude=-1, created_by=self.user),
+        ])
+        pois = list(POI.objects.order_by('name'))
+        self.assertEqual([poi.geohash for poi in pois], [geohash.encode(1, 1), geohash.encode(-1, -1)])
+
+        for poi in pois:
+            poi.latitude = 10
+        POI.objects.bulk_update(pois, ['latitude'])
+        self.assertEqual(
+            list(POI.objects.order_by('name').values_list('geohash', flat=True)),
+            [geohash.encode(10, 1), geohash.encode(10, -1)],
+        )
+
+
+class PoiChangesTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dered', email='dered@dered.com', password='dered1234')
+        refresh = RefreshToken.for_user(self.user)
+        self.authenticated_client = APIClient()
+        self.authenticated_client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        self.user2 = User.objects.create_user(username='dered2', email='dered2@dered.com', password='dered1234')
+        refresh2 = RefreshToken.for_user(self.user2)
+        self.authenticated_client2 = APIClient()
+        self.authenticated_client2.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh2.access_token}')
+
+        self.pois_url = reverse('api:pois:pois')
+        self.changes_url = reverse('api:pois:changes')
+
+    def get_changes(self, since=None):
+        response = self.authenticated_client.get(self.changes_url, {'since': since} if since else {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def create_poi(self, client, name):
+        response = client.post(self.pois_url, {'name': name, 'latitude': 1, 'longitude': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def test_changes_since_cursor(self):
+        first = self.create_poi(self.authenticated_client, 'first')
+        second = self.create_poi(self.authenticated_client, 'second')
+        self.create_poi(self.authenticated_client2, 'not mine')
+
+        changes = self.get_changes()
+        self.assertEqual([poi['id'] for poi in changes['changed']], [first, second])
+        self.assertEqual(changes['deleted'], [])
+        self.assertFalse(changes['has_more'])
+
+        cursor = changes['cursor']
+        changes = self.get_changes(cursor)
+        self.assertEqual((changes['changed'], changes['deleted'], changes['cursor']), ([], [], cursor))
+
+        response = self.authenticated_client.put(
+            reverse('api:pois:poi', kwargs={'pk': first}), {'name': 'renamed', 'latitude': 1, 'longitude': 1}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        third = self.create_poi(self.authenticated_client, 'third')
+        response = self.authenticated_client.delete(reverse('api:pois:poi', kwargs={'pk': second}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        changes = self.get_changes(cursor)
+        self.assertEqual([poi['name'] for poi in changes['changed']], ['renamed', 'third'])
+        self.assertEqual(changes['changed'][1]['id'], third)
+        self.assertEqual(changes['deleted'], [second])
+        self.assertEqual(self.get_changes(changes['cursor'])['changed'], [])
+
+    def test_changes_pages(self):
+        POI.objects.bulk_create(POI(name=f'poi {i}', latitude=0, longitude=0, created_by=self.user) for i in range(5))
+        POI.objects.filter(name__in=['poi 0', 'poi 1', 'poi 2']).delete()
+        bump_data_version(self.user.pk)
+        self.assertEqual(POITombstone.objects.filter(created_by=self.user).count(), 3)
+
+        changes = get_changes(self.user, limit=2)
+        self.assertEqual(len(changes['changed']), 2)
+        self.assertEqual(len(changes['deleted']), 2)
+        self.assertTrue(changes['has_more'])
+        changes = get_changes(self.user, changes['cursor'], limit=2)
+        self.assertEqual(len(changes['changed']), 0)
+        self.assertEqual(len(changes['deleted']), 1)
+        self.assertFalse(changes['has_more'])
+
+    def test_changes_follow_commit_order(self):
+        first = self.create_poi(self.authenticated_client, 'first')
+        cursor = self.get_changes()['cursor']
+
+        # a write stamped before the last read but committed after it
+        late = POI.objects.create(name='late', latitude=0, longitude=0, created_by=self.user)
+        POI.objects.filter(pk=late.pk).update(updated_at=F('updated_at') - timedelta(hours=1))
+        gone = POI.objects.create(name='gone', latitude=0, longitude=0, created_by=self.user).pk
+        POI.objects.get(pk=gone).delete()
+        POITombstone.objects.filter(poi_id=gone).update(deleted_at=F('deleted_at') - timedelta(hours=1))
+        self.assertLess(POI.objects.get(pk=late.pk).updated_at, POI.objects.get(pk=first).updated_at)
+        # not stamped until the write bumps the data version
+        self.assertEqual(self.get_changes(cursor)['changed'], [])
+        bump_data_version(self.user.pk)
+
+        changes = self.get_changes(cursor)
+        self.assertEqual([poi['id'] for poi in changes['changed']], [late.pk])
+        self.assertEqual(changes['deleted'], [gone])
+
+    def test_invalid_cursor(self):
+        response = self.authenticated_client.get(self.changes_url, {'since': 'nope'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('since', response.data)
+
+
+class PoiConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dered', email='dered@dered.com', password='dered1234')
+        refresh = RefreshToken.for_user(self.user)
+        self.authenticated_client = APIClient()
+        self.authenticated_client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        self.user2 = User.objects.create_user(username='dered2', email='dered2@dered.com', password='dered1234')
+        refresh2 = RefreshToken.for_user(self.user2)
+        self.authenticated_client2 = APIClient()
+        self.authenticated_client2.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh2.access_token}')
+
+        self.pois_url = reverse('api:pois:pois')
+        data = {'name': 'cool', 'description': 'cool place', 'latitude': 1, 'longitude': 1}
+        response = self.authenticated_client.post(self.pois_url, data, format='json')
+        self.poi_url = reverse('api:pois:poi', kwargs={'pk': response.data['id']})
+
+    def test_list_not_modified(self):
+        response = self.authenticated_client.get(self.pois_url)
+        etag = response['ETag']
+
+        # read the data version, no user or POI query
+        with self.assertNumQueries(1):
+            response = self.authenticated_client.get(self.pois_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+        # a different query is a different representation
+        response = self.authenticated_client.get(self.pois_url, {'bbox': '0,0,2,2'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_detail_not_modified(self):
+        etag = self.authenticated_client.get(self.poi_url)['ETag']
+        response = self.authenticated_client.get(self.poi_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_of_missing_or_other_users_poi_is_never_not_modified(self):
+        missing_url = reverse('api:pois:poi', kwargs={'pk': 10 ** 9})
+        # as if the client sent the ETag the response would have
+        with mock.patch('apps.pois.async_views.is_not_modified', return_value=True):
+            self.assertEqual(self.authenticated_client.get(missing_url).status_code, status.HTTP_404_NOT_FOUND)
+            self.assertEqual(self.authenticated_client2.get(self.poi_url).status_code, status.HTTP_403_FORBIDDEN)
+            self.assertEqual(self.authenticated_client.get(self.poi_url).status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_writes_change_etag(self):
+        list_etag = self.authenticated_client.get(self.pois_url)['ETag']
+        detail_etag = self.authenticated_client.get(self.poi_url)['ETag']
+
+        data = {'name': 'renamed', 'description': 'cool place', 'latitude': 1, 'longitude': 1}
+        response = self.authenticated_client.put(self.poi_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.authenticated_client.get(self.poi_url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], 'renamed')
+        response = self.authenticated_client.get(self.pois_url, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        list_etag = response['ETag']
+        self.authenticated_client.delete(self.poi_url)
+        response = self.authenticated_client.get(self.pois_url, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [])
+
+    def test_invalid_write_keeps_version(self):
+        version = POIDataVersion.objects.get(user=self.user).version
+        response = self.authenticated_client.post(self.pois_url, {'name': 'bad', 'latitude': 100, 'longitude': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(POIDataVersion.objects.get(user=self.user).version, version)
+
+    def test_etag_is_per_user(self):
+        etag = self.authenticated_client.get(self.pois_url)['ETag']
+        response = self.authenticated_client2.get(self.pois_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class PoiBulkTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dered', email='dered@dered.com', password='dered1234')
+        refresh = RefreshToken.for_user(self.user)
+        self.authenticated_client = APIClient()
+        self.authenticated_client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        self.user2 = User.objects.create_user(username='dered2', email='dered2@dered.com', password='dered1234')
+
+        self.bulk_url = reverse('api:pois:bulk')
+
+    def create_poi(self, name, user=None):
+        return POI.objects.create(name=name, latitude=1, longitude=1, created_by=user or self.user)
+
+    def test_bulk_operations(self):
+        keep = self.create_poi('keep')
+        gone = self.create_poi('gone')
+        operations = [
+            {'op': 'create', 'data': {'name': 'new', 'description': 'a new place', 'latitude': 10, 'longitude': 20}},
+            {'op': 'update', 'id': keep.id, 'data': {'name': 'kept', 'latitude': -5, 'longitude': 5}},
+            {'op': 'delete', 'id': gone.id},
+            {'op': 'create', 'data': {'name': 'newer', 'latitude': 0, 'longitude': 0}},
+        ]
+        response = self.authenticated_client.post(self.bulk_url, {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], [201, 200, 204, 201])
+        self.assertEqual(results[0]['data']['name'], 'new')
+        self.assertEqual(results[0]['data']['created_by_username'], self.user.username)
+        self.assertEqual(results[2]['id'], gone.id)
+
+        self.assertEqual(sorted(POI.objects.values_list('name', flat=True)), ['kept', 'new', 'newer'])
+        kept = POI.objects.get(pk=keep.pk)
+        self.assertEqual((kept.latitude, kept.longitude), (Decimal(-5), Decimal(5)))
+        self.assertEqual(kept.geohash, geohash.encode(-5, 5))
+        self.assertGreater(kept.updated_at, keep.updated_at)
+        self.assertEqual(POI.objects.get(name='new').geohash, geohash.encode(10, 20))
+        self.assertTrue(POITombstone.objects.filter(poi_id=gone.id, created_by=self.user).exists())
+
+    def test_query_count_does_not_grow_with_batch(self):
+        def run_batch(size):
+            pois = [self.create_poi(f'poi {i}') for i in range(2 * size)]
+            operations = (
+                [{'op': 'create', 'data': {'name': 'new', 'latitude': 0, 'longitude': 0}}] * size
+                + [{'op': 'update', 'id': poi.id, 'data': {'name': 'x', 'latitude': 0, 'longitude': 0}} for poi in pois[:size]]
+                + [{'op': 'delete', 'id': poi.id} for poi in pois[size:]]
+            )
+            with CaptureQueriesContext(connection) as queries:
+                response = self.authenticated_client.post(self.bulk_url, {'operations': operations}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        run_batch(1)  # creates the data version row
+        self.assertEqual(run_batch(2), run_batch(50))
+
+    def test_invalid_batch_writes_nothing(self):
+        mine = self.create_poi('mine')
+        theirs = self.create_poi('theirs', user=self.user2)
+        operations = [
+            {'op': 'create', 'data': {'name': 'fine', 'latitude': 0, 'longitude': 0}},
+            {'op': 'create', 'data': {'name': 'bad', 'latitude': 100, 'longitude': 0}},
+            {'op': 'update', 'id': theirs.id, 'data': {'name': 'stolen', 'latitude': 0, 'longitude': 0}},
+            {'op': 'delete', 'id': mine.id},
+            {'op': 'delete', 'id': mine.id},
+        ]
+        response = self.authenticated_client.post(self.bulk_url, {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], [424, 400, 404, 424, 400])
+        self.assertIn('latitude', results[1]['errors'])
+        self.assertEqual(sorted(POI.objects.values_list('name', flat=True)), ['mine', 'theirs'])
+
+    def test_invalid_envelope(self):
+        for body in [{}, {'operations': []}, {'operations': [{'op': 'move'}]}, {'operations': [{'op': 'delete'}]},
+                     {'operations': [{'op': 'create'}]}, {'operations': [{'op': 'delete', 'id': 1}] * 501}]:
+            response = self.authenticated_client.post(self.bulk_url, body, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('operations', response.data)
+
+
+class PoiExportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dered', email='dered@dered.com', password='dered1234')
+        refresh = RefreshToken.for_user(self.user)
+        self.authenticated_client = APIClient()
+        self.authenticated_client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        self.auth_headers = {'Authorization': f'Bearer {refresh.access_token}'}
+
+        self.user2 = User.objects.create_user(username='dered2', email='dered2@dered.com', password='dered1234')
+
+        self.export_url = reverse('api:pois:export')
+
+    def export(self, export_format=None):
+        response = self.authenticated_client.get(self.export_url, {'format': export_format} if export_format else {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def create_pois(self, count, user=None):
+        POI.objects.bulk_create(
+            POI(name=f'poi {i}', description='a, "quoted" place', latitude=i % 90, longitude=-(i % 180),
+                created_by=user or self.user)
+            for i in range(count)
+        )
+
+    def test_export_geojson(self):
+        self.create_pois(3)
+        self.create_pois(1, user=self.user2)
+        response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'application/geo+json')
+        self.assertIn('pois.geojson', response['Content-Disposition'])
+        collection = json.loads(content)
+        self.assertEqual(collection['type'], 'FeatureCollection')
+        self.assertEqual(len(collection['features']), 3)
+        feature = collection['features'][1]
+        self.assertEqual(feature['geometry'], {'type': 'Point', 'coordinates': [-1, 1]})
+        self.assertEqual(feature['properties']['name'], 'poi 1')
+
+    def test_export_empty_geojson(self):
+        _, content = self.export('geojson')
+        self.assertEqual(json.loads(content), {'type': 'FeatureCollection', 'features': []})
+
+    def test_export_ndjson(self):
+        self.create_pois(3)
+        response, content = self.export('ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row['name'] for row in rows], ['poi 0', 'poi 1', 'poi 2'])
+        self.assertEqual(rows[2]['latitude'], '2.000000')
+
+    def test_export_csv(self):
+        self.create_pois(2)
+        response, content = self.export('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1]['description'], 'a, "quoted" place')
+        self.assertEqual(rows[1]['longitude'], '-1.000000')
+
+    def test_unknown_format(self):
+        response = self.authenticated_client.get(self.export_url, {'format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_errors_are_json(self):
+        for client, params, headers, status_code in [
+            (APIClient(), {'format': 'csv'}, {}, status.HTTP_401_UNAUTHORIZED),
+            (self.authenticated_client, {}, {'Accept': 'application/xml'}, status.HTTP_406_NOT_ACCEPTABLE),
+        ]:
+            response = client.get(self.export_url, params, headers=headers)
+            self.assertEqual(response.status_code, status_code)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            self.assertIn('detail', response.json())
+
+    async def test_export_under_asgi(self):
+        await sync_to_async(self.create_pois)(3)
+        response = await AsyncClient().get(self.export_url, {'format': 'geojson'}, headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # served without consuming a sync iterator first
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([feature['properties']['name'] for feature in json.loads(content)['features']],
+                         ['poi 0', 'poi 1', 'poi 2'])
+
+    def test_export_memory_stays_flat(self):
+        def peak_memory():
+            tracemalloc.start()
+            try:
+                response = self.authenticated_client.get(self.export_url, {'format': 'ndjson'})
+                rows = sum(chunk.count(b'\n') for chunk in response.streaming_content)
+                return tracemalloc.get_traced_memory()[1], rows
+            finally:
+                tracemalloc.stop()
+
+        self.create_pois(2000)
+        small_peak, rows = peak_memory()
+        self.assertEqual(rows, 2000)
+        self.create_pois(18000)
+        large_peak, rows = peak_memory()
+        self.assertEqual(rows, 20000)
+        self.assertLess(large_peak, small_peak * 1.5)
+
+
+class PoiImportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, filename, content):
+        path = f'{self.directory.name}/{filename}'
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def run_import(self, path, *args):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('import_pois', path, '--user', 'testuser', *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_csv(self):
+        path = self.write('pois.csv', (
+            'name,description,latitude,longitude\n'
+            'Cafe,"Coffee, cake",40.7128,-74.006\n'
+            'Park,,51.5,-0.12\n'
+        ))
+        stdout, stderr = self.run_import(path)
+        self.assertIn('Imported 2 POIs', stdout)
+        self.assertIn('rows/s', stdout)
+        poi = POI.objects.get(name='Cafe')
+        self.assertEqual(poi.created_by, self.user)
+        self.assertEqual(poi.description, 'Coffee, cake')
+        self.assertEqual(poi.latitude, Decimal('40.712800'))
+        self.assertEqual(poi.geohash, geohash.encode(poi.latitude, poi.longitude))
+        self.assertIsNone(POI.objects.get(name='Park').description)
+
+    def test_import_ndjson_in_batches(self):
+        lines = [json.dumps({'name': f'poi {i}', 'latitude': i, 'longitude': -i}) for i in range(5)]
+        path = self.write('pois.ndjson', '\n'.join(lines) + '\n')
+        stdout, stderr = self.run_import(path, '--batch-size', '2')
+        self.assertEqual(POI.objects.filter(created_by=self.user).count(), 5)
+        self.assertIn('4 rows imported', stdout)
+        self.assertEqual(POIDataVersion.objects.filter(user=self.user).count(), 1)
+
+    def test_import_geojson(self):
+        features = [
+            {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [i, i / 2]},
+             'properties': {'name': f'poi {i}', 'description': 'x' * 50}}
+            for i in range(20)
+        ]
+        path = self.write('pois.geojson', json.dumps({'type': 'FeatureCollection', 'features': features}))
+        self.run_import(path)
+        poi = POI.objects.get(name='poi 10')
+        self.assertEqual((poi.latitude, poi.longitude), (Decimal('5.000000'), Decimal('10.000000')))
+
+    def test_read_geojson_across_chunks(self):
+        features = [
+            {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [1, 2]}, 'properties': {'name': str(i)}}
+            for i in range(10)
+        ]
+        file = io.StringIO(json.dumps({'type': 'FeatureCollection', 'features': features}, indent=2))
+        rows = list(read_geojson(file, read_size=7))
+        self.assertEqual([row['name'] for row in rows], [str(i) for i in range(10)])
+
+    def test_invalid_rows_are_skipped(self):
+        path = self.write('pois.csv', (
+            'name,description,latitude,longitude\n'
+            'Good,,10,10\n'
+            'North,,91,10\n'
+            'East,,10,181\n'
+            ',,10,10\n'
+            'Bad,,abc,10\n'
+            'Nan,,nan,10\n'
+        ))
+        stdout, stderr = self.run_import(path)
+        self.assertEqual(list(POI.objects.values_list('name', flat=True)), ['Good'])
+        self.assertIn('skipped 5 invalid rows', stdout)
+        self.assertIn('Skipping row 2: Latitude must be between -90 and 90 degrees.', stderr)
+        self.assertIn('Skipping row 3: Longitude must be between -180 and 180 degrees.', stderr)
+
+    def test_invalid_geojson_coordinates_are_skipped(self):
+        features = [
+            {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': coordinates}, 'properties': {'name': 'x'}}
+            for coordinates in ([1, 2], [1], None, 'abc', [1, '2'], [True, 2], {'lng': 1, 'lat': 2}, [1, 2, 300])
+        ]
+        path = self.write('pois.geojson', json.dumps({'type': 'FeatureCollection', 'features': features}))
+        stdout, stderr = self.run_import(path)
+        self.assertEqual(POI.objects.count(), 2)
+        self.assertIn('skipped 6 invalid rows', stdout)
+        self.assertIn('Skipping row 2: Point coordinates must be a list of at least two numbers.', stderr)
+
+    def test_invalid_ndjson_rows_are_skipped(self):
+        path = self.write('pois.ndjson', '\n'.join([
+            json.dumps({'name': 'Good', 'latitude': 1, 'longitude': 1}),
+            '{"name": "Broken", ',
+            json.dumps(['not', 'an', 'object']),
+            json.dumps({'name': 5, 'latitude': 1, 'longitude': 1}),
+            json.dumps({'name': 'Odd', 'description': {'a': 1}, 'latitude': 1, 'longitude': 1}),
+        ]) + '\n')
+        stdout, stderr = self.run_import(path)
+        self.assertEqual(list(POI.objects.values_list('name', flat=True)), ['Good'])
+        self.assertIn('skipped 4 invalid rows', stdout)
+        self.assertIn('Skipping row 2: Invalid JSON.', stderr)
+        self.assertIn('Skipping row 3: Expected an object.', stderr)
+        self.assertIn('Skipping row 4: name and description must be strings.', stderr)
+        with self.assertRaisesMessage(CommandError, 'Row 2: Invalid JSON.'):
+            self.run_import(path, '--strict')
+
+    def test_strict_aborts(self):
+        path = self.write('pois.csv', 'name,description,latitude,longitude\nNorth,,91,10\n')
+        with self.assertRaises(CommandError):
+            self.run_import(path, '--strict')
+
+    def test_unknown_user(self):
+        path = self.write('pois.csv', 'name,description,latitude,longitude\n')
+        with self.assertRaises(CommandError):
+            call_command('import_pois', path, '--user', 'nobody', stdout=io.StringIO())
+
+
+class PoiColumnsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dered', email='dered@dered.com', password='dered1234')
+        refresh = RefreshToken.for_user(self.user)
+        self.authenticated_client = APIClient()
+        self.authenticated_client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        self.pois_url = reverse('api:pois:pois')
+        self.media_type = 'application/vnd.proxication.poi-columns'
+
+    def test_round_trip(self):
+        rows = [
+            {'id': 2 ** 40, 'name': 'café', 'latitude': Decimal('-89.999999'), 'longitude': Decimal('180.000000')},
+            {'id': 1, 'name': 'park', 'latitude': Decimal('0.000001'), 'longitude': Decimal('-180')},
+            {'id': 7, 'name': 'café', 'latitude': Decimal('12.5'), 'longitude': Decimal('-0.000001')},
+        ]
+        data = encode_columns(rows, 'http://testserver/api/pois/?cursor=abc')
+        # header, 3 ids, 3 x (lat, lng, name index), 3 name offsets, names, next url
+        self.assertEqual(len(data), 16 + 3 * 8 + 3 * 12 + 3 * 4 + len('cafépark'.encode()) + 4 + 38)
+        self.assertEqual(decode_columns(data), (rows, 'http://testserver/api/pois/?cursor=abc'))
+
+    def test_empty_page(self):
+        self.assertEqual(decode_columns(encode_columns([])), ([], None))
+
+    def test_list_negotiated_by_accept(self):
+        for i in range(5):
+            POI.objects.create(name=f'poi {i % 2}', description='long description', latitude=i, longitude=-i,
+                               created_by=self.user)
+
+        json_response = self.authenticated_client.get(self.pois_url, {'page_size': 3})
+        response = self.authenticated_client.get(self.pois_url, {'page_size': 3}, HTTP_ACCEPT=self.media_type)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], self.media_type)
+        self.assertNotEqual(response['ETag'], json_response['ETag'])
+
+        rows, next_url = decode_columns(response.content)
+        self.assertEqual(next_url, json_response.data['next'])
+        self.assertEqual(
+            [(row['id'], row['name'], row['latitude'], row['longitude']) for row in rows],
+            [(poi['id'], poi['name'], Decimal(poi['latitude']), Decimal(poi['longitude']))
+             for poi in json_response.data['results']],
+        )
+
+        rows, next_url = decode_columns(self.authenticated_client.get(next_url, HTTP_ACCEPT=self.media_type).content)
+        self.assertEqual(len(rows), 2)
+        self.assertIsNone(next_url)
+
+    def test_errors_have_empty_body(self):
+        response = self.authenticated_client.get(self.pois_url, {'bbox': 'nope'}, HTTP_ACCEPT=self.media_type)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.content, b'')
+
+
+class PoiSearchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='dered', email='dered@dered.com', password='dered1234')
+        refresh = RefreshToken.for_user(self.user)
+        self.authenticated_client = APIClient()
+        self.authenticated_client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        self.user2 = User.objects.create_user(username='dered2', email='dered2@dered.com', password='dered1234')
+
+        self.search_url = reverse('api:pois:search')
+        self.pois_url = reverse('api:pois:pois')
+
+    def create_poi(self, name, latitude=0, longitude=0, description=None, user=None):
+        return POI.objects.create(
+            name=name, description=description, latitude=latitude, longitude=longitude, created_by=user or self.user
+        )
+
+    def search(self, **params):
+        response = self.authenticated_client.get(self.search_url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [poi['name'] for poi in response.data['results']]
+
+    def test_name_matches_rank_before_description_matches(self):
+        self.create_poi('Old harbour', description='Coffee by the water')
+        self.create_poi('Coffee Corner')
+        self.create_poi('Museum', description='Art')
+        self.create_poi('Coffee Corner', user=self.user2)
+        self.assertEqual(self.search(q='coffee'), ['Coffee Corner', 'Old harbour'])
+
+    def test_words_match_as_prefixes_and_all_must_match(self):
+        self.create_poi('Cafe Central')
+        self.create_poi('Central Station')
+        self.assertEqual(self.search(q='caf'), ['Cafe Central'])
+        self.assertEqual(self.search(q='CENTRAL, caf!'), ['Cafe Central'])
+        self.assertEqual(self.search(q='central missing'), [])
+
+    def test_limit(self):
+        for i in range(5):
+            self.create_poi(f'park {i}')
+        self.assertEqual(len(self.search(q='park', limit=2)), 2)
+
+    def test_bbox_filter(self):
+        self.create_poi('park inside', 1, 1)
+        self.create_poi('park outside', 10, 10)
+        self.assertEqual(self.search(q='park', bbox='0,0,2,2'), ['park inside'])
+
+    def test_radius_filter_reports_distance(self):
+        self.create_poi('park near', 0, 0.001)
+        self.create_poi('park far', 0, 0.01)
+        response = self.authenticated_client.get(self.search_url, {'q': 'park', 'lat': 0, 'lng': 0, 'radius_m': 200})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(poi['name'], poi['distance_m']) for poi in response.data['results']], [('park near', 111.2)])
+
+    def test_results_follow_writes(self):
+        self.authenticated_client.post(self.pois_url, {'name': 'Zoo', 'latitude': 1, 'longitude': 1}, format='json')
+        self.assertEqual(self.search(q='zoo'), ['Zoo'])
+        self.authenticated_client.post(self.pois_url, {'name': 'Zoo gate', 'latitude': 1, 'longitude': 1}, format='json')
+        self.assertEqual(sorted(self.search(q='zoo')), ['Zoo', 'Zoo gate'])
+
+    def test_invalid_params(self):
+        for params in [{}, {'q': ' !? '}, {'q': 'park', 'bbox': '1,2,3'}, {'q': 'park', 'lat': 0, 'lng': 0},
+                       {'q': 'park', 'bbox': '0,0,1,1', 'lat': 0, 'lng': 0, 'radius_m': 10},
+                       {'q': 'park', 'limit': 101}]:
+            response = self.authenticated_client.get(self.search_url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_requires_authentication(self):
+        response = APIClient().get(self.search_url, {'q': 'park'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @skipUnless(connection.vendor == 'postgresql', 'needs the PostgreSQL text search index')
+    def test_search_uses_the_text_search_index(self):
+        # without the owner filter, so the index is the only way to avoid a sequential scan
+        queryset = search_queryset(POI.objects.all(), parse_terms('coffee'))
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        self.assertIn('pois_search_idx', plan)
+
+
+class PoiPayloadCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='dered', email='dered@dered.com', password='dered1234')
+        refresh = RefreshToken.for_user(self.user)
+        self.authenticated_client = APIClient()
+        self.authenticated_client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        self.user2 = User.objects.create_user(username='dered2', email='dered2@dered.com', password='dered1234')
+        refresh2 = RefreshToken.for_user(self.user2)
+        self.authenticated_client2 = APIClient()
+        self.authenticated_client2.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh2.access_token}')
+
+        self.pois_url = reverse('api:pois:pois')
+        data = {'name': 'cool', 'description': 'cool place', 'latitude': 1, 'longitude': 1}
+        self.poi_id = self.authenticated_client.post(self.pois_url, data, format='json').data['id']
+        self.poi_url = reverse('api:pois:poi', kwargs={'pk': self.poi_id})
+
+    def test_repeated_list_is_served_from_cache(self):
+        first = self.authenticated_client.get(self.pois_url)
+        # read the data version only
+        with self.assertNumQueries(1):
+            second = self.authenticated_client.get(self.pois_url)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_repeated_detail_is_served_from_cache(self):
+        first = self.authenticated_client.get(self.poi_url)
+        with self.assertNumQueries(1):
+            second = self.authenticated_client.get(self.poi_url)
+        self.assertEqual(second.data, first.data)
+
+    def test_create_invalidates_list(self):
+        self.authenticated_client.get(self.pois_url)
+        data = {'name': 'new', 'latitude': 2, 'longitude': 2}
+        self.authenticated_client.post(self.pois_url, data, format='json')
+        response = self.authenticated_client.get(self.pois_url)
+        self.assertEqual([poi['name'] for poi in response.data['results']], ['new', 'cool'])
+
+    def test_update_and_delete_invalidate_detail(self):
+        self.authenticated_client.get(self.poi_url)
+        data = {'name': 'renamed', 'latitude': 1, 'longitude': 1}
+        self.authenticated_client.put(self.poi_url, data, format='json')
+        self.assertEqual(self.authenticated_client.get(self.poi_url).data['name'], 'renamed')
+        self.assertEqual(self.authenticated_client.get(self.pois_url).data['results'][0]['name'], 'renamed')
+
+        self.authenticated_client.delete(self.poi_url)
+        self.assertEqual(self.authenticated_client.get(self.poi_url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.authenticated_client.get(self.pois_url).data['results'], [])
+
+    def test_cached_detail_is_not_shared_with_other_users(self):
+        self.authenticated_client.get(self.poi_url)
+        response = self.authenticated_client2.get(self.poi_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_users_without_a_version_are_not_cached(self):
+        POI.objects.create(name='manual', latitude=0, longitude=0, created_by=self.user2)
+        self.authenticated_client2.get(self.pois_url)
+        with self.assertNumQueries(2):
+            response = self.authenticated_client2.get(self.pois_url)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_write_between_version_and_data_reads(self):
+        def write():
+            POI.objects.create(name='racer', latitude=3, longitude=3, created_by=self.user)
+            bump_data_version(self.user.pk)
+
+        async def racing_get_data_version(user_id):
+            version = await aget_data_version(user_id)
+            # another request commits a new POI before this one queries the page
+            await sync_to_async(write)()
+            return version
+
+        with mock.patch('apps.pois.async_views.aget_data_version', racing_get_data_version):
+            self.authenticated_client.get(self.pois_url)
+        # the cached page is newer than its version; the bump moved readers to a new key
+        response = self.authenticated_client.get(self.pois_url)
+        self.assertEqual([poi['name'] for poi in response.data['results']], ['racer', 'cool'])
+
+
+class PoiAsyncViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='dered', email='dered@dered.com', password='dered1234')
+        refresh = RefreshToken.for_user(self.user)
+        self.auth_headers = {'Authorization': f'Bearer {refresh.access_token}'}
+        self.authenticated_client = APIClient()
+        self.authenticated_client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        self.pois_url = reverse('api:pois:pois')
+        self.poi = POI.objects.create(name='cool', latitude=1, longitude=1, created_by=self.user)
+        self.poi_url = reverse('api:pois:poi', kwargs={'pk': self.poi.id})
+
+    def test_read_views_are_async(self):
+        for url in [self.pois_url, self.poi_url, reverse('api:pois:nearby')]:
+            self.assertTrue(inspect.iscoroutinefunction(resolve(url).func), url)
+
+    async def test_list(self):
+        response = await AsyncClient().get(self.pois_url, headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([poi['name'] for poi in response.json()['results']], ['cool'])
+        self.assertIn('ETag', response)
+
+        response = await AsyncClient().get(self.pois_url, headers={**self.auth_headers, 'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_detail(self):
+        response = await AsyncClient().get(self.poi_url, headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['created_by_username'], 'dered')
+
+        url = reverse('api:pois:poi', kwargs={'pk': self.poi.id + 1})
+        response = await AsyncClient().get(url, headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_nearby(self):
+        response = await AsyncClient().get(reverse('api:pois:nearby'), {'lat': 1, 'lng': 1.01}, headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['results']), 1)
+
+    async def test_unauthenticated(self):
+        response = await AsyncClient().get(self.pois_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+
+    async def test_other_users_poi(self):
+        other = await User.objects.acreate(username='other', email='other@dered.com')
+        headers = {'Authorization': f'Bearer {RefreshToken.for_user(other).access_token}'}
+        response = await AsyncClient().get(self.poi_url, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_other_methods_use_sync_views(self):
+        for name in ['nearby', 'search']:
+            response = self.authenticated_client.options(reverse(f'api:pois:{name}'))
+            self.assertEqual(response.status_code, status.HTTP_200_OK, name)
+            self.assertIn('GET', response['Allow'])
+
+    def test_writes_use_sync_views(self):
+        response = self.authenticated_client.put(self.poi_url, {'name': 'renamed', 'latitude': 1, 'longitude': 1},
+                                                 format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.authenticated_client.get(self.poi_url).data['name'], 'renamed')
+        response = self.authenticated_client.delete(self.poi_url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class ReplicaRoutingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dered', email='dered@dered.com', password='dered1234')
+        refresh = RefreshToken.for_user(self.user)
+        self.authenticated_client = APIClient()
+        self.authenticated_client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        self.user2 = User.objects.create_user(username='dered2', email='dered2@dered.com', password='dered1234')
+        refresh = RefreshToken.for_user(self.user2)
+        self.authenticated_client2 = APIClient()
+        self.authenticated_client2.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        self.poi = POI.objects.create(name='poi', latitude=1, longitude=1, created_by=self.user)
+        self.pois_url = reverse('api:pois:pois')
+        self.poi_url = reverse('api:pois:poi', kwargs={'pk': self.poi.id})
+        cache.clear()
+
+        # a second alias for the test database, standing in for a replica
+        connections['replica'] = connections['default']
+        self.addCleanup(connections.__delitem__, 'replica')
+        self.reads = []
+
+        def db_for_read(router, model, **hints):
+            self.reads.append((model, read_alias.get()))
+            return read_alias.get()
+
+        patcher = mock.patch.object(ReplicaRouter, 'db_for_read', autospec=True, side_effect=db_for_read)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def poi_reads(self):
+        aliases = {alias for model, alias in self.reads if model in (POI, POIDataVersion)}
+        self.reads.clear()
+        return aliases
+
+    def test_reads_go_to_replica(self):
+        with self.settings(DATABASE_REPLICAS=['replica']):
+            response = self.authenticated_client.get(self.pois_url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data['results']), 1)
+            self.assertEqual(self.poi_reads(), {'replica'})
+
+            response = self.authenticated_client.get(self.poi_url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(self.poi_reads(), {'replica'})
+
+    def test_without_replicas(self):
+        with self.settings(DATABASE_REPLICAS=[]):
+            response = self.authenticated_client.get(self.pois_url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(self.poi_reads(), {None})
+
+    def test_other_views_read_from_primary(self):
+        with self.settings(DATABASE_REPLICAS=['replica']):
+            response = self.authenticated_client.get(reverse('api:pois:nearby'), {'lat': 1, 'lng': 1})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(self.poi_reads(), {None})
+
+    def test_writes_pin_the_writer_to_primary(self):
+        with self.settings(DATABASE_REPLICAS=['replica']):
+            response = self.authenticated_client.post(self.pois_url, {'name': 'new', 'latitude': 2, 'longitude': 2},
+                                                      format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.poi_reads()
+
+            response = self.authenticated_client.get(self.pois_url)
+            self.assertEqual(len(response.data['results']), 2)
+            self.assertEqual(self.poi_reads(), {None})
+
+            # other users keep reading from replicas
+            self.authenticated_client2.get(self.pois_url)
+            self.assertEqual(self.poi_reads(), {'replica'})
+
+            # the pin expires
+            cache.delete(pin_key(self.user.id))
+            self.authenticated_client.get(self.pois_url)
+            self.assertEqual(self.poi_reads(), {'replica'})
+
+    def test_replicas_are_not_migrated(self):
+        with self.settings(DATABASE_REPLICAS=['replica']):
+            self.assertFalse(router.allow_migrate('replica', 'pois'))
+            self.assertTrue(router.allow_migrate('default', 'pois'))
+
+
+class PoiEventsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dered', email='dered@dered.com', password='dered1234')
+        refresh = RefreshToken.for_user(self.user)
+        self.auth_headers = {'Authorization': f'Bearer {refresh.access_token}'}
+        self.authenticated_client = APIClient()
+        self.authenticated_client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.user2 = User.objects.create_user(username='dered2', email='dered2@dered.com', password='dered1234')
+
+        self.events_url = reverse('api:pois:events')
+        self.pois_url = reverse('api:pois:pois')
+        # a broker of its own for each test
+        settings = override_settings(POI_EVENTS_QUEUE_SIZE=3)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def published(self, request):
+        with mock.patch.object(events.LocalBroker, 'publish') as publish, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = request()
+        return response, [call.args for call in publish.call_args_list]
+
+    def test_writes_publish_events(self):
+        response, published = self.published(lambda: self.authenticated_client.post(
+            self.pois_url, {'name': 'new', 'latitude': 1, 'longitude': 2}, format='json'))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(published, [(self.user.pk, [{'type': 'created', 'data': response.data}])])
+        pk = response.data['id']
+        poi_url = reverse('api:pois:poi', kwargs={'pk': pk})
+
+        response, published = self.published(lambda: self.authenticated_client.put(
+            poi_url, {'name': 'renamed', 'latitude': 1, 'longitude': 2}, format='json'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(published, [(self.user.pk, [{'type': 'updated', 'data': response.data}])])
+
+        response, published = self.published(lambda: self.authenticated_client.delete(poi_url))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(published, [(self.user.pk, [{'type': 'deleted', 'data': {'id': pk}}])])
+
+        response, published = self.published(lambda: self.authenticated_client.post(
+            self.pois_url, {'name': 'bad', 'latitude': 100, 'longitude': 2}, format='json'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(published, [])
+
+    def test_bulk_publishes_events(self):
+        gone = POI.objects.create(name='gone', latitude=1, longitude=1, created_by=self.user)
+        operations = [
+            {'op': 'delete', 'id': gone.id},
+            {'op': 'create', 'data': {'name': 'new', 'latitude': 0, 'longitude': 0}},
+        ]
+        response, published = self.published(lambda: self.authenticated_client.post(
+            reverse('api:pois:bulk'), {'operations': operations}, format='json'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(published, [(self.user.pk, [
+            {'type': 'created', 'data': response.data['results'][1]['data']},
+            {'type': 'deleted', 'data': {'id': gone.id}},
+        ])])
+
+    def test_events_view_is_async(self):
+        self.assertTrue(inspect.iscoroutinefunction(resolve(self.events_url).func))
+
+    def test_requires_asgi(self):
+        response = self.authenticated_client.get(self.events_url)
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+        response = self.client.get(self.events_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_stream(self):
+        response = await AsyncClient().get(self.events_url, headers=self.auth_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        frames = response.streaming_content
+        self.assertEqual(await anext(frames), b'retry: 5000\n\n')
+
+        # published from the thread of a sync view
+        broker = events.get_broker()
+        await asyncio.to_thread(broker.publish, self.user2.pk, [events.deleted(1)])
+        await asyncio.to_thread(broker.publish, self.user.pk, [events.created({'id': 2, 'name': 'café'})])
+        self.assertEqual(await anext(frames), 'event: created\ndata: {"id":2,"name":"café"}\n\n'.encode())
+        await frames.aclose()
+
+    async def test_heartbeat_and_expiry(self):
+        with self.settings(POI_EVENTS_HEARTBEAT=0.01):
+            stream = events.stream(self.user.pk, expires_at=time.time() + 0.1)
+            frames = [frame async for frame in stream]
+        self.assertEqual(frames[0], b'retry: 5000\n\n')
+        self.assertGreater(len(frames), 2)
+        self.assertEqual(set(frames[1:]), {events.HEARTBEAT})
+        self.assertEqual(events.get_broker().count(), 0)
+
+    async def test_slow_client_resyncs(self):
+        broker = events.get_broker()
+        stream = events.stream(self.user.pk)
+        await anext(stream)
+        self.assertEqual(broker.count(), 1)
+        for pk in range(4):
+            broker.publish(self.user.pk, [events.deleted(pk)])
+        self.assertEqual([frame async for frame in stream], [events.RESYNC])
+        self.assertEqual(broker.count(), 0)
+
+    async def test_fan_out(self):
+        broker = events.get_broker()
+        streams = [events.stream(self.user.pk) for _ in range(3)]
+        other = events.stream(self.user2.pk)
+        for stream in [*streams, other]:
+            await anext(stream)
+        self.assertEqual(broker.count(), 4)
+        broker.publish(self.user.pk, [events.deleted(1), events.deleted(2)])
+        expected = b'event: deleted\ndata: {"id":1}\n\nevent: deleted\ndata: {"id":2}\n\n'
+        for stream in streams:
+            self.assertEqual(await anext(stream), expected)
+            await stream.aclose()
+        with self.settings(POI_EVENTS_HEARTBEAT=0.01):
+            self.assertEqual(await anext(other), events.HEARTBEAT)
+        await other.aclose()
+        self.assertEqual(broker.subscriptions, {})
+
@@ -1,9 +1,17 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 app_name = 'pois'
 
 urlpatterns = [
-    path('', views.POIsView.as_view(), name='pois'),
-    path('<int:pk>/', views.POIView.as_view(), name='poi'),
+    path('', async_views.POIsView.as_view(), name='pois'),
+    path('<int:pk>/', async_views.POIView.as_view(), name='poi'),
+    path('bulk/', views.BulkView.as_view(), name='bulk'),
+    path('export/', views.ExportView.as_view(), name='export'),
+    path('changes/', views.ChangesView.as_view(), name='changes'),
+    path('nearby/', async_views.NearbyView.as_view(), name='nearby'),
+    path('events/', async_views.EventsView.as_view(), name='events'),
+    path('search/', async_views.SearchView.as_view(), name='search'),
+    path('clusters/', views.ClustersView.as_view(), name='clusters'),
+    path('tiles/<int:z>/<int:x>/<int:y>.mvt', views.TileView.as_view(), name='tile'),
 ]
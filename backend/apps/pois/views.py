@@ -2,48 +2,289 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.http import quote_etag
+from apps.core.routers import replica_reads
+from . import cache, columns, events
+from .bulk import BulkRequestSerializer, apply_operations
+from .clustering import cluster_tile
+from .export import stream_export
+from .geo import MAX_ZOOM, bbox_q, count_tiles, parse_bbox, tile_q, tiles_for_bbox
+from .mvt import encode_tile
 from .models import POI
-from .serializers import POISerializer
+from .pagination import POICursorPagination
+from .renderers import CSVRenderer, GeoJSONRenderer, MVTRenderer, NDJSONRenderer, POIColumnsRenderer
+from .sync import get_changes
+from .nearby import nearest, within
+from .search import search
+from .serializers import (
+    NearbyQuerySerializer, POINearbySerializer, POISerializer, POIValuesSerializer, SearchQuerySerializer,
+)
 from .permissions import IsOwner
+from .versions import bump_data_version, get_data_version, is_not_modified, make_etag, with_data_version
+
+
+def list_queryset(request):
+    """
+    The user's POIs for the list endpoint, in the shape the accepted renderer
+    needs. Raises ValueError for an invalid ``bbox``.
+    """
+    pois = POI.objects.filter(created_by=request.user)
+    if isinstance(request.accepted_renderer, POIColumnsRenderer):
+        pois = pois.values(*columns.FIELDS)
+    else:
+        pois = POIValuesSerializer.values(pois)
+    bbox = request.query_params.get('bbox')
+    if bbox is not None:
+        pois = pois.filter(bbox_q(*parse_bbox(bbox)))
+    return pois
+
+
+def page_data(request, paginator, page):
+    if not isinstance(request.accepted_renderer, POIColumnsRenderer):
+        page = POIValuesSerializer(page, many=True).data
+    return paginator.get_paginated_response(page).data
+
+
+def search_scope(request, params):
+    """The user's POIs a search looks at: all of them, or those in the bbox or circle"""
+    pois = POIValuesSerializer.values(POI.objects.filter(created_by=request.user))
+    if 'bbox' in params:
+        return pois.filter(bbox_q(*params['bbox']))
+    if 'radius_m' in params:
+        return within(pois, params['lat'], params['lng'], params['radius_m'])
+    return pois
+
+
+def search_data(params, results):
+    serializer_class = POINearbySerializer if 'radius_m' in params else POIValuesSerializer
+    return {'results': serializer_class(results, many=True).data}
 
 
 class POIsView(APIView):
     permission_classes = (IsAuthenticated,)
+    renderer_classes = (*api_settings.DEFAULT_RENDERER_CLASSES, POIColumnsRenderer)
 
     def post(self, request):
         serializer = POISerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(created_by=request.user)
+            with transaction.atomic():
+                serializer.save(created_by=request.user)
+                bump_data_version(request.user.pk)
+                events.publish_on_commit(request.user.pk, [events.created(serializer.data)])
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @replica_reads
     def get(self, request):
-        pois = POI.objects.filter(created_by=request.user)
-        serializer = POISerializer(pois, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        version = get_data_version(request.user.pk)
+        etag = make_etag(request, version)
+        if is_not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        try:
+            pois = list_queryset(request)
+        except ValueError as e:
+            return Response({'bbox': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+
+        def compute():
+            paginator = POICursorPagination()
+            page = paginator.paginate_queryset(pois, request, view=self)
+            return page_data(request, paginator, page)
+
+        data = cache.get_payload(version, etag, compute)
+        return Response(data, status=status.HTTP_200_OK, headers={'ETag': etag})
 
 
 class POIView(APIView):
     permission_classes = (IsAuthenticated, IsOwner,)
 
+    @replica_reads
     def get(self, request, pk):
-        poi = get_object_or_404(POI, pk=pk)
+        # ownership before the ETag, or a 304 would tell whether another user's POI exists
+        poi = get_object_or_404(with_data_version(POI.objects.only('created_by'), request.user.pk), pk=pk)
         self.check_object_permissions(request, poi)
-        serializer = POISerializer(poi)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        version = poi.data_version or 0
+        etag = make_etag(request, version)
+        if is_not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        def compute():
+            return POISerializer(get_object_or_404(POI.objects.select_related('created_by'), pk=pk)).data
+
+        data = cache.get_payload(version, etag, compute)
+        return Response(data, status=status.HTTP_200_OK, headers={'ETag': etag})
 
     def put(self, request, pk):
-        poi = get_object_or_404(POI, pk=pk)
+        poi = get_object_or_404(POI.objects.select_related('created_by'), pk=pk)
         self.check_object_permissions(request, poi)
         serializer = POISerializer(poi, data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                bump_data_version(request.user.pk)
+                events.publish_on_commit(request.user.pk, [events.updated(serializer.data)])
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, pk):
         poi = get_object_or_404(POI, pk=pk)
         self.check_object_permissions(request, poi)
-        poi.delete()
+        with transaction.atomic():
+            events.publish_on_commit(request.user.pk, [events.deleted(poi.pk)])
+            poi.delete()
+            bump_data_version(request.user.pk)
         return Response({'msg': 'POI deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
+
+
+class BulkView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        serializer = BulkRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        applied, results = apply_operations(request.user, serializer.validated_data['operations'])
+        if applied:
+            return Response({'results': results}, status=status.HTTP_200_OK)
+        return Response({'results': results}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ExportView(APIView):
+    permission_classes = (IsAuthenticated,)
+    # picked by ?format= (or the Accept header), geojson by default
+    renderer_classes = (GeoJSONRenderer, NDJSONRenderer, CSVRenderer)
+
+    def get(self, request):
+        # under ASGI a sync iterator would be read whole before the first byte is sent
+        chunks, content_type, extension = stream_export(
+            request.user, request.accepted_renderer.format, asynchronous=isinstance(request._request, ASGIRequest),
+        )
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="pois.{extension}"'
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # errors (401, 404 for an unknown ?format=, 406) are JSON, whatever format was asked for
+        if isinstance(response, Response) and not status.is_success(response.status_code):
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ClustersView(APIView):
+    permission_classes = (IsAuthenticated,)
+    max_tiles = 64
+
+    def get(self, request):
+        errors = {}
+        try:
+            bbox = parse_bbox(request.query_params.get('bbox', ''))
+        except ValueError as e:
+            errors['bbox'] = [str(e)]
+        try:
+            zoom = int(request.query_params.get('zoom', ''))
+            if not 0 <= zoom <= MAX_ZOOM:
+                raise ValueError
+        except ValueError:
+            errors['zoom'] = [f'zoom must be an integer between 0 and {MAX_ZOOM}.']
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # counted before listing them, a world bbox at a high zoom covers trillions
+        if count_tiles(*bbox, zoom) > self.max_tiles:
+            return Response({'bbox': ['bbox covers too many tiles at this zoom.']}, status=status.HTTP_400_BAD_REQUEST)
+        tiles = tiles_for_bbox(*bbox, zoom)
+
+        # clusters are computed and cached per whole tile, so the response may
+        # include clusters just outside the bbox
+        user_id = request.user.pk
+        version = get_data_version(user_id)
+        clusters = cache.get_clusters(user_id, version, zoom, tiles, lambda x, y: cluster_tile(user_id, zoom, x, y))
+        return Response({'zoom': zoom, 'clusters': clusters}, status=status.HTTP_200_OK)
+
+
+class NearbyView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        query = NearbyQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = query.validated_data
+        pois = POIValuesSerializer.values(POI.objects.filter(created_by=request.user))
+        results = nearest(pois, params['lat'], params['lng'], params['k'], params.get('radius_m'))
+        serializer = POINearbySerializer(results, many=True)
+        return Response({'results': serializer.data}, status=status.HTTP_200_OK)
+
+
+class SearchView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    @replica_reads
+    def get(self, request):
+        query = SearchQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = query.validated_data
+
+        version = get_data_version(request.user.pk)
+        etag = make_etag(request, version)
+        if is_not_modified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        def compute():
+            return search_data(params, search(search_scope(request, params), params['q'], params['limit']))
+
+        data = cache.get_payload(version, etag, compute)
+        return Response(data, status=status.HTTP_200_OK, headers={'ETag': etag})
+
+
+class ChangesView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        changes = get_changes(request.user, request.query_params.get('since'))
+        return Response(changes, status=status.HTTP_200_OK)
+
+
+class TileView(APIView):
+    """Serve the user's POIs as a Mapbox vector tile, layer ``pois``"""
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = (JSONRenderer, MVTRenderer)
+    # bounds the tile size; clients should switch to clusters when zoomed out
+    max_features = 4096
+
+    def get(self, request, z, x, y):
+        if z > MAX_ZOOM or x >= 2 ** z or y >= 2 ** z:
+            return Response({'detail': 'Tile does not exist.'}, status=status.HTTP_404_NOT_FOUND)
+
+        user_id = request.user.pk
+        version = get_data_version(user_id)
+        etag = quote_etag(f'{user_id}-{version}-{z}-{x}-{y}')
+        if is_not_modified(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            def compute():
+                pois = (
+                    POI.objects
+                    .filter(created_by_id=user_id)
+                    .filter(tile_q(z, x, y))
+                    .values_list('id', 'longitude', 'latitude', 'name')
+                    .order_by('-created_at', '-id')[:self.max_features]
+                )
+                features = ((pk, longitude, latitude, {'name': name}) for pk, longitude, latitude, name in pois)
+                return encode_tile('pois', features, z, x, y)
+
+            response = HttpResponse(
+                cache.get_tile(user_id, version, z, x, y, compute),
+                content_type='application/vnd.mapbox-vector-tile',
+            )
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -0,0 +1,115 @@
+"""
+JWT authentication that resolves users from a short-lived cache.
+
+simplejwt's JWTAuthentication loads the user row on every request. Here the
+row is cached for ``USER_CACHE_TIMEOUT`` seconds, keyed by the token's user id,
+so only the first request in that window queries the database. The password
+hash is never cached: the instance comes back with ``password`` deferred and
+Django loads it lazily if something reads it. Saving or deleting a user drops
+the entry (see signals.py); writes that bypass model signals, such as
+``QuerySet.update``, are picked up when the entry expires.
+
+Tokens are also checked against the in-process revocation list (see
+revocation.py), which needs no database round trip either.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .revocation import revoked_tokens
+
+UNCACHED_FIELDS = {'password'}
+
+
+def user_cache_key(user_id):
+    return f'users:auth:{user_id}'
+
+
+def forget_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if revoked_tokens.is_revoked(validated_token):
+            raise AuthenticationFailed(_("Token has been revoked."), code="token_revoked")
+        return validated_token
+
+    def get_user(self, validated_token):
+        key = user_cache_key(self.get_user_id(validated_token))
+        values = cache.get(key)
+        if values is None:
+            user = super().get_user(validated_token)
+            cache.set(key, self.cached_values(user), settings.USER_CACHE_TIMEOUT)
+            return user
+
+        user = self.from_cached_values(values)
+        self.check_user(user, validated_token)
+        return user
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views: no blocking cache or database calls"""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = super().get_validated_token(raw_token)
+        if await revoked_tokens.ais_revoked(validated_token):
+            raise AuthenticationFailed(_("Token has been revoked."), code="token_revoked")
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        key = user_cache_key(user_id)
+        values = await cache.aget(key)
+        if values is None:
+            try:
+                user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            self.check_user(user, validated_token)
+            await cache.aset(key, self.cached_values(user), settings.USER_CACHE_TIMEOUT)
+            return user
+
+        user = self.from_cached_values(values)
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # the deferred password can't be lazy loaded on the event loop
+            user.password = await self.user_model.objects.values_list('password', flat=True).aget(pk=user.pk)
+        self.check_user(user, validated_token)
+        return user
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def check_user(self, user, validated_token):
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+    def cached_values(self, user):
+        return {
+            field.attname: getattr(user, field.attname)
+            for field in self.user_model._meta.concrete_fields
+            if field.attname not in UNCACHED_FIELDS
+        }
+
+    def from_cached_values(self, values):
+        # from_db expects the values in model field order and defers the rest
+        field_names = [field.attname for field in self.user_model._meta.concrete_fields if field.attname in values]
+        return self.user_model.from_db(
+            router.db_for_read(self.user_model), field_names, [values[name] for name in field_names]
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.users.revocation import prune_revoked_tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked tokens that have expired (run periodically, e.g. from cron)'
+
+    def handle(self, *args, **options):
+        deleted = prune_revoked_tokens()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted:,} expired revoked tokens.'))
@@ -5,3 +5,13 @@ from django.contrib.auth.models import AbstractUser
 class User(AbstractUser):
     username = models.CharField(max_length=24, unique=True)
     email = models.EmailField(unique=True)
+
+
+class RevokedToken(models.Model):
+    """A JWT revoked before it expires, e.g. on logout or refresh rotation"""
+    jti = models.CharField(max_length=255, primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.jti
@@ -0,0 +1,129 @@
+"""
+Token revocation by ``jti``.
+
+Revoked tokens are recorded in RevokedToken, and every process keeps the
+unexpired ones in memory so checking a token on each request is a set lookup
+with no database round trip. A daemon thread pulls revocations made by other
+processes every ``TOKEN_REVOCATION_SYNC_INTERVAL`` seconds, so a token revoked
+elsewhere stays usable here for at most that long; tokens revoked by this
+process are dropped immediately.
+
+Entries are grouped by the hour their token expires in. A lookup only checks
+the token's own bucket, and a bucket is dropped as soon as every token in it
+has expired (simplejwt rejects expired tokens on its own). Only ``hash(jti)``
+is kept rather than the jti string; a 64 bit collision is far less likely than
+a guessed signing key.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .models import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+BUCKET_SECONDS = 60 * 60
+# rows can commit after a later sync started, with an older revoked_at
+SYNC_OVERLAP = timedelta(seconds=30)
+
+
+class RevocationList:
+
+    def __init__(self):
+        self.buckets = {}
+        self.synced_at = None
+        self.loaded = threading.Event()
+        self.lock = threading.Lock()
+        self.pid = None
+
+    def add(self, jti, exp):
+        self.buckets.setdefault(exp // BUCKET_SECONDS, set()).add(hash(jti))
+
+    def contains(self, jti, exp):
+        bucket = self.buckets.get(exp // BUCKET_SECONDS)
+        return bucket is not None and hash(jti) in bucket
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.buckets.values())
+
+    def is_revoked(self, token):
+        self.start()
+        return self.contains(token[api_settings.JTI_CLAIM], token['exp'])
+
+    async def ais_revoked(self, token):
+        if self.pid != os.getpid() or not self.loaded.is_set():
+            # waiting for the initial load must not block the event loop
+            await sync_to_async(self.start, thread_sensitive=False)()
+        return self.contains(token[api_settings.JTI_CLAIM], token['exp'])
+
+    def sync(self):
+        """Load revocations recorded since the last sync and prune expired buckets"""
+        now = timezone.now()
+        rows = RevokedToken.objects.filter(expires_at__gt=now)
+        if self.synced_at is not None:
+            rows = rows.filter(revoked_at__gte=self.synced_at - SYNC_OVERLAP)
+        for jti, expires_at in rows.values_list('jti', 'expires_at').iterator(chunk_size=10_000):
+            self.add(jti, int(expires_at.timestamp()))
+        self.synced_at = now
+        self.prune(now.timestamp())
+
+    def prune(self, now):
+        for bucket in [bucket for bucket in self.buckets if (bucket + 1) * BUCKET_SECONDS <= now]:
+            del self.buckets[bucket]
+
+    def start(self):
+        """Start the sync thread of this process and wait for the initial load"""
+        if self.pid != os.getpid():
+            with self.lock:
+                # forked workers inherit the list but not the thread
+                if self.pid != os.getpid():
+                    self.pid = os.getpid()
+                    self.loaded.clear()
+                    threading.Thread(target=self.run, name='token-revocation-sync', daemon=True).start()
+        if not self.loaded.is_set():
+            self.loaded.wait()
+
+    def run(self):
+        while True:
+            try:
+                self.sync()
+            # requests go ahead with what is loaded; retried on the next tick
+            except DatabaseError as e:
+                logger.warning('Could not sync revoked tokens: %s', e)
+            except Exception:
+                logger.exception('Could not sync revoked tokens')
+            finally:
+                connections.close_all()
+                self.loaded.set()
+            time.sleep(settings.TOKEN_REVOCATION_SYNC_INTERVAL)
+
+
+revoked_tokens = RevocationList()
+
+
+def revoke(token):
+    """
+    Revoke ``token`` in every process. Returns False if it already was
+    revoked, which refresh rotation relies on to reject a replayed token.
+    """
+    jti = token[api_settings.JTI_CLAIM]
+    _, created = RevokedToken.objects.get_or_create(
+        jti=jti, defaults={'expires_at': datetime_from_epoch(token['exp'])}
+    )
+    revoked_tokens.add(jti, token['exp'])
+    return created
+
+
+def prune_revoked_tokens():
+    """Delete revocations of tokens that have expired anyway"""
+    deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
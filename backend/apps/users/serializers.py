@@ -1,6 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .revocation import revoke, revoked_tokens
 
 User = get_user_model()
 
@@ -37,3 +41,18 @@ class UserSerializer(serializers.ModelSerializer):
         extra_kwargs = {
             'email': {'required': False},
         }
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    """Rejects revoked refresh tokens and revokes the old one on rotation"""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if revoked_tokens.is_revoked(refresh):
+            raise InvalidToken('Token has been revoked.')
+        data = super().validate(attrs)
+        # the revocation row is unique per jti, so only one of two concurrent
+        # refreshes with the same token gets through
+        if api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION and not revoke(refresh):
+            raise InvalidToken('Token has been revoked.')
+        return data
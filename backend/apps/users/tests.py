@@ -2,8 +2,20 @@ from rest_framework.test import APIClient
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.utils import timezone
+from datetime import timedelta
+import io
+import uuid
+from unittest.mock import patch
 from django.urls import reverse
 from rest_framework import status
+from apps.core.routers import ReplicaRouter, read_alias
+from .authentication import user_cache_key
+from .models import RevokedToken
+from .revocation import BUCKET_SECONDS, RevocationList, revoked_tokens
 
 User = get_user_model()
 
@@ -133,3 +145,164 @@ class UsersTests(APITestCase):
         self.assertFalse(
             User.objects.filter(id=self.user.id).exists()
         )  # verify db
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='dered', email='dered@dered.com', password='dered1234')
+        self.user_url = reverse('api:users:user')
+
+        refresh = RefreshToken.for_user(self.user)
+        self.authenticated_client = APIClient()
+        self.authenticated_client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def test_user_is_cached_after_first_request(self):
+        with self.assertNumQueries(1):
+            self.authenticated_client.get(self.user_url)
+        with self.assertNumQueries(0):
+            response = self.authenticated_client.get(self.user_url)
+        self.assertEqual(response.data, {'id': self.user.id, 'username': 'dered', 'email': 'dered@dered.com'})
+
+    def test_password_hash_is_not_cached(self):
+        self.authenticated_client.get(self.user_url)
+        self.assertNotIn('password', cache.get(user_cache_key(self.user.id)))
+
+    def test_update_invalidates_cached_user(self):
+        self.authenticated_client.get(self.user_url)
+        self.authenticated_client.put(self.user_url, {'email': 'new@dered.com'}, format='json')
+        self.assertIsNone(cache.get(user_cache_key(self.user.id)))
+        response = self.authenticated_client.get(self.user_url)
+        self.assertEqual(response.data['email'], 'new@dered.com')
+        # the update from a cached user must not touch the password
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('dered1234'))
+
+    def test_delete_invalidates_cached_user(self):
+        self.authenticated_client.get(self.user_url)
+        self.authenticated_client.delete(self.user_url)
+        response = self.authenticated_client.get(self.user_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        self.authenticated_client.get(self.user_url)
+        self.user.is_active = False
+        self.user.save()
+        response = self.authenticated_client.get(self.user_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TokenRevocationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dered', email='dered@dered.com', password='dered1234')
+        self.logout_url = reverse('api:users:logout')
+        self.user_url = reverse('api:users:user')
+        self.refresh_url = reverse('token_refresh')
+
+        refresh = RefreshToken.for_user(self.user)
+        self.refresh_token = str(refresh)
+        self.authenticated_client = APIClient()
+        self.authenticated_client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def test_logout_revokes_access_token(self):
+        response = self.authenticated_client.post(self.logout_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.authenticated_client.get(self.user_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data['code'], 'token_revoked')
+
+    def test_logout_revokes_refresh_token(self):
+        self.authenticated_client.post(self.logout_url, {'refresh': self.refresh_token}, format='json')
+        response = self.client.post(self.refresh_url, {'refresh': self.refresh_token}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(RevokedToken.objects.count(), 2)
+
+    def test_logout_rejects_other_users_refresh_token(self):
+        other = User.objects.create_user(username='other', email='other@dered.com', password='dered1234')
+        refresh = str(RefreshToken.for_user(other))
+        response = self.authenticated_client.post(self.logout_url, {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.refresh_url, {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_refresh_rotation_revokes_old_token(self):
+        response = self.client.post(self.refresh_url, {'refresh': self.refresh_token}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rotated = response.data['refresh']
+
+        response = self.client.post(self.refresh_url, {'refresh': self.refresh_token}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.post(self.refresh_url, {'refresh': rotated}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_sync_picks_up_other_processes(self):
+        revocations = RevocationList()
+        expires_at = timezone.now() + timedelta(minutes=5)
+        RevokedToken.objects.create(jti='old', expires_at=expires_at)
+        revocations.sync()
+        RevokedToken.objects.create(jti='new', expires_at=expires_at)
+        RevokedToken.objects.create(jti='expired', expires_at=timezone.now() - timedelta(seconds=1))
+        revocations.sync()
+
+        exp = int(expires_at.timestamp())
+        self.assertTrue(revocations.contains('old', exp))
+        self.assertTrue(revocations.contains('new', exp))
+        self.assertFalse(revocations.contains('expired', exp))
+        self.assertFalse(revocations.contains(uuid.uuid4().hex, exp))
+        self.assertEqual(len(revocations), 2)
+
+    def test_expired_buckets_are_pruned(self):
+        revocations = RevocationList()
+        revocations.add('a', 10 * BUCKET_SECONDS + 5)
+        revocations.add('b', 11 * BUCKET_SECONDS + 5)
+        revocations.prune(11 * BUCKET_SECONDS)
+        self.assertFalse(revocations.contains('a', 10 * BUCKET_SECONDS + 5))
+        self.assertTrue(revocations.contains('b', 11 * BUCKET_SECONDS + 5))
+
+    def test_revocation_check_needs_no_query(self):
+        self.authenticated_client.get(self.user_url)
+        revoked_tokens.is_revoked(RefreshToken(self.refresh_token))
+        with self.assertNumQueries(0):
+            self.assertFalse(revoked_tokens.is_revoked(RefreshToken(self.refresh_token)))
+
+    def test_prune_command(self):
+        RevokedToken.objects.create(jti='live', expires_at=timezone.now() + timedelta(minutes=5))
+        RevokedToken.objects.create(jti='expired', expires_at=timezone.now() - timedelta(seconds=1))
+        call_command('prune_revoked_tokens', stdout=io.StringIO())
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['live'])
+
+
+class UsersReplicaRoutingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dered', email='dered@dered.com', password='dered1234')
+        refresh = RefreshToken.for_user(self.user)
+        self.authenticated_client = APIClient()
+        self.authenticated_client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.users_url = reverse('api:users:users')
+        cache.clear()
+
+        # a second alias for the test database, standing in for a replica
+        connections['replica'] = connections['default']
+        self.addCleanup(connections.__delitem__, 'replica')
+        self.aliases = []
+
+        def db_for_read(router, model, **hints):
+            self.aliases.append(read_alias.get())
+            return read_alias.get()
+
+        patcher = patch.object(ReplicaRouter, 'db_for_read', autospec=True, side_effect=db_for_read)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_users_read_from_replica_until_the_user_writes(self):
+        with self.settings(DATABASE_REPLICAS=['replica']):
+            response = self.authenticated_client.get(self.users_url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(self.aliases[-1], 'replica')
+
+            response = self.authenticated_client.put(reverse('api:users:user'), {'email': 'new@dered.com'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            response = self.authenticated_client.get(self.users_url)
+            self.assertEqual(response.data[0]['email'], 'new@dered.com')
+            self.assertIsNone(self.aliases[-1])
@@ -3,9 +3,14 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.contrib.auth import authenticate
+from rest_framework_simplejwt import views as jwt_views
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
-from .serializers import UserRegistrationSerializer, UserSerializer, UserLoginSerializer
+from apps.core.routers import replica_reads
+from .serializers import TokenRefreshSerializer, UserRegistrationSerializer, UserSerializer, UserLoginSerializer
 from .models import User
+from .revocation import revoke
 
 
 class RegisterView(APIView):
@@ -55,9 +60,23 @@ class LogoutView(APIView):
     permission_classes = (IsAuthenticated,)
 
     def post(self, request):
+        if request.data.get('refresh'):
+            try:
+                refresh = RefreshToken(request.data['refresh'])
+            except TokenError as e:
+                return Response({'refresh': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+            if str(refresh.get(api_settings.USER_ID_CLAIM)) != str(request.user.pk):
+                return Response({'refresh': ['Token belongs to another user.']}, status=status.HTTP_400_BAD_REQUEST)
+            revoke(refresh)
+        if request.auth is not None:
+            revoke(request.auth)
         return Response({'msg': 'Successfully logged out.'}, status=status.HTTP_200_OK)
 
 
+class TokenRefreshView(jwt_views.TokenRefreshView):
+    serializer_class = TokenRefreshSerializer
+
+
 class UserView(APIView):
     permission_classes = (IsAuthenticated,)
 
@@ -79,6 +98,7 @@ class UserView(APIView):
 
 
 class UsersView(APIView):
+    @replica_reads
     def get(self, request):
         users = User.objects.all()
         serializer = UserSerializer(users, many=True)
@@ -0,0 +1,156 @@
+"""
+Sync WSGI workers versus the async views under ASGI, with many slow clients.
+
+Each of ``--clients`` concurrent clients sends ``--requests`` requests for the
+first ``--page-size`` POIs of the list, one after the other. A client takes
+``--delay`` ms to upload its request and as long again to read the response,
+like a phone on a slow network.
+
+WSGI runs the sync views on a pool of ``--workers`` threads (gunicorn's
+``--threads``); a worker is busy for the whole exchange, including the time
+spent waiting on the client. ASGI runs the async views on one event loop, the
+way uvicorn calls the application, and only database work leaves the loop.
+Both applications are called in process, so the numbers leave out the HTTP
+parsing of a real server. With fast clients the sync middleware hops of the
+async stack cost more than they save; the gap opens as clients get slower.
+
+    python -m benchmarks.asgi [--clients 200] [--requests 5] [--workers 8] [--delay 200]
+        [--page-size 50]
+"""
+import argparse
+import asyncio
+import time
+
+from .common import create_user, insert_pois, percentile, print_table, setup, test_database
+
+
+class SyncURLs:
+    """URLconf routing the POI list to the sync view, for the WSGI run"""
+
+    @property
+    def urlpatterns(self):
+        from django.urls import path
+
+        from apps.pois import views
+        return [path('api/pois/', views.POIsView.as_view())]
+
+
+def wsgi_request(application, path, query, token, delay):
+    from wsgiref.util import setup_testing_defaults
+
+    environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'HTTP_HOST': 'testserver',
+               'HTTP_AUTHORIZATION': f'Bearer {token}'}
+    setup_testing_defaults(environ)
+    statuses = []
+    time.sleep(delay / 2)
+    response = application(environ, lambda status, headers: statuses.append(status))
+    body = b''.join(response)
+    # like a WSGI server, ends the request (and closes its database connection)
+    response.close()
+    time.sleep(delay / 2)
+    assert statuses[0].startswith('200'), (statuses[0], body)
+
+
+async def asgi_request(application, path, query, token, delay):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'authorization', f'Bearer {token}'.encode())],
+        'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+    received = False
+    statuses = []
+
+    async def receive():
+        nonlocal received
+        if received:
+            # the client stays connected until the response is sent
+            await asyncio.Future()
+        received = True
+        await asyncio.sleep(delay / 2)
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+        elif not message.get('more_body'):
+            await asyncio.sleep(delay / 2)
+
+    await application(scope, receive, send)
+    assert statuses[0] == 200, statuses
+
+
+async def run_clients(request, clients, requests):
+    latencies = []
+
+    async def client():
+        for _ in range(requests):
+            start = time.perf_counter()
+            await request()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return latencies, time.perf_counter() - start
+
+
+def run(clients, requests, workers, delay, page_size):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from django.core.asgi import get_asgi_application
+    from django.core.wsgi import get_wsgi_application
+    from django.test.utils import override_settings
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    from apps.pois.versions import bump_data_version
+
+    path, query = '/api/pois/', f'page_size={page_size}'
+    delay /= 1000
+    rows = []
+    with test_database():
+        user = create_user('asgi')
+        insert_pois(user, 1000)
+        # version 0 pages are not cached
+        bump_data_version(user.pk)
+        token = RefreshToken.for_user(user).access_token
+
+        with override_settings(ROOT_URLCONF=SyncURLs()), ThreadPoolExecutor(workers) as pool:
+            application = get_wsgi_application()
+
+            async def request():
+                await asyncio.get_running_loop().run_in_executor(
+                    pool, wsgi_request, application, path, query, token, delay
+                )
+
+            results = [('wsgi', f'{workers} threads', *asyncio.run(run_clients(request, clients, requests)))]
+
+        application = get_asgi_application()
+        results.append((
+            'asgi', 'event loop',
+            *asyncio.run(run_clients(lambda: asgi_request(application, path, query, token, delay), clients, requests)),
+        ))
+
+        for server, concurrency, latencies, elapsed in results:
+            rows.append({
+                'server': server, 'concurrency': concurrency, 'requests': len(latencies),
+                'requests_per_s': f'{len(latencies) / elapsed:.0f}',
+                **{f'p{pct}_ms': f'{percentile(latencies, pct) * 1000:.0f}' for pct in (50, 95, 99)},
+            })
+    print(f'{clients} clients, {delay * 1000:.0f}ms to upload and to download each response')
+    print_table(rows, ['server', 'concurrency', 'requests', 'requests_per_s', 'p50_ms', 'p95_ms', 'p99_ms'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--delay', type=float, default=200, help='milliseconds')
+    parser.add_argument('--page-size', type=int, default=50)
+    args = parser.parse_args()
+    setup()
+    run(args.clients, args.requests, args.workers, args.delay, args.page_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Queries and time spent authenticating a request with simplejwt's
+JWTAuthentication versus apps.users' CachedJWTAuthentication.
+
+Each round authenticates ``--requests`` requests carrying the same access
+token, the way a client reuses its token until it expires.
+
+    python -m benchmarks.auth [--requests 1000]
+"""
+import argparse
+
+from .common import create_user, measure, print_table, setup, summarize, test_database
+
+
+def run(requests):
+    from django.core.cache import cache
+    from django.db import connection
+    from rest_framework.test import APIRequestFactory
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    from apps.users.authentication import CachedJWTAuthentication
+
+    rows = []
+    with test_database():
+        user = create_user('auth')
+        token = RefreshToken.for_user(user).access_token
+        request = APIRequestFactory().get('/api/pois/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        for authentication in [JWTAuthentication(), CachedJWTAuthentication()]:
+            cache.clear()
+
+            def authenticate():
+                for _ in range(requests):
+                    authenticated, _ = authentication.authenticate(request)
+                    assert authenticated.pk == user.pk
+
+            queries = []
+
+            def count_query(execute, sql, params, many, context):
+                queries.append(sql)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(count_query):
+                authenticate()
+            stats = summarize(measure(authenticate, repeat=10, warmup=1))
+            rows.append({
+                'authentication': type(authentication).__name__, 'requests': f'{requests:,}',
+                'queries': len(queries), 'p50_ms': f'{stats["p50_ms"]:.1f}', 'us_per_request':
+                f'{stats["p50_ms"] * 1000 / requests:.1f}',
+            })
+    print_table(rows, ['authentication', 'requests', 'queries', 'p50_ms', 'us_per_request'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+    setup()
+    run(args.requests)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Viewport (bbox) query time as a user's POI count grows.
+
+A fixed number of POIs sit inside the benchmark viewport while the rest of the
+user's history is scattered outside of it, so a flat query time shows the
+(created_by, latitude, longitude) index is doing the work rather than a scan.
+
+    python -m benchmarks.bbox [--sizes 1000,10000,100000,1000000]
+"""
+import argparse
+
+from .common import create_user, insert_pois, measure, print_table, setup, summarize, test_database
+
+VIEWPORT = (-105.3, 39.6, -104.8, 40.1)
+IN_VIEWPORT = 200
+
+
+def run(sizes):
+    from apps.pois.geo import bbox_q
+    from apps.pois.models import POI
+    from apps.pois.serializers import POIValuesSerializer
+
+    rows = []
+    with test_database() as connection:
+        user = create_user('bbox')
+        insert_pois(user, IN_VIEWPORT, bbox=VIEWPORT, seed=1)
+        total = IN_VIEWPORT
+        for size in sizes:
+            # everything outside the viewport lives in the southern hemisphere
+            insert_pois(user, size - total, bbox=(-180, -85, 180, -1), seed=size)
+            total = size
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE pois_poi')
+            queryset = POIValuesSerializer.values(POI.objects.filter(created_by=user).filter(bbox_q(*VIEWPORT)))
+
+            def query():
+                return POIValuesSerializer(queryset.all(), many=True).data
+
+            assert len(query()) == IN_VIEWPORT
+            rows.append({'pois': f'{size:,}', **{k: f'{v:.2f}' for k, v in summarize(measure(query)).items()}})
+    print_table(rows, ['pois', 'p50_ms', 'p95_ms', 'p99_ms', 'mean_ms'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000')
+    args = parser.parse_args()
+    setup()
+    run(sorted(int(size) for size in args.sizes.split(',')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Throughput of POST /api/pois/bulk/ against one POST /api/pois/ per POI.
+
+Both go through the full request stack (JWT authentication, validation,
+rendering) with Django's test client.
+
+    python -m benchmarks.bulk [--count 2000] [--batch 500]
+"""
+import argparse
+import random
+import time
+
+from .common import create_user, print_table, setup, test_database
+
+
+def payload(rng):
+    return {'name': f'poi {rng.random():.6f}', 'latitude': round(rng.uniform(-85, 85), 6),
+            'longitude': round(rng.uniform(-180, 180), 6)}
+
+
+def run(count, batch):
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    rng = random.Random(0)
+    rows = []
+    with test_database():
+        user = create_user('bulk')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+        start = time.perf_counter()
+        for _ in range(count):
+            response = client.post(reverse('api:pois:pois'), payload(rng), format='json')
+            assert response.status_code == 201, response.data
+        elapsed = time.perf_counter() - start
+        rows.append({'endpoint': 'POST /api/pois/', 'requests': count, 'seconds': f'{elapsed:.2f}',
+                     'pois_per_s': f'{count / elapsed:,.0f}'})
+
+        start = time.perf_counter()
+        for offset in range(0, count, batch):
+            operations = [{'op': 'create', 'data': payload(rng)} for _ in range(min(batch, count - offset))]
+            response = client.post(reverse('api:pois:bulk'), {'operations': operations}, format='json')
+            assert response.status_code == 200, response.data
+        elapsed = time.perf_counter() - start
+        rows.append({'endpoint': f'POST /api/pois/bulk/ ({batch}/batch)', 'requests': -(-count // batch),
+                     'seconds': f'{elapsed:.2f}', 'pois_per_s': f'{count / elapsed:,.0f}'})
+    print_table(rows, ['endpoint', 'requests', 'seconds', 'pois_per_s'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=2000)
+    parser.add_argument('--batch', type=int, default=500)
+    args = parser.parse_args()
+    setup()
+    run(args.count, args.batch)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Payload size and encode time of a POI list page as JSON versus the packed
+columnar format (``Accept: application/vnd.proxication.poi-columns``).
+
+Rows are fetched once and only the encoding is timed: the JSON side runs
+POIValuesSerializer and JSONRenderer, the columnar side ``encode_columns``.
+
+    python -m benchmarks.columns [--sizes 10000,100000]
+"""
+import argparse
+import gzip
+
+from .common import create_user, insert_pois, measure, print_table, setup, summarize, test_database
+
+
+def run(sizes):
+    from rest_framework.renderers import JSONRenderer
+
+    from apps.pois import columns
+    from apps.pois.models import POI
+    from apps.pois.serializers import POIValuesSerializer
+
+    rows = []
+    with test_database():
+        user = create_user('columns')
+        total = 0
+        for size in sizes:
+            insert_pois(user, size - total, seed=size)
+            total = size
+            pois = POI.objects.filter(created_by=user).order_by('-created_at', '-id')
+            json_rows = list(POIValuesSerializer.values(pois))
+            column_rows = list(pois.values(*columns.FIELDS))
+
+            def encode_json():
+                return JSONRenderer().render({'next': None, 'results': POIValuesSerializer(json_rows, many=True).data})
+
+            def encode_columns():
+                return columns.encode_columns(column_rows)
+
+            for name, encode in [('json', encode_json), ('columns', encode_columns)]:
+                payload = encode()
+                stats = summarize(measure(encode, repeat=10, warmup=1))
+                rows.append({
+                    'pois': f'{size:,}', 'format': name, 'bytes': f'{len(payload):,}',
+                    'gzip_bytes': f'{len(gzip.compress(payload)):,}',
+                    'p50_ms': f'{stats["p50_ms"]:.1f}', 'p95_ms': f'{stats["p95_ms"]:.1f}',
+                })
+    print_table(rows, ['pois', 'format', 'bytes', 'gzip_bytes', 'p50_ms', 'p95_ms'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,100000')
+    args = parser.parse_args()
+    setup()
+    run(sorted(int(size) for size in args.sizes.split(',')))
+
+
+if __name__ == '__main__':
+    main()
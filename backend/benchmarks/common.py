@@ -0,0 +1,101 @@
+"""
+Shared helpers for the backend benchmarks.
+
+Benchmarks run against a throwaway test database created from the configured
+``DATABASES['default']`` (PostgreSQL in development), so they never touch real
+data. Run them from the ``backend`` directory, e.g. ``python -m benchmarks.bbox``.
+"""
+import contextlib
+import os
+import random
+import statistics
+import time
+
+
+def setup():
+    """Configure Django for a standalone benchmark script"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'apps.core.settings')
+    import django
+    django.setup()
+
+
+@contextlib.contextmanager
+def test_database(verbosity=0, keepdb=False):
+    """
+    Create a scratch test database for the duration of the block, or with
+    ``keepdb`` reuse the one a previous run kept.
+    """
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False, keepdb=keepdb)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity, keepdb=keepdb)
+        teardown_test_environment()
+
+
+def measure(fn, repeat=50, warmup=5):
+    """Call ``fn`` repeatedly and return the wall time of each call in seconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """Return p50/p95/p99/mean of ``samples`` in milliseconds"""
+    return {
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+        'mean_ms': statistics.fmean(samples) * 1000,
+    }
+
+
+def create_user(username):
+    from django.contrib.auth import get_user_model
+    return get_user_model().objects.create_user(
+        username=username, email=f'{username}@bench.local', password='bench1234'
+    )
+
+
+def insert_pois(user, count, bbox=(-180, -85, 180, 85), batch_size=10_000, seed=0):
+    """Bulk insert ``count`` POIs for ``user`` spread uniformly over ``bbox``"""
+    from apps.pois.models import POI
+
+    rng = random.Random(seed)
+    min_lng, min_lat, max_lng, max_lat = bbox
+    remaining = count
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        POI.objects.bulk_create(
+            POI(
+                name=f'poi {remaining - i}',
+                latitude=round(rng.uniform(min_lat, max_lat), 6),
+                longitude=round(rng.uniform(min_lng, max_lng), 6),
+                created_by=user,
+            )
+            for i in range(size)
+        )
+        remaining -= size
+
+
+def print_table(rows, columns):
+    widths = [max(len(col), *(len(f'{row[col]}') for row in rows)) for col in columns]
+    print('  '.join(col.ljust(width) for col, width in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(f'{row[col]}'.ljust(width) for col, width in zip(columns, widths)))
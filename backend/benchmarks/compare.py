@@ -0,0 +1,77 @@
+"""
+Compare two result files of benchmarks.suite.
+
+For every scenario in both files, prints the change of each metric from the
+base run to the new one and flags regressions: latency or queries per
+request up, or throughput down, by more than ``--threshold`` percent, and any
+new error. Exits with status 1 if there is a regression, so it can gate CI.
+Runs are only comparable on the same machine and dataset; differences in the
+metadata are printed first.
+
+    python -m benchmarks.compare base.json new.json [--threshold 10]
+"""
+import argparse
+import json
+import sys
+
+from .common import print_table
+
+# metric -> whether a higher value is better
+METRICS = {
+    'throughput_rps': True,
+    'p50_ms': False,
+    'p95_ms': False,
+    'p99_ms': False,
+    'queries_per_request': False,
+}
+META = ['git_commit', 'dataset', 'concurrency', 'requests', 'page_size', 'database', 'python', 'django', 'cpus']
+
+
+def compare(base, new, threshold):
+    """Return the table rows comparing ``new`` to ``base`` and whether any is a regression"""
+    rows = []
+    regressed = False
+    for scenario, new_summary in new['scenarios'].items():
+        base_summary = base['scenarios'].get(scenario)
+        if base_summary is None or new_summary is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            before, after = base_summary.get(metric), new_summary.get(metric)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before * 100 if before else (0.0 if after == before else float('inf'))
+            worse = -change if higher_is_better else change
+            flag = 'REGRESSION' if worse > threshold else 'improved' if worse < -threshold else ''
+            regressed |= flag == 'REGRESSION'
+            rows.append({'scenario': scenario, 'metric': metric, 'base': before, 'new': after,
+                         'change': f'{change:+.1f}%', 'flag': flag})
+        if new_summary['errors'] > base_summary['errors']:
+            regressed = True
+            rows.append({'scenario': scenario, 'metric': 'errors', 'base': base_summary['errors'],
+                         'new': new_summary['errors'], 'change': '', 'flag': 'REGRESSION'})
+    return rows, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=10, help='percent')
+    args = parser.parse_args()
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    for key in META:
+        if base['meta'].get(key) != new['meta'].get(key):
+            print(f'{key}: {base["meta"].get(key)} -> {new["meta"].get(key)}')
+    rows, regressed = compare(base, new, args.threshold)
+    print_table(rows, ['scenario', 'metric', 'base', 'new', 'change', 'flag'])
+    if regressed:
+        print(f'Regressions beyond {args.threshold:g}%')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
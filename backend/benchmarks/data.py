@@ -0,0 +1,252 @@
+"""
+Synthetic users and POIs at production-like sizes.
+
+POIs cluster the way real ones do: each user has a home place and puts most
+of their POIs around it, the rest around places they travelled to. Places are
+a few dozen large cities, weighted by population, and a couple of thousand
+towns; points spread around a place with a normal distribution a few
+kilometers wide. How many POIs a user owns follows a Pareto distribution:
+most users have a handful, a few have thousands.
+
+Rows are written with COPY on PostgreSQL (bulk_create elsewhere) in batches
+by ``--workers`` processes, each generating about 20,000 POIs/s, and the POI
+indexes are built once at the end. Generated users are ``bench<n>`` with the
+password ``bench1234``, hashed once for all of them. The same ``--seed``
+generates the same data, whatever the number of workers.
+
+    python -m benchmarks.data [--users 10000] [--pois 1000000] [--seed 0] [--workers N]
+"""
+import argparse
+import contextlib
+import itertools
+import math
+import multiprocessing
+import os
+import random
+import time
+from datetime import timedelta
+
+from .common import setup, test_database
+
+USERNAME_PREFIX = 'bench'
+PASSWORD = 'bench1234'
+BATCH_SIZE = 50_000
+# users whose POIs are generated from the same seeded generator, by one worker
+BLOCK_USERS = 1000
+# share of a user's POIs around their home place
+HOME_SHARE = 0.8
+# 80/20 rule
+PARETO_ALPHA = 1.16
+MAX_WEIGHT = 1000
+TOWNS = 2000
+
+# latitude, longitude, population (millions), spread (km)
+CITIES = [
+    (35.68, 139.69, 37.4, 40), (28.61, 77.21, 32.9, 30), (31.23, 121.47, 29.2, 35), (-23.55, -46.63, 22.6, 30),
+    (19.43, -99.13, 22.3, 30), (30.04, 31.24, 21.8, 25), (19.08, 72.88, 21.3, 20), (39.90, 116.41, 21.3, 35),
+    (23.81, 90.41, 23.2, 15), (34.69, 135.50, 19.0, 25), (40.71, -74.01, 18.9, 35), (24.86, 67.01, 16.8, 20),
+    (-34.60, -58.38, 15.4, 30), (41.01, 28.98, 15.6, 30), (6.52, 3.38, 15.4, 25), (14.60, 120.98, 14.4, 20),
+    (55.76, 37.62, 12.6, 30), (-22.91, -43.17, 13.6, 30), (48.86, 2.35, 11.1, 20), (51.51, -0.13, 9.6, 25),
+    (34.05, -118.24, 12.5, 45), (13.76, 100.50, 10.9, 25), (-6.21, 106.85, 10.8, 25), (37.57, 126.98, 10.0, 25),
+    (41.88, -87.63, 8.9, 30), (-12.05, -77.04, 10.9, 20), (4.71, -74.07, 11.3, 15), (52.52, 13.40, 3.6, 20),
+    (40.42, -3.70, 6.7, 20), (43.65, -79.38, 6.3, 25), (-33.87, 151.21, 5.4, 30), (1.35, 103.82, 5.9, 12),
+    (25.20, 55.27, 3.5, 20), (-26.20, 28.05, 6.2, 25), (45.46, 9.19, 3.2, 15), (59.33, 18.07, 1.6, 12),
+]
+POI_KINDS = ['Cafe', 'Restaurant', 'Park', 'Museum', 'Shop', 'Viewpoint', 'Bar', 'Gallery', 'Beach', 'Market']
+
+
+class Places:
+    """Where POIs are: the cities above plus ``towns`` random small places"""
+
+    def __init__(self, rng, towns=TOWNS):
+        self.places = CITIES + [
+            (rng.uniform(-45, 65), rng.uniform(-180, 180), rng.uniform(0.01, 0.5), rng.uniform(2, 8))
+            for _ in range(towns)
+        ]
+        self.cum_weights = list(itertools.accumulate(place[2] for place in self.places))
+
+    def choose(self, rng):
+        return rng.choices(self.places, cum_weights=self.cum_weights)[0]
+
+    def point_near(self, rng, place):
+        latitude, longitude, _, spread_km = place
+        latitude += rng.gauss(0, spread_km / 111.32)
+        longitude += rng.gauss(0, spread_km / (111.32 * max(math.cos(math.radians(latitude)), 0.01)))
+        latitude = min(max(latitude, -90), 90)
+        longitude = (longitude + 180) % 360 - 180
+        return round(latitude, 6), round(longitude, 6)
+
+
+def poi_counts(users, pois, rng):
+    """Split ``pois`` between ``users`` following a Pareto distribution"""
+    weights = [min(rng.paretovariate(PARETO_ALPHA), MAX_WEIGHT) for _ in range(users)]
+    total = sum(weights)
+    counts = [int(weight * pois / total) for weight in weights]
+    for index in rng.choices(range(users), k=pois - sum(counts)):
+        counts[index] += 1
+    return counts
+
+
+def copy_rows(model, columns, rows):
+    """Write ``rows``, tuples of the values of the ``columns`` attnames, to ``model``'s table"""
+    from django.db import connection, transaction
+
+    for batch in iter(lambda: list(itertools.islice(rows, BATCH_SIZE)), []):
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                quote = connection.ops.quote_name
+                names = ', '.join(quote(model._meta.get_field(column).column) for column in columns)
+                with connection.cursor() as cursor, cursor.copy(
+                    f'COPY {quote(model._meta.db_table)} ({names}) FROM STDIN'
+                ) as copy:
+                    for row in batch:
+                        copy.write_row(row)
+            else:
+                model.objects.bulk_create((model(**dict(zip(columns, row))) for row in batch), batch_size=1000)
+
+
+@contextlib.contextmanager
+def indexes_rebuilt_after(model):
+    """
+    Drop the secondary indexes of ``model``'s table (PostgreSQL) for the block
+    and build them again at the end, much faster than updating them row by row.
+    """
+    from django.db import connection
+
+    if connection.vendor != 'postgresql':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT indexname, indexdef FROM pg_indexes
+            WHERE schemaname = current_schema() AND tablename = %s
+              AND indexname NOT IN (SELECT conname FROM pg_constraint)
+            """,
+            [model._meta.db_table],
+        )
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for _, definition in indexes:
+                cursor.execute(definition)
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+
+
+def dataset_exists(users, pois):
+    from django.contrib.auth import get_user_model
+
+    from apps.pois.models import POI
+
+    return (get_user_model().objects.filter(username__startswith=USERNAME_PREFIX).count() == users
+            and POI.objects.count() == pois)
+
+
+POI_COLUMNS = ['name', 'description', 'latitude', 'longitude', 'geohash', 'created_by_id', 'created_at', 'updated_at']
+
+
+def poi_rows(places, seed, block, user_ids, counts, first_number, now):
+    """The POIs of one block of users, from a generator seeded by the block alone"""
+    from apps.pois import geohash
+
+    rng = random.Random(f'{seed}:{block}')
+    number = first_number
+    for user_id, count in zip(user_ids, counts):
+        home = places.choose(rng)
+        for _ in range(count):
+            place = home if rng.random() < HOME_SHARE else places.choose(rng)
+            latitude, longitude = places.point_near(rng, place)
+            created_at = now - timedelta(seconds=rng.uniform(0, 2 * 365 * 24 * 3600))
+            number += 1
+            yield (
+                f'{rng.choice(POI_KINDS)} {number}', None, latitude, longitude,
+                geohash.encode(latitude, longitude), user_id, created_at, created_at,
+            )
+
+
+def copy_block(job):
+    from apps.pois.models import POI
+
+    copy_rows(POI, POI_COLUMNS, poi_rows(*job))
+
+
+def generate(users, pois, seed=0, workers=1, verbose=True):
+    """
+    Create ``users`` users owning ``pois`` POIs in total. ``workers`` processes
+    (PostgreSQL only) generate and copy blocks of users' POIs in parallel; the
+    data doesn't depend on their number.
+    """
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.db import connection
+    from django.utils import timezone
+
+    from apps.pois.models import POI, POIDataVersion
+
+    User = get_user_model()
+    rng = random.Random(seed)
+    now = timezone.now()
+    start = time.perf_counter()
+
+    password = make_password(PASSWORD)
+    copy_rows(User, ['password', 'is_superuser', 'username', 'first_name', 'last_name', 'email', 'is_staff',
+                     'is_active', 'date_joined'], (
+        (password, False, f'{USERNAME_PREFIX}{i}', '', '', f'{USERNAME_PREFIX}{i}@bench.local', False, True, now)
+        for i in range(users)
+    ))
+    user_ids = list(
+        User.objects.filter(username__startswith=USERNAME_PREFIX).order_by('pk').values_list('pk', flat=True)
+    )
+    if verbose:
+        print(f'{users:,} users in {time.perf_counter() - start:.1f}s')
+
+    places = Places(rng)
+    counts = poi_counts(users, pois, rng)
+    jobs = []
+    numbered = 0
+    for block, first in enumerate(range(0, users, BLOCK_USERS)):
+        block_counts = counts[first:first + BLOCK_USERS]
+        jobs.append((places, seed, block, user_ids[first:first + BLOCK_USERS], block_counts, numbered, now))
+        numbered += sum(block_counts)
+
+    with indexes_rebuilt_after(POI):
+        if workers > 1 and connection.vendor == 'postgresql':
+            # forked workers must open their own connections (and pools)
+            connection.close_pool()
+            with multiprocessing.get_context('fork').Pool(workers) as pool:
+                for _ in pool.imap_unordered(copy_block, jobs):
+                    pass
+        else:
+            for job in jobs:
+                copy_block(job)
+        if verbose:
+            print(f'{pois:,} POIs copied in {time.perf_counter() - start:.1f}s, building indexes')
+    # as if every user's POIs had been written through the API
+    version = time.time_ns()
+    copy_rows(POIDataVersion, ['user_id', 'version'], (
+        (user_id, version) for user_id, count in zip(user_ids, counts) if count
+    ))
+    elapsed = time.perf_counter() - start
+    if verbose:
+        print(f'{pois:,} POIs in {elapsed:.1f}s total ({pois / elapsed:,.0f} POIs/s)')
+    return user_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--pois', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    setup()
+    with test_database():
+        generate(args.users, args.pois, args.seed, args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Cost of idle POI event streams and latency of a publish reaching them.
+
+Opens ``--streams`` streams (apps.pois.events.stream) on one event loop, the
+way an ASGI worker holds them, spread over ``--users`` users, and reports the
+memory each costs. Then times events published from another thread, like a
+sync write view does, until every stream of their owner received them, for
+an owner with one stream and for one with ``--tabs``. Needs no database.
+
+    python -m benchmarks.events [--streams 10000] [--users 5000] [--tabs 10] [--publishes 1000]
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from .common import percentile, print_table, setup
+
+
+async def open_streams(user_ids):
+    from apps.pois import events
+
+    streams = [events.stream(user_id) for user_id in user_ids]
+    for stream in streams:
+        await anext(stream)
+    return streams
+
+
+async def time_publishes(broker, streams, user_id, publishes):
+    from apps.pois import events
+
+    samples = []
+    for pk in range(publishes):
+        start = time.perf_counter()
+        await asyncio.to_thread(broker.publish, user_id, [events.deleted(pk)])
+        for stream in streams:
+            await anext(stream)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def run(streams, users, tabs, publishes):
+    from django.test.utils import override_settings
+
+    from apps.pois import events
+
+    # no heartbeats while measuring
+    with override_settings(POI_EVENTS_HEARTBEAT=3600):
+        broker = events.get_broker()
+        tracemalloc.start()
+        idle = await open_streams([number % users + 1 for number in range(streams)])
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        rows = []
+        for owner_tabs, user_id in ((1, users + 1), (tabs, users + 2)):
+            owned = await open_streams([user_id] * owner_tabs)
+            samples = await time_publishes(broker, owned, user_id, publishes)
+            rows.append({
+                'owner_streams': owner_tabs,
+                'p50_us': f'{percentile(samples, 50) * 1e6:.0f}',
+                'p99_us': f'{percentile(samples, 99) * 1e6:.0f}',
+            })
+            for stream in owned:
+                await stream.aclose()
+        for stream in idle:
+            await stream.aclose()
+    print(f'{streams:,} idle streams of {users:,} users: {memory / streams / 1024:.1f} KiB each')
+    print_table(rows, ['owner_streams', 'p50_us', 'p99_us'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--streams', type=int, default=10_000)
+    parser.add_argument('--users', type=int, default=5_000)
+    parser.add_argument('--tabs', type=int, default=10, help='streams of the second owner')
+    parser.add_argument('--publishes', type=int, default=1_000)
+    args = parser.parse_args()
+    setup()
+    asyncio.run(run(args.streams, args.users, args.tabs, args.publishes))
+
+
+if __name__ == '__main__':
+    main()
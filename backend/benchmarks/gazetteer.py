@@ -0,0 +1,87 @@
+"""
+Build time, size and lookup latency of the autocomplete gazetteer.
+
+Writes ``--places`` synthetic cities (about the size of GeoNames'
+cities500.txt by default) with Pareto distributed populations as a GeoNames
+file, or uses the real one given with ``--source``, builds the index like
+build_gazetteer and times lookups of random prefixes of 1 to 6 characters
+on the memory-mapped file. Needs no database.
+
+    python -m benchmarks.gazetteer [--places 200000] [--source cities500.txt] [--lookups 10000]
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from .common import percentile, print_table, setup
+
+SYLLABLES = ['ba', 'ber', 'ca', 'do', 'el', 'fa', 'gen', 'ha', 'in', 'ko', 'la', 'lin', 'ma', 'mon', 'na', 'o',
+             'pa', 'ri', 'sa', 'san', 'ta', 'ton', 'u', 've', 'wa', 'ya', 'zu']
+
+
+def write_places(path, places, seed=0):
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as file:
+        for number in range(1, places + 1):
+            words = [''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))).title() for _ in range(rng.choice([1, 1, 2]))]
+            name = ' '.join(words)
+            population = int(500 * rng.paretovariate(1.1))
+            file.write('\t'.join(map(str, [
+                number, name, name, '', rng.uniform(-60, 70), rng.uniform(-180, 180), 'P', 'PPL', 'XX', '', '', '',
+                '', '', population, '', '', 'UTC', '2024-01-01',
+            ])) + '\n')
+
+
+def run(places, source, lookups):
+    from apps.places.gazetteer import Gazetteer, build, normalize, open_source, read_geonames
+
+    with tempfile.TemporaryDirectory() as directory:
+        if source is None:
+            source = Path(directory) / 'cities.txt'
+            write_places(source, places)
+        start = time.perf_counter()
+        with open_source(source) as file:
+            index = build(read_geonames(file))
+        build_seconds = time.perf_counter() - start
+        path = Path(directory) / 'cities.idx'
+        path.write_bytes(index)
+
+        start = time.perf_counter()
+        gazetteer = Gazetteer.open(path)
+        open_seconds = time.perf_counter() - start
+
+        rng = random.Random(0)
+        names = [normalize(gazetteer.names[rng.randrange(len(gazetteer))].decode()) for _ in range(lookups)]
+        rows = []
+        for length in range(1, 7):
+            prefixes = [name[:length] for name in names]
+            samples = []
+            for prefix in prefixes:
+                begin = time.perf_counter()
+                gazetteer.complete(prefix, limit=10)
+                samples.append(time.perf_counter() - begin)
+            rows.append({
+                'prefix_chars': length,
+                'p50_us': f'{percentile(samples, 50) * 1e6:.1f}',
+                'p99_us': f'{percentile(samples, 99) * 1e6:.1f}',
+                'max_us': f'{max(samples) * 1e6:.1f}',
+            })
+    print(f'{len(gazetteer):,} places: built in {build_seconds:.1f}s, {len(index) / 2 ** 20:.1f} MiB, '
+          f'opened in {open_seconds * 1000:.2f}ms')
+    print_table(rows, ['prefix_chars', 'p50_us', 'p99_us', 'max_us'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--places', type=int, default=200_000)
+    parser.add_argument('--source', help='GeoNames file to index instead of synthetic places')
+    parser.add_argument('--lookups', type=int, default=10_000, help='per prefix length')
+    args = parser.parse_args()
+    setup()
+    run(args.places, args.source, args.lookups)
+
+
+if __name__ == '__main__':
+    main()
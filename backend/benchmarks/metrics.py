@@ -0,0 +1,113 @@
+"""
+Overhead of apps.api's MetricsMiddleware (and its query wrapper) per request.
+
+Serves the health check (no database) and a page of the POI list through the
+WSGI handler, with and without the middleware, in alternating rounds so both
+see the same machine load. The difference is usually within the noise, so the
+cost of the middleware around a view that does nothing is measured as well.
+
+    python -m benchmarks.metrics [--requests 2000] [--rounds 5]
+"""
+import argparse
+import statistics
+import time
+
+from .common import create_user, insert_pois, print_table, setup, test_database
+
+
+def middleware_alone(requests):
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+    from django.urls import resolve
+
+    from apps.api.middleware import MetricsMiddleware
+
+    request = RequestFactory().get('/api/health/')
+    request.resolver_match = resolve('/api/health/')
+    response = HttpResponse(b'{}')
+
+    def view(request):
+        # a fresh header each time, as a new response would have
+        response.headers.pop('Server-Timing', None)
+        return response
+
+    timings = {}
+    for name, handler in [('without', view), ('with', MetricsMiddleware(view))]:
+        start = time.perf_counter()
+        for _ in range(requests):
+            handler(request)
+        timings[name] = (time.perf_counter() - start) / requests * 1e6
+    return {
+        'path': 'middleware alone', 'without_us': f'{timings["without"]:.1f}', 'with_us': f'{timings["with"]:.1f}',
+        'overhead_us': f'{timings["with"] - timings["without"]:.1f}', 'overhead': '-',
+    }
+
+
+def run(requests, rounds):
+    from django.conf import settings
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.test.utils import override_settings
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from wsgiref.util import setup_testing_defaults
+
+    from apps.api.metrics import request_metrics
+
+    rows = []
+    with test_database():
+        user = create_user('metrics')
+        insert_pois(user, 100)
+        token = RefreshToken.for_user(user).access_token
+        middleware = [name for name in settings.MIDDLEWARE if name != 'apps.api.middleware.MetricsMiddleware']
+        handlers = {'with': WSGIHandler()}
+        with override_settings(MIDDLEWARE=middleware):
+            handlers['without'] = WSGIHandler()
+
+        for path in ['/api/health/', '/api/pois/?page_size=20']:
+            path, _, query = path.partition('?')
+            environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query,
+                       'HTTP_HOST': 'testserver', 'HTTP_AUTHORIZATION': f'Bearer {token}'}
+            setup_testing_defaults(environ)
+
+            def serve(handler):
+                start = time.perf_counter()
+                for _ in range(requests):
+                    response = handler(dict(environ), lambda status, headers: None)
+                    b''.join(response)
+                    response.close()
+                return (time.perf_counter() - start) / requests
+
+            timings = {'with': [], 'without': []}
+            for name, handler in handlers.items():
+                serve(handler)
+            for _ in range(rounds):
+                for name, handler in handlers.items():
+                    timings[name].append(serve(handler))
+            without = statistics.median(timings['without']) * 1e6
+            with_metrics = statistics.median(timings['with']) * 1e6
+            rows.append({
+                'path': path, 'without_us': f'{without:.0f}', 'with_us': f'{with_metrics:.0f}',
+                'overhead_us': f'{with_metrics - without:.1f}',
+                'overhead': f'{(with_metrics - without) / without:.1%}',
+            })
+
+        rows.append(middleware_alone(requests * 10))
+
+        start = time.perf_counter()
+        body = request_metrics.render()
+        render_ms = (time.perf_counter() - start) * 1000
+    print(f'median of {rounds} rounds of {requests} requests')
+    print_table(rows, ['path', 'without_us', 'with_us', 'overhead_us', 'overhead'])
+    print(f'/api/metrics/ body: {len(body):,} bytes rendered in {render_ms:.2f}ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+    setup()
+    run(args.requests, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
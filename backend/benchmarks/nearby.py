@@ -0,0 +1,60 @@
+"""
+Latency of k-nearest and radius POI searches as a user's POI count grows.
+
+POIs are spread over the contiguous US and queries are centred on random
+points inside it.
+
+    python -m benchmarks.nearby [--sizes 100000,1000000] [--k 20] [--radius 5000]
+"""
+import argparse
+import random
+
+from .common import create_user, insert_pois, measure, print_table, setup, summarize, test_database
+
+AREA = (-124.7, 24.5, -66.9, 49.4)
+
+
+def run(sizes, k, radius_m):
+    from apps.pois.models import POI
+    from apps.pois.nearby import nearest
+    from apps.pois.serializers import POINearbySerializer, POIValuesSerializer
+
+    rng = random.Random(0)
+    rows = []
+    with test_database() as connection:
+        user = create_user('nearby')
+        total = 0
+        for size in sizes:
+            insert_pois(user, size - total, bbox=AREA, seed=size)
+            total = size
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE pois_poi')
+            pois = POIValuesSerializer.values(POI.objects.filter(created_by=user))
+
+            for label, radius in [(f'k={k}', None), (f'k={k} r={radius_m:g}m', radius_m)]:
+                def query():
+                    lat, lng = rng.uniform(AREA[1], AREA[3]), rng.uniform(AREA[0], AREA[2])
+                    return POINearbySerializer(nearest(pois, lat, lng, k, radius), many=True).data
+
+                stats = summarize(measure(query, repeat=200))
+                rows.append({
+                    'pois': f'{size:,}',
+                    'query': label,
+                    **{key: f'{value:.2f}' for key, value in stats.items()},
+                })
+    print_table(rows, ['pois', 'query', 'p50_ms', 'p95_ms', 'p99_ms', 'mean_ms'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='100000,1000000')
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--radius', type=float, default=5000)
+    args = parser.parse_args()
+    setup()
+    run(sorted(int(size) for size in args.sizes.split(',')), args.k, args.radius)
+
+
+if __name__ == '__main__':
+    main()
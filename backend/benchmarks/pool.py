@@ -0,0 +1,111 @@
+"""
+Requests/sec of short POI detail requests with a new PostgreSQL connection per
+request (the behaviour without ``OPTIONS['pool']``) versus pooled connections.
+
+``--threads`` WSGI worker threads each send their share of ``--requests``
+requests through the whole Django stack, which closes (or returns to the pool)
+its connection at the end of every request. Pools smaller than the number of
+threads make requests queue for a connection, which shows in the pool stats.
+
+    python -m benchmarks.pool [--threads 8] [--requests 4000] [--pool-sizes 4,8]
+"""
+import argparse
+import time
+
+from .common import create_user, insert_pois, print_table, setup, summarize, test_database
+
+
+def wsgi_get(application, path, token):
+    from wsgiref.util import setup_testing_defaults
+
+    environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'HTTP_HOST': 'testserver',
+               'HTTP_AUTHORIZATION': f'Bearer {token}'}
+    setup_testing_defaults(environ)
+    statuses = []
+    response = application(environ, lambda status, headers: statuses.append(status))
+    b''.join(response)
+    response.close()
+    assert statuses[0].startswith('200'), statuses[0]
+
+
+def run_threads(application, path, token, threads, requests):
+    from concurrent.futures import ThreadPoolExecutor
+
+    def worker(count):
+        samples = []
+        for _ in range(count):
+            start = time.perf_counter()
+            wsgi_get(application, path, token)
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(worker, [requests // threads] * threads))
+    return [sample for samples in results for sample in samples], time.perf_counter() - start
+
+
+def run(threads, requests, pool_sizes):
+    from django.core.wsgi import get_wsgi_application
+    from django.db import connection
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    from apps.core.postgresql.base import pool_stats
+    from apps.pois.models import POI
+    from apps.pois.versions import bump_data_version
+
+    rows = []
+    with test_database():
+        if not hasattr(connection, 'pool'):
+            raise SystemExit('Needs the apps.core.postgresql database backend.')
+        user = create_user('pool')
+        insert_pois(user, 100)
+        # version 0 payloads are not cached
+        bump_data_version(user.pk)
+        token = RefreshToken.for_user(user).access_token
+        path = f'/api/pois/{POI.objects.filter(created_by=user).first().pk}/'
+        application = get_wsgi_application()
+        options = connection.settings_dict['OPTIONS']
+        pool_options = options.get('pool')
+
+        try:
+            for size in [None, *pool_sizes]:
+                connection.close_pool()
+                # the wrappers of the worker threads share this settings dict
+                options['pool'] = size and {'min_size': size, 'max_size': size, 'timeout': 30}
+                wsgi_get(application, path, token)
+                samples, elapsed = run_threads(application, path, token, threads, requests)
+                stats = summarize(samples)
+                row = {
+                    'connections': f'pool of {size}' if size else 'per request',
+                    'requests_per_s': f'{len(samples) / elapsed:.0f}',
+                    'p50_ms': f'{stats["p50_ms"]:.2f}', 'p99_ms': f'{stats["p99_ms"]:.2f}',
+                    'opened': len(samples) + 1, 'waits': '-', 'wait_ms': '-', 'timeouts': '-',
+                }
+                if size:
+                    # psycopg_pool leaves out counters that are still 0
+                    pool = pool_stats()['default']
+                    row.update({
+                        'opened': pool.get('connections_num', 0), 'waits': pool.get('requests_queued', 0),
+                        'wait_ms': pool.get('requests_wait_ms', 0), 'timeouts': pool.get('requests_errors', 0),
+                    })
+                rows.append(row)
+        finally:
+            connection.close_pool()
+            options['pool'] = pool_options
+    print(f'{threads} threads, {requests} requests')
+    print_table(rows, ['connections', 'requests_per_s', 'p50_ms', 'p99_ms', 'opened', 'waits', 'wait_ms', 'timeouts'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--pool-sizes', default='4,8', type=lambda value: [int(size) for size in value.split(',')])
+    args = parser.parse_args()
+    setup()
+    run(args.threads, args.requests, args.pool_sizes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Per-request cost of the token revocation check with many revoked tokens.
+
+Fills the revocation table, loads it into a fresh in-process list the way a
+worker does on its first request, then times ``is_revoked`` for revoked and
+for live tokens.
+
+    python -m benchmarks.revocation [--revoked 1000000] [--checks 100000]
+"""
+import argparse
+import random
+import time
+import tracemalloc
+import uuid
+from datetime import timedelta
+
+from .common import print_table, setup, test_database
+
+
+def run(revoked, checks):
+    from django.utils import timezone
+    from rest_framework_simplejwt.utils import datetime_from_epoch
+
+    from apps.users.models import RevokedToken
+    from apps.users.revocation import RevocationList
+
+    rng = random.Random(0)
+    now = int(timezone.now().timestamp())
+    # refresh tokens live up to a week; none may expire while the table fills
+    tokens = [
+        {'jti': uuid.UUID(int=rng.getrandbits(128)).hex, 'exp': now + rng.randint(3600, 7 * 24 * 3600)}
+        for _ in range(revoked)
+    ]
+    with test_database():
+        start = time.perf_counter()
+        for offset in range(0, revoked, 10_000):
+            RevokedToken.objects.bulk_create(
+                RevokedToken(jti=token['jti'], expires_at=datetime_from_epoch(token['exp']))
+                for token in tokens[offset:offset + 10_000]
+            )
+        print(f'inserted {revoked:,} revoked tokens in {time.perf_counter() - start:.1f}s')
+        # revoked a while ago, so the incremental sync has nothing new to read
+        RevokedToken.objects.update(revoked_at=timezone.now() - timedelta(hours=1))
+
+        revocations = RevocationList()
+        tracemalloc.start()
+        start = time.perf_counter()
+        revocations.sync()
+        load_seconds = time.perf_counter() - start
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        assert len(revocations) == revoked
+        # later syncs only read recent rows
+        start = time.perf_counter()
+        revocations.sync()
+        sync_seconds = time.perf_counter() - start
+
+    revocations.start = lambda: None  # no sync thread, the test database is gone
+    live = [{'jti': uuid.uuid4().hex, 'exp': now + 3600} for _ in range(checks)]
+    rows = [{
+        'step': 'initial load', 'time': f'{load_seconds:.2f} s', 'memory': f'{memory / 2 ** 20:.0f} MiB',
+    }, {
+        'step': 'incremental sync', 'time': f'{sync_seconds * 1000:.1f} ms', 'memory': '',
+    }]
+    for name, sample in [('check revoked token', rng.sample(tokens, min(checks, revoked))), ('check live token', live)]:
+        start = time.perf_counter()
+        results = [revocations.is_revoked(token) for token in sample]
+        elapsed = time.perf_counter() - start
+        assert all(results) if name == 'check revoked token' else not any(results)
+        rows.append({'step': name, 'time': f'{elapsed / len(sample) * 1e6:.2f} us/check', 'memory': ''})
+    print_table(rows, ['step', 'time', 'memory'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--revoked', type=int, default=1_000_000)
+    parser.add_argument('--checks', type=int, default=100_000)
+    args = parser.parse_args()
+    setup()
+    run(args.revoked, args.checks)
+
+
+if __name__ == '__main__':
+    main()
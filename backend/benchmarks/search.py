@@ -0,0 +1,74 @@
+"""
+Latency of POI search at production-like sizes.
+
+Generates ``--users`` users owning ``--pois`` POIs with benchmarks.data and
+searches the POIs of a typical user and of the user owning the most, for a
+word in a tenth of the names, a prefix of it, a word in a single name, and
+the common word within ``--radius`` meters of one of the user's POIs. The
+substring fallback used on other databases is run on PostgreSQL as well, to
+show what the indexes save.
+
+    python -m benchmarks.search [--users 10000] [--pois 1000000] [--radius 50000] [--keepdb]
+"""
+import argparse
+import os
+
+from .common import measure, print_table, setup, summarize, test_database
+from .data import dataset_exists, generate
+
+
+def run(users, pois, radius_m, keepdb, workers):
+    from django.db.models import Count
+
+    from apps.pois.models import POI
+    from apps.pois.nearby import within
+    from apps.pois.search import fallback_queryset, has_trigram, parse_terms, search_queryset
+    from apps.pois.serializers import POIValuesSerializer
+
+    rows = []
+    with test_database(keepdb=keepdb) as connection:
+        if not dataset_exists(users, pois):
+            generate(users, pois, workers=workers)
+        trigram = has_trigram(connection.alias)
+        owners = list(POI.objects.order_by().values('created_by').annotate(count=Count('id')).order_by('count'))
+        owners = [owners[len(owners) // 2], owners[-1]]
+
+        for owner in owners:
+            user_pois = POIValuesSerializer.values(POI.objects.filter(created_by=owner['created_by']))
+            sample = POI.objects.filter(created_by=owner['created_by']).order_by('pk').first()
+            kind, number = sample.name.split()
+            queries = [
+                (kind, user_pois),
+                (kind[:3], user_pois),
+                (number, user_pois),
+                (f'{kind} r={radius_m / 1000:g}km', within(user_pois, float(sample.latitude),
+                                                           float(sample.longitude), radius_m)),
+            ]
+            for label, scope in queries:
+                terms = parse_terms(label.split(' r=')[0])
+                for mode, queryset in [('index', search_queryset(scope, terms, trigram)),
+                                       ('fallback', fallback_queryset(scope, terms))]:
+                    stats = summarize(measure(lambda: list(queryset[:20]), repeat=50))
+                    rows.append({
+                        'user_pois': f'{owner["count"]:,}', 'query': label, 'mode': mode,
+                        'matches': f'{queryset.count():,}',
+                        **{key: f'{value:.2f}' for key, value in stats.items()},
+                    })
+    print(f'{pois:,} POIs of {users:,} users, {connection.vendor}{", pg_trgm" if trigram else ""}')
+    print_table(rows, ['user_pois', 'query', 'mode', 'matches', 'p50_ms', 'p95_ms', 'p99_ms', 'mean_ms'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--pois', type=int, default=1_000_000)
+    parser.add_argument('--radius', type=float, default=50_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes generating the dataset')
+    parser.add_argument('--keepdb', action='store_true', help='keep the test database and its dataset')
+    args = parser.parse_args()
+    setup()
+    run(args.users, args.pois, args.radius, args.keepdb, args.workers)
+
+
+if __name__ == '__main__':
+    main()
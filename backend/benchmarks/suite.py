@@ -0,0 +1,305 @@
+"""
+Load test of the main API scenarios at production-like data sizes.
+
+Generates ``--users`` users owning ``--pois`` POIs with benchmarks.data, then
+runs each scenario through the WSGI handler from ``--concurrency`` threads
+(like gunicorn's ``--threads``), with requests spread over random generated
+users:
+
+    login   POST /api/users/login/, dominated by password hashing
+    list    GET /api/pois/, first page of ``--page-size`` POIs
+    detail  GET /api/pois/<id>/
+    create  POST /api/pois/
+    update  PUT /api/pois/<id>/ on the POIs created by ``create``
+    delete  DELETE /api/pois/<id>/ on the same POIs
+
+Every scenario sends ``--requests`` requests (login a tenth of them) after
+``--warmup`` untimed ones, and reports p50/p95/p99 latency, throughput,
+errors and database queries per request, read from the ``Server-Timing``
+header of MetricsMiddleware. The same ``--seed`` sends the same requests.
+SQLite locks the whole database for writes: run the write scenarios on it
+with ``--concurrency 1``.
+
+With ``--output`` the results and the run's metadata (dataset, concurrency,
+git commit, database) are written as JSON, to compare runs with
+benchmarks.compare. With ``--keepdb`` the test database and its dataset are
+kept for the next run, which only generates it again if its size changed.
+
+    python -m benchmarks.suite [--users 10000] [--pois 1000000] [--seed 0] [--workers N]
+        [--concurrency 8] [--requests 2000] [--warmup 50] [--page-size 50]
+        [--scenarios login,list,detail,create,update,delete] [--output results.json] [--keepdb]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .common import percentile, print_table, setup, test_database
+from .data import PASSWORD, POI_KINDS, USERNAME_PREFIX, dataset_exists, generate
+
+SCENARIOS = ['login', 'list', 'detail', 'create', 'update', 'delete']
+# users the read and write scenarios pick from, and POIs per user for detail
+SAMPLE_USERS = 1000
+SAMPLE_POIS = 20
+
+QUERIES = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+class Call:
+    """One request of a scenario; ``expect`` is the status code of a success"""
+    __slots__ = ('method', 'path', 'query', 'token', 'body', 'expect', 'user_id')
+
+    def __init__(self, method, path, token=None, body=None, expect=200, query='', user_id=None):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.token = token
+        self.body = body
+        self.expect = expect
+        self.user_id = user_id
+
+
+class Result:
+    __slots__ = ('status', 'seconds', 'queries', 'db_ms', 'data')
+
+    def __init__(self, status, seconds, queries, db_ms, data):
+        self.status = status
+        self.seconds = seconds
+        self.queries = queries
+        self.db_ms = db_ms
+        self.data = data
+
+
+def call_wsgi(application, call):
+    from io import BytesIO
+    from wsgiref.util import setup_testing_defaults
+
+    body = json.dumps(call.body).encode() if call.body is not None else b''
+    environ = {
+        'REQUEST_METHOD': call.method, 'PATH_INFO': call.path, 'QUERY_STRING': call.query,
+        'HTTP_HOST': 'testserver', 'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': BytesIO(body),
+    }
+    if call.token is not None:
+        environ['HTTP_AUTHORIZATION'] = f'Bearer {call.token}'
+    setup_testing_defaults(environ)
+    started = []
+
+    def start_response(status, headers):
+        started.append((int(status.split()[0]), headers))
+
+    start = time.perf_counter()
+    response = application(environ, start_response)
+    content = b''.join(response)
+    # like a WSGI server, ends the request (and returns its connection to the pool)
+    response.close()
+    seconds = time.perf_counter() - start
+
+    status, headers = started[0]
+    timing = QUERIES.search(dict(headers).get('Server-Timing', ''))
+    queries, db_ms = (int(timing[2]), float(timing[1])) if timing else (None, None)
+    data = json.loads(content) if status == call.expect and content else None
+    return Result(status, seconds, queries, db_ms, data)
+
+
+def run_scenario(application, calls, concurrency, warmup):
+    """
+    Send ``calls`` and return the results of all of them, and the time taken
+    by all but the first ``warmup`` ones
+    """
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(lambda call: call_wsgi(application, call), calls[:warmup]))
+        start = time.perf_counter()
+        results += pool.map(lambda call: call_wsgi(application, call), calls[warmup:])
+        elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def summarize_results(calls, results, elapsed):
+    ok = [result for call, result in zip(calls, results) if result.status == call.expect]
+    latencies = [result.seconds for result in results]
+    queries = [result.queries for result in results if result.queries is not None]
+    db_ms = [result.db_ms for result in results if result.db_ms is not None]
+    return {
+        'requests': len(results),
+        'errors': len(results) - len(ok),
+        'throughput_rps': round(len(results) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2),
+        'queries_per_request': round(statistics.fmean(queries), 2) if queries else None,
+        'db_ms_per_request': round(statistics.fmean(db_ms), 2) if db_ms else None,
+    }
+
+
+class Scenarios:
+    """Builds the calls of each scenario from a sample of the dataset"""
+
+    def __init__(self, rng, requests, warmup, page_size):
+        from django.contrib.auth import get_user_model
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        from apps.pois.models import POI
+
+        self.rng = rng
+        self.requests = requests
+        self.warmup = warmup
+        self.page_size = page_size
+        User = get_user_model()
+        owners = list(POI.objects.order_by().values_list('created_by_id', flat=True).distinct())
+        owners.sort()
+        sample = rng.sample(owners, min(SAMPLE_USERS, len(owners)))
+        self.usernames = list(
+            User.objects.filter(username__startswith=USERNAME_PREFIX).order_by('pk').values_list('username', flat=True)
+        )
+        self.tokens = {user.pk: str(AccessToken.for_user(user)) for user in User.objects.filter(pk__in=sample)}
+        self.user_ids = sorted(self.tokens)
+        self.pois = {}
+        for user_id in self.user_ids:
+            self.pois[user_id] = list(
+                POI.objects.filter(created_by_id=user_id).order_by('pk').values_list('pk', flat=True)[:SAMPLE_POIS]
+            )
+        # (user id, POI id) of the POIs made by the create scenario
+        self.created = []
+
+    def count(self, scenario):
+        return (max(self.requests // 10, 1) if scenario == 'login' else self.requests) + self.warmup
+
+    def random_poi(self):
+        latitude, longitude = round(self.rng.uniform(-85, 85), 6), round(self.rng.uniform(-180, 180), 6)
+        return {'name': f'{self.rng.choice(POI_KINDS)} {self.rng.randrange(10**6)}',
+                'description': 'Load test', 'latitude': latitude, 'longitude': longitude}
+
+    def calls(self, scenario):
+        count = self.count(scenario)
+        if scenario == 'login':
+            return [Call('POST', '/api/users/login/', body={'username': username, 'password': PASSWORD})
+                    for username in self.rng.choices(self.usernames, k=count)]
+        if scenario == 'list':
+            return [Call('GET', '/api/pois/', self.tokens[user_id], query=f'page_size={self.page_size}')
+                    for user_id in self.rng.choices(self.user_ids, k=count)]
+        if scenario == 'detail':
+            return [Call('GET', f'/api/pois/{self.rng.choice(self.pois[user_id])}/', self.tokens[user_id])
+                    for user_id in self.rng.choices(self.user_ids, k=count)]
+        if scenario == 'create':
+            return [Call('POST', '/api/pois/', self.tokens[user_id], self.random_poi(), expect=201, user_id=user_id)
+                    for user_id in self.rng.choices(self.user_ids, k=count)]
+        if scenario == 'update':
+            if not self.created:
+                return []
+            return [Call('PUT', f'/api/pois/{poi_id}/', self.tokens[user_id], self.random_poi())
+                    for user_id, poi_id in self.rng.choices(self.created, k=count)]
+        if scenario == 'delete':
+            created, self.created = self.created, []
+            return [Call('DELETE', f'/api/pois/{poi_id}/', self.tokens[user_id], expect=204)
+                    for user_id, poi_id in created[:count]]
+        raise ValueError(f'Unknown scenario {scenario!r}')
+
+    def record(self, scenario, calls, results):
+        if scenario == 'create':
+            self.created.extend(
+                (call.user_id, result.data['id']) for call, result in zip(calls, results) if result.data is not None
+            )
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True, cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(args, connection):
+    import django
+
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'dataset': {'users': args.users, 'pois': args.pois, 'seed': args.seed},
+        'concurrency': args.concurrency,
+        'requests': args.requests,
+        'warmup': args.warmup,
+        'page_size': args.page_size,
+        'database': {'vendor': connection.vendor, 'version': '.'.join(map(str, connection.get_database_version()))},
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def run(args):
+    from django.core.cache import cache
+    from django.core.management import call_command
+    from django.core.wsgi import get_wsgi_application
+
+    scenarios = args.scenarios.split(',')
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+
+    with test_database(keepdb=args.keepdb) as connection:
+        if dataset_exists(args.users, args.pois):
+            print(f'Reusing the dataset of {args.users:,} users and {args.pois:,} POIs')
+        else:
+            call_command('flush', interactive=False, verbosity=0)
+            generate(args.users, args.pois, args.seed, args.workers)
+        # every run starts with the same (empty) payload cache
+        cache.clear()
+        application = get_wsgi_application()
+        plan = Scenarios(random.Random(args.seed), args.requests, args.warmup, args.page_size)
+
+        results = {}
+        for scenario in SCENARIOS:
+            if scenario not in scenarios and not (scenario == 'create' and {'update', 'delete'} & set(scenarios)):
+                continue
+            calls = plan.calls(scenario)
+            warmup = min(args.warmup, len(calls) // 2)
+            done, elapsed = run_scenario(application, calls, args.concurrency, warmup)
+            plan.record(scenario, calls, done)
+            if scenario in scenarios:
+                results[scenario] = summarize_results(calls[warmup:], done[warmup:], elapsed) if calls else None
+        meta = metadata(args, connection)
+
+    print(f'{args.users:,} users, {args.pois:,} POIs, {args.concurrency} threads')
+    print_table(
+        [{'scenario': scenario, **summary} for scenario, summary in results.items() if summary is not None],
+        ['scenario', 'requests', 'errors', 'throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request'],
+    )
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'meta': meta, 'scenarios': results}, f, indent=2)
+            f.write('\n')
+        print(f'Results written to {args.output}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--pois', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes generating the dataset')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2000, help='per scenario')
+    parser.add_argument('--warmup', type=int, default=50, help='untimed requests per scenario')
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--output', help='JSON file for the results')
+    parser.add_argument('--keepdb', action='store_true', help='keep the test database and its dataset')
+    args = parser.parse_args()
+    setup()
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
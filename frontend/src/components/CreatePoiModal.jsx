@@ -19,7 +19,7 @@ const CreatePoiModal = () => {
     poiDescription,
     setPoiDescription,
     setIsUpdating,
-    loadPois,
+    upsertPoi,
   } = usePoi();
   const [isCreating, setIsCreating] = useState(false);
   const isEditMode = selectedPoi !== null;
@@ -47,7 +47,7 @@ const CreatePoiModal = () => {
 
       if (response.ok) {
         const newPoi = await response.json();
-        await loadPois();
+        upsertPoi(newPoi);
         handleCloseModal();
       } else {
         const error = await response.json();
@@ -83,7 +83,7 @@ const CreatePoiModal = () => {
 
       if (response.ok) {
         const updatedPoi = await response.json();
-        await loadPois();
+        upsertPoi(updatedPoi);
         handleCloseModal();
       } else {
         const error = await response.json();
@@ -13,7 +13,7 @@ const DeletePoiModal = () => {
     isDeleting,
     setIsDeleting,
     handleCloseModal,
-    loadPois,
+    removePoi,
   } = usePoi();
 
   const handleDeleteConfirm = async () => {
@@ -29,7 +29,7 @@ const DeletePoiModal = () => {
       });
 
       if (response.ok || response.status === 204) {
-        await loadPois();
+        removePoi(selectedPoi.id);
         setShowDeleteConfirm(false);
         handleCloseModal();
       } else {
@@ -1,7 +1,10 @@
 import { useState, useEffect, useRef } from 'react';
+import { API_BASE_URL } from '../config';
+import { useAuth } from '../contexts/AuthContext';
 import './SearchBox.css';
 
 function SearchBox({ map, onLodgingPlacesChange }) {
+  const { accessToken } = useAuth();
   const [query, setQuery] = useState('');
   const [results, setResults] = useState([]);
   const [isSearching, setIsSearching] = useState(false);
@@ -32,15 +35,33 @@ function SearchBox({ map, onLodgingPlacesChange }) {
     }
 
     setIsSearching(true);
-    const accessToken = import.meta.env.VITE_MAPBOX_TOKEN;
 
     try {
-      const response = await fetch(
-        `https://api.mapbox.com/geocoding/v5/mapbox.places/${encodeURIComponent(searchQuery)}.json?` +
-          `access_token=${accessToken}&limit=8&types=place`
-      );
+      const headers = { Authorization: `Bearer ${accessToken}` };
+      const q = encodeURIComponent(searchQuery);
+      // offline gazetteer first, geocoding when the backend has none configured
+      let response = await fetch(`${API_BASE_URL}/places/autocomplete/?q=${q}&limit=8`, { headers });
+      if (response.status === 503) {
+        response = await fetch(`${API_BASE_URL}/geocode/?q=${q}&limit=8&types=place`, { headers });
+        if (!response.ok) {
+          throw new Error(`API error: ${response.status}`);
+        }
+        const data = await response.json();
+        setResults(data.features.slice(0, 8));
+        setShowResults(true);
+        return;
+      }
+      if (!response.ok) {
+        throw new Error(`API error: ${response.status}`);
+      }
       const data = await response.json();
-      setResults(data.features.slice(0, 8));
+      setResults(
+        data.results.map((place) => ({
+          id: place.id,
+          place_name: `${place.name}, ${place.country_code}`,
+          center: [place.longitude, place.latitude],
+        }))
+      );
       setShowResults(true);
     } catch (error) {
       setResults([]);
@@ -71,7 +92,6 @@ function SearchBox({ map, onLodgingPlacesChange }) {
     if (!map || !cityCenter) return;
 
     setIsLoadingLodging(true);
-    const accessToken = import.meta.env.VITE_MAPBOX_TOKEN;
 
     try {
       const [lng, lat] = cityCenter;
@@ -79,14 +99,15 @@ function SearchBox({ map, onLodgingPlacesChange }) {
       const bbox = cityBounds?.length === 4 ? `&bbox=${cityBounds.join(',')}` : '';
 
       const url =
-        `https://api.mapbox.com/geocoding/v5/mapbox.places/hotel.json?` +
-        `access_token=${accessToken}&autocomplete=false&types=place,poi&${proximity}${bbox}&limit=50`;
+        `${API_BASE_URL}/geocode/?q=hotel&autocomplete=false&types=place,poi&${proximity}${bbox}&limit=10`;
 
-      const response = await fetch(url);
+      const response = await fetch(url, {
+        headers: { Authorization: `Bearer ${accessToken}` },
+      });
 
       if (!response.ok) {
         const errorData = await response.json().catch(() => ({}));
-        console.error('Mapbox API error:', response.status, errorData);
+        console.error('Geocoding API error:', response.status, errorData);
         throw new Error(`API error: ${response.status}`);
       }
 
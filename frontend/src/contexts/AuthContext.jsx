@@ -100,6 +100,18 @@ export const AuthProvider = ({ children }) => {
   };
 
   const logout = () => {
+    const token = localStorage.getItem('accessToken');
+    if (token) {
+      // revoke both tokens server side; the local session ends either way
+      fetch(`${API_BASE_URL}/users/logout/`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          Authorization: `Bearer ${token}`,
+        },
+        body: JSON.stringify({ refresh: localStorage.getItem('refreshToken') }),
+      }).catch(() => {});
+    }
     setUser(null);
     setAccessToken(null);
     localStorage.removeItem('accessToken');
@@ -38,17 +38,24 @@ export const PoiProvider = ({ children }) => {
     setLoading(true);
     setError(null);
     try {
-      const response = await fetch(`${API_BASE_URL}/pois/`, {
-        headers: {
-          Authorization: `Bearer ${accessToken}`,
-        },
-      });
-
-      if (response.ok) {
-        const pois = await response.json();
-        setPois(pois);
-      } else {
-        setError('Failed to load POIs');
+      // follow the next cursor so each page shows up as soon as it arrives
+      let url = `${API_BASE_URL}/pois/`;
+      let loaded = [];
+      while (url) {
+        const response = await fetch(url, {
+          headers: {
+            Authorization: `Bearer ${accessToken}`,
+          },
+        });
+
+        if (!response.ok) {
+          setError('Failed to load POIs');
+          break;
+        }
+        const page = await response.json();
+        loaded = loaded.concat(page.results);
+        setPois(loaded);
+        url = page.next;
       }
     } catch (error) {
       console.error('Error loading POIs:', error);
@@ -58,9 +65,98 @@ export const PoiProvider = ({ children }) => {
     }
   }, [accessToken]);
 
+  const upsertPoi = useCallback((poi) => {
+    setPois((current) => {
+      const index = current.findIndex((item) => item.id === poi.id);
+      if (index === -1) {
+        return [poi, ...current];
+      }
+      const next = current.slice();
+      next[index] = poi;
+      return next;
+    });
+  }, []);
+
+  const removePoi = useCallback((id) => {
+    setPois((current) => current.filter((item) => item.id !== id));
+  }, []);
+
+  // changes made in this tab and in others push events here; the list is
+  // loaded each time the stream opens, so nothing missed in between is lost
   useEffect(() => {
-    loadPois();
-  }, [loadPois]);
+    if (!accessToken) {
+      setLoading(false);
+      return;
+    }
+    const controller = new AbortController();
+    let retryTimeout = null;
+
+    const handleEvent = (type, data) => {
+      if (type === 'created' || type === 'updated') {
+        upsertPoi(data);
+      } else if (type === 'deleted') {
+        removePoi(data.id);
+      } else if (type === 'resync') {
+        loadPois();
+      }
+    };
+
+    const connect = async () => {
+      try {
+        const response = await fetch(`${API_BASE_URL}/pois/events/`, {
+          headers: {
+            Authorization: `Bearer ${accessToken}`,
+          },
+          signal: controller.signal,
+        });
+        loadPois();
+        if (!response.ok) {
+          // no push from this server (or an expired token), the list is loaded once
+          return;
+        }
+
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        for (;;) {
+          const { value, done } = await reader.read();
+          if (done) {
+            break;
+          }
+          buffer += value;
+          let end;
+          while ((end = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, end);
+            buffer = buffer.slice(end + 2);
+            let type = 'message';
+            let data = '';
+            for (const line of frame.split('\n')) {
+              if (line.startsWith('event: ')) {
+                type = line.slice(7);
+              } else if (line.startsWith('data: ')) {
+                data += line.slice(6);
+              }
+            }
+            if (data) {
+              handleEvent(type, JSON.parse(data));
+            }
+          }
+        }
+      } catch (error) {
+        if (controller.signal.aborted) {
+          return;
+        }
+        console.error('POI event stream error:', error);
+      }
+      // the stream ended: its token expired, the client fell behind or the network failed
+      retryTimeout = setTimeout(connect, 5000);
+    };
+
+    connect();
+    return () => {
+      controller.abort();
+      clearTimeout(retryTimeout);
+    };
+  }, [accessToken, loadPois, upsertPoi, removePoi]);
 
   useEffect(() => {
     if (selectedPoi) {
@@ -94,6 +190,8 @@ export const PoiProvider = ({ children }) => {
     loading,
     error,
     loadPois,
+    upsertPoi,
+    removePoi,
     showPoiModal,
     setShowPoiModal,
     clickedCoords,